@@ -112,10 +112,6 @@ def get_option_menu():
     from streamlit_option_menu import option_menu
     return option_menu
 
-def get_database_functions():
-    from utils.database_unified import init_db
-    return init_db
-
 def get_form_components():
     from components.forms import (
         coordinator_form, verifier_form, warehouse_form, csv_upload, 
@@ -179,21 +175,9 @@ def get_dashboard_components():
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Inicializar la base de datos usando lazy loading
-logger.info("Initializing database from app.py...")
-init_db = get_database_functions()
-init_db()
-logger.info("Database initialization completed.")
-
-# Inicializar datos por defecto en entornos de deploy
-try:
-    from config import is_deployed_environment
-    if is_deployed_environment():
-        from init_default_data import run_default_initialization
-        logger.info("Deploy environment detected, checking for default data...")
-        run_default_initialization()
-except ImportError:
-    logger.info("Default data initialization not available")
+# Inicializar la base de datos una sola vez por proceso (no en cada rerun)
+from utils.bootstrap import bootstrap_database
+bootstrap_database()
 
 @st.cache_data
 def get_session_defaults():
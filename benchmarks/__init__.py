@@ -0,0 +1 @@
+"""Scripts de medición de rendimiento de la capa de datos"""
@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de las funciones de acceso a datos con distintos volúmenes de historial
+Para cada tamaño (número de registros de incidencia) genera una base de datos sintética
+(benchmarks/seed_data.py, reutilizada entre ejecuciones) y ejecuta cada función de la capa
+de datos sobre una copia, con las cachés de Streamlit y de dimensiones vacías:
+1. Backend SQLite: utils/database.py
+2. Backend Supabase: utils/database_supabase.py sobre el cliente simulado de supabase_fake.py
+   (los mismos datos, con latencia por petición configurable)
+
+Por cada función mide el tiempo (mejor de --repeat ejecuciones), la memoria pico de Python
+(tracemalloc, en una ejecución aparte) y el número de consultas: sentencias SQL en SQLite y
+peticiones HTTP en Supabase. Las funciones que modifican o vacían los datos se ejecutan cada
+vez sobre una copia nueva.
+
+El resultado se escribe como JSON (con el commit actual, para comparar entre commits) y como
+tabla markdown; con --baseline se añade la variación de tiempo respecto a un JSON anterior.
+
+Uso: python -m benchmarks.data_access [--sizes 1000,10000,100000,1000000] [--backends sqlite,supabase]
+         [--functions regex] [--repeat 3] [--latency-ms 0] [--json ruta] [--markdown ruta] [--baseline ruta]
+"""
+
+import argparse
+import datetime
+import io
+import json
+import logging
+import os
+import platform
+import re
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import namedtuple
+from contextlib import contextmanager
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import streamlit as st
+import streamlit.logger as streamlit_logger
+import utils.database as database
+import utils.database_supabase as database_supabase
+import utils.backup_restore as backup_restore
+from utils.db_pool import PooledConnection, close_pool
+from utils.dimension_cache import invalidate_dimensions
+from utils.default_data import DEFAULT_COORDINATORS, DEFAULT_INCIDENTS, default_verifiers, default_warehouses
+from benchmarks.seed_data import SEED_VERSION, seeded_database
+from supabase_fake import FakeSupabaseClient, seed_from_sqlite, use_fake_client
+
+# Tamaños por defecto; 1000000 se pide explícitamente con --sizes (generar la base de datos
+# lleva varios minutos y las exportaciones por Supabase, mucho más)
+DEFAULT_SIZES = [1000, 10000, 100000]
+BACKENDS = ('sqlite', 'supabase')
+
+# Sentencias que cuentan como consulta (no BEGIN ni PRAGMA)
+QUERY_PATTERN = re.compile(r'\s*(SELECT|WITH|INSERT|UPDATE|DELETE|REPLACE)\b', re.IGNORECASE)
+
+# Filas de los CSV de importación
+CSV_IMPORT_ROWS = 1000
+
+# Una función de la capa de datos: etiqueta, nombre de la función, llamada (función, contexto)
+# y si necesita una copia nueva de los datos en cada ejecución
+Case = namedtuple('Case', ['label', 'function', 'call', 'fresh'])
+
+def case(function, call=None, label=None, fresh=False):
+    return Case(label or function, function, call or (lambda fn, ctx: fn()), fresh)
+
+def verifiers_csv(ctx):
+    lines = ['name,surnames,phone,zone'] + [f'Bench{i},Verificador{i},6{i:08d},PENEDÈS' for i in range(CSV_IMPORT_ROWS)]
+    return io.BytesIO('\n'.join(lines).encode('utf-8'))
+
+def warehouses_csv(ctx):
+    lines = ['name,codigo_consejo,zone'] + [f'Bodega bench {i},BENCH{i:06d},REQUENA' for i in range(CSV_IMPORT_ROWS)]
+    return io.BytesIO('\n'.join(lines).encode('utf-8'))
+
+CASES = [
+    case('init_db'),
+    # Tablas de referencia
+    case('get_coordinators'),
+    case('get_verifiers'),
+    case('get_warehouses'),
+    case('get_incidents'),
+    case('get_all_verifiers_df'),
+    case('get_all_warehouses_df'),
+    case('get_coordinator_by_id', lambda fn, ctx: fn(1)),
+    case('get_verifier_by_id', lambda fn, ctx: fn(1)),
+    case('get_warehouse_by_id', lambda fn, ctx: fn(1)),
+    case('get_incident_by_id', lambda fn, ctx: fn(1)),
+    case('search_incident_by_code', lambda fn, ctx: fn(DEFAULT_INCIDENTS[0][0])),
+    # Registros de incidencia
+    case('get_incident_records'),
+    case('get_incident_records_page'),
+    case('get_incident_records_page', lambda fn, ctx: fn(cursor=ctx['cursor']), 'get_incident_records_page (cursor)'),
+    case('get_incident_records_page', lambda fn, ctx: fn(search='bodega'), 'get_incident_records_page (search)'),
+    case('get_incident_record_details', lambda fn, ctx: fn(ctx['record_id'])),
+    case('get_incident_actions', lambda fn, ctx: fn(ctx['record_id'])),
+    case('get_incident_records_by_incident_code', lambda fn, ctx: fn(DEFAULT_INCIDENTS[0][0])),
+    case('get_all_incident_records_df'),
+    case('search_incidents', lambda fn, ctx: fn('bodega calidad')),
+    case('search_incidents', lambda fn, ctx: fn('bodega', {'status': 'Pendiente'}), 'search_incidents (status)'),
+    # Dashboard y análisis
+    case('get_dashboard_stats'),
+    case('get_pending_incidents_summary'),
+    case('get_recent_actions'),
+    case('get_recent_incidents'),
+    case('get_pending_incidents_by_coordinator', lambda fn, ctx: fn(1)),
+    case('get_filtered_pending_incidents'),
+    case('get_filtered_pending_incidents', lambda fn, ctx: fn(coordinator_id=1, status='Pendiente'), 'get_filtered_pending_incidents (coordinator, status)'),
+    case('get_filtered_pending_incidents', lambda fn, ctx: fn(days=30), 'get_filtered_pending_incidents (30 days)'),
+    case('get_incidents_by_zone'),
+    case('get_incidents_by_verifier'),
+    case('get_incidents_by_warehouse'),
+    case('get_incidents_by_type'),
+    case('get_incidents_by_status'),
+    case('get_assignments_by_verifier'),
+    # Escrituras
+    case('insert_coordinator', lambda fn, ctx: fn('Benchmark', 'Coordinador')),
+    case('insert_verifier', lambda fn, ctx: fn('Benchmark', 'Verificador', '600000000', 'PENEDÈS')),
+    case('insert_warehouse', lambda fn, ctx: fn('Bodega benchmark', 'BENCH-1', 'PENEDÈS')),
+    case('insert_incident', lambda fn, ctx: fn('Incidencia benchmark')),
+    case('insert_incident_record', lambda fn, ctx: fn(ctx['today'], 1, 1, 1, 1, 1, 'Registro benchmark', '', 'Pendiente', 'Bodega')),
+    case('insert_incident_action', lambda fn, ctx: fn(ctx['record_id'], ctx['today'], 'Acción benchmark', 'En Proceso', 1)),
+    case('update_coordinator', lambda fn, ctx: fn(1, *DEFAULT_COORDINATORS[0])),
+    case('update_verifier', lambda fn, ctx: fn(1, *default_verifiers()[0])),
+    case('update_warehouse', lambda fn, ctx: fn(1, *default_warehouses()[0])),
+    case('update_incident', lambda fn, ctx: fn(1, *DEFAULT_INCIDENTS[0])),
+    case('update_incident_record', lambda fn, ctx: fn(ctx['record_id'], ctx['today'], 1, 1, 1, 1, 'Registro benchmark', '', 'En Proceso', 'Bodega')),
+    case('load_csv_to_verifiers', lambda fn, ctx: fn(verifiers_csv(ctx)), fresh=True),
+    case('load_csv_to_warehouses', lambda fn, ctx: fn(warehouses_csv(ctx)), fresh=True),
+    # Exportaciones y copias de seguridad
+    case('export_incidents_to_excel'),
+    case('export_incidents', lambda fn, ctx: fn('csv.gz'), 'export_incidents (csv.gz)'),
+    case('export_incidents', lambda fn, ctx: fn('parquet'), 'export_incidents (parquet)'),
+    case('export_incidents_incremental', lambda fn, ctx: fn('benchmark', 'csv.gz'), 'export_incidents_incremental (first run)', fresh=True),
+    case('create_backup'),
+    case('create_backup', lambda fn, ctx: fn(compress=True), 'create_backup (gzip)'),
+    case('reset_database', fresh=True)
+]
+
+def release_result(result):
+    """Cierra los buffers de las exportaciones y copias devueltas"""
+    results = result if isinstance(result, list) else [result]
+    for item in results:
+        if isinstance(item, dict) and hasattr(item.get('buffer'), 'close'):
+            item['buffer'].close()
+
+def clear_caches():
+    """Vacía las cachés de Streamlit y de dimensiones para medir siempre en frío"""
+    st.cache_data.clear()
+    invalidate_dimensions()
+
+@contextmanager
+def count_statements():
+    """Registra las sentencias que las conexiones del pool ejecutan con execute/executemany,
+    directamente o a través de un cursor (p. ej. pd.read_sql_query)
+
+    Cada executemany cuenta como una sola consulta (como una inserción multi-fila en Supabase)
+    y no se cuentan las sentencias que ejecutan los triggers.
+    """
+    statements = []
+
+    def counted(method):
+        def wrapper(target, sql, *args, **kwargs):
+            statements.append(sql)
+            return method(target, sql, *args, **kwargs)
+        return wrapper
+
+    class CountingCursor(sqlite3.Cursor):
+        execute = counted(sqlite3.Cursor.execute)
+        executemany = counted(sqlite3.Cursor.executemany)
+
+    PooledConnection.execute = counted(sqlite3.Connection.execute)
+    PooledConnection.executemany = counted(sqlite3.Connection.executemany)
+    PooledConnection.cursor = lambda conn, factory=CountingCursor: sqlite3.Connection.cursor(conn, factory)
+    try:
+        yield statements
+    finally:
+        del PooledConnection.execute
+        del PooledConnection.executemany
+        del PooledConnection.cursor
+
+class SqliteBackend:
+    """utils/database.py sobre una copia de la base de datos sintética"""
+
+    name = 'sqlite'
+    module = database
+
+    def __init__(self, seed_path, work_dir):
+        self.seed_path = seed_path
+        self.path = os.path.join(work_dir, 'benchmark_sqlite.db')
+
+    def refresh(self):
+        close_pool(self.path)
+        for suffix in ('-wal', '-shm'):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+        shutil.copy(self.seed_path, self.path)
+        database.DB_PATH = backup_restore.DB_PATH = self.path
+
+    def run(self, call):
+        """Ejecuta call() contando las sentencias que lanza la capa de datos; retorna (resultado, consultas)"""
+        with count_statements() as statements:
+            result = call()
+        return result, sum(1 for s in statements if QUERY_PATTERN.match(s))
+
+    def close(self):
+        close_pool(self.path)
+
+class SupabaseBackend:
+    """utils/database_supabase.py sobre el cliente simulado con los mismos datos"""
+
+    name = 'supabase'
+    module = database_supabase
+
+    def __init__(self, seed_path, work_dir, latency=0.0):
+        self.seed_path = seed_path.replace('.db', '_supabase.db')
+        self.path = os.path.join(work_dir, 'benchmark_supabase.db')
+        self.latency = latency
+        self.client = None
+        if not os.path.exists(self.seed_path):
+            client = FakeSupabaseClient(self.seed_path + '.tmp')
+            seed_from_sqlite(client, seed_path)
+            client.close()
+            os.replace(self.seed_path + '.tmp', self.seed_path)
+
+    def refresh(self):
+        self.close()
+        shutil.copy(self.seed_path, self.path)
+        self.client = use_fake_client(FakeSupabaseClient(self.path, latency=self.latency))
+
+    def run(self, call):
+        self.client.reset_stats()
+        result = call()
+        return result, self.client.request_count
+
+    def close(self):
+        if self.client is not None:
+            self.client.close()
+            self.client = None
+
+def benchmark_context(backend):
+    """Ids y valores válidos en la base de datos sintética para los argumentos de las funciones"""
+    with sqlite3.connect(backend.seed_path) as conn:
+        record_id = conn.execute('SELECT MAX(id) FROM incident_records').fetchone()[0] or 1
+        cursor = conn.execute('SELECT date, id FROM incident_records ORDER BY date DESC, id DESC LIMIT 1 OFFSET 50').fetchone()
+    return {'record_id': record_id, 'cursor': tuple(cursor) if cursor else None, 'today': datetime.date.today()}
+
+def measure(backend, case, ctx, repeat):
+    """Tiempo (mejor de repeat), memoria pico y consultas de una función"""
+    function = getattr(backend.module, case.function)
+    times = []
+    queries = None
+    for _ in range(repeat):
+        if case.fresh:
+            backend.refresh()
+        clear_caches()
+        start = time.perf_counter()
+        result, queries = backend.run(lambda: case.call(function, ctx))
+        times.append(time.perf_counter() - start)
+        release_result(result)
+
+    if case.fresh:
+        backend.refresh()
+    clear_caches()
+    tracemalloc.start()
+    try:
+        result, _ = backend.run(lambda: case.call(function, ctx))
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    release_result(result)
+
+    return {'time_ms': round(min(times) * 1000, 2), 'peak_memory_mb': round(peak / 1024 / 1024, 2), 'queries': queries}
+
+def run_benchmarks(sizes, backends, cases, repeat, latency, data_dir, seed):
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for size in sizes:
+            print(f'Preparing {size} records...', file=sys.stderr)
+            seed_path = seeded_database(data_dir, size, seed)
+            for backend_name in backends:
+                if backend_name == 'sqlite':
+                    backend = SqliteBackend(seed_path, work_dir)
+                else:
+                    backend = SupabaseBackend(seed_path, work_dir, latency)
+                ctx = benchmark_context(backend)
+                backend.refresh()
+                try:
+                    for item in cases:
+                        if not hasattr(backend.module, item.function):
+                            continue
+                        row = {'backend': backend.name, 'records': size, 'function': item.label}
+                        try:
+                            row.update(measure(backend, item, ctx, repeat))
+                        except Exception as e:
+                            row['error'] = f'{type(e).__name__}: {e}'
+                        results.append(row)
+                        print(f"  {backend.name:8} {size:>8} {item.label:55} {row.get('time_ms', row.get('error'))}", file=sys.stderr)
+                        # Las funciones con copia propia dejan los datos modificados: volver a la copia inicial
+                        if item.fresh:
+                            backend.refresh()
+                finally:
+                    backend.close()
+    return results
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def result_key(row):
+    return (row['backend'], row['records'], row['function'])
+
+def format_markdown(report, baseline=None):
+    """Tabla markdown con una fila por backend, tamaño y función"""
+    previous = {result_key(row): row for row in (baseline or {}).get('results', [])}
+    header = ['Backend', 'Records', 'Function', 'Time (ms)', 'Peak memory (MB)', 'Queries']
+    if baseline:
+        header.append(f"Time vs {baseline.get('commit') or 'baseline'}")
+    lines = [
+        f"Commit {report['commit'] or 'unknown'} · {report['generated_at']} · Python {report['python']} · "
+        f"SQLite {report['sqlite']} · Supabase latency {report['latency_ms']} ms",
+        '',
+        '| ' + ' | '.join(header) + ' |',
+        '|' + '|'.join('---' for _ in header) + '|'
+    ]
+    for row in report['results']:
+        if 'error' in row:
+            cells = [row['backend'], str(row['records']), row['function'], row['error'], '', '']
+        else:
+            cells = [row['backend'], str(row['records']), row['function'], f"{row['time_ms']:.2f}",
+                     f"{row['peak_memory_mb']:.2f}", str(row['queries'])]
+        if baseline:
+            old = previous.get(result_key(row))
+            cells.append(f"{(row['time_ms'] / old['time_ms'] - 1) * 100:+.0f}%"
+                         if old and row.get('time_ms') is not None and old.get('time_ms') else '')
+        lines.append('| ' + ' | '.join(cells) + ' |')
+    return '\n'.join(lines) + '\n'
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de las funciones de acceso a datos')
+    parser.add_argument('--sizes', default=','.join(str(s) for s in DEFAULT_SIZES), help='Registros de incidencia de cada base de datos sintética')
+    parser.add_argument('--backends', default=','.join(BACKENDS), help='Backends a medir (sqlite, supabase)')
+    parser.add_argument('--functions', default=None, help='Expresión regular para elegir las funciones')
+    parser.add_argument('--repeat', type=int, default=3, help='Ejecuciones por función (se toma el mejor tiempo)')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Latencia simulada por petición a Supabase')
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'cavacrm_benchmarks'), help='Directorio de las bases de datos sintéticas')
+    parser.add_argument('--seed', type=int, default=42, help='Semilla de los datos sintéticos')
+    parser.add_argument('--json', help='Fichero JSON de resultados')
+    parser.add_argument('--markdown', help='Fichero markdown de resultados (por defecto se imprime)')
+    parser.add_argument('--baseline', help='JSON de una ejecución anterior con el que comparar los tiempos')
+    args = parser.parse_args()
+
+    # Solo interesan los avisos de las funciones medidas, no su registro informativo
+    logging.disable(logging.INFO)
+    streamlit_logger.set_log_level('ERROR')
+
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    backends = [backend.strip() for backend in args.backends.split(',') if backend.strip()]
+    unknown = set(backends) - set(BACKENDS)
+    if unknown:
+        parser.error(f'Backends desconocidos: {", ".join(sorted(unknown))}')
+    cases = [item for item in CASES if not args.functions or re.search(args.functions, item.label)]
+
+    report = {
+        'commit': git_commit(),
+        'generated_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'seed': args.seed,
+        'seed_version': SEED_VERSION,
+        'repeat': args.repeat,
+        'latency_ms': args.latency_ms,
+        'results': run_benchmarks(sizes, backends, cases, args.repeat, args.latency_ms / 1000, args.data_dir, args.seed)
+    }
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    markdown = format_markdown(report, baseline)
+    if args.markdown:
+        with open(args.markdown, 'w', encoding='utf-8') as f:
+            f.write(markdown)
+    else:
+        print(markdown)
+    return 1 if any('error' in row for row in report['results']) else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Plan de ejecución (EXPLAIN QUERY PLAN) de las consultas frecuentes de utils/database.py
+Trabaja sobre una copia de db/cavacrm.db (nunca sobre el fichero original), con las
+migraciones aplicadas. Ejecuta cada función de acceso a datos, captura las sentencias
+SQL que lanza y muestra su plan, marcando:
+1. Recorridos completos (SCAN) de incident_records o incident_actions sin índice
+2. Ordenaciones con árbol temporal (USE TEMP B-TREE FOR ORDER BY)
+
+Uso: python -m benchmarks.query_plans [--db ruta] [--strict]
+Con --strict termina con código 1 si alguna consulta frecuente recorre una tabla completa.
+"""
+
+import argparse
+import datetime
+import os
+import re
+import shutil
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils.database as database
+import utils.backup_restore as backup_restore
+
+# Tablas grandes en las que un recorrido completo es una regresión
+LARGE_TABLES = ('incident_records', 'incident_actions')
+
+# Funciones de acceso a datos frecuentes y los argumentos con los que se ejecutan
+HOT_QUERIES = [
+    ('get_dashboard_stats', lambda: database.get_dashboard_stats()),
+    ('get_pending_incidents_summary', lambda: database.get_pending_incidents_summary()),
+    ('get_recent_actions', lambda: database.get_recent_actions()),
+    ('get_pending_incidents_by_coordinator', lambda: database.get_pending_incidents_by_coordinator(1)),
+    ('get_filtered_pending_incidents (coordinador)', lambda: database.get_filtered_pending_incidents(coordinator_id=1)),
+    ('get_filtered_pending_incidents (estado)', lambda: database.get_filtered_pending_incidents(status='En proceso')),
+    ('get_filtered_pending_incidents (coordinador y estado)', lambda: database.get_filtered_pending_incidents(coordinator_id=1, status='En proceso')),
+    ('get_filtered_pending_incidents (fecha)', lambda: database.get_filtered_pending_incidents(selected_date=datetime.date.today())),
+    ('get_incident_actions', lambda: database.get_incident_actions(1)),
+    ('get_incident_records_page', lambda: database.get_incident_records_page()),
+    ('get_incident_records_page (cursor)', lambda: database.get_incident_records_page(cursor=(datetime.date.today().isoformat(), 10))),
+    ('get_incident_record_details', lambda: database.get_incident_record_details(1)),
+    ('get_incident_records_by_incident_code', lambda: database.get_incident_records_by_incident_code('INC-001')),
+    ('search_incidents', lambda: database.search_incidents('bodega', {'status': 'Pendiente'})),
+    ('export_incidents_incremental', lambda: database.export_incidents_incremental('query_plans', 'csv.gz')),
+]
+
+def capture_statements(function):
+    """Ejecuta function y retorna las consultas SELECT que lanza (con los parámetros ya sustituidos)"""
+    statements = []
+    with database.db_connection() as conn:
+        conn.set_trace_callback(statements.append)
+        try:
+            function()
+        finally:
+            conn.set_trace_callback(None)
+    return [s for s in statements if re.match(r'\s*(SELECT|WITH)\b', s, re.IGNORECASE)]
+
+def explain(statement):
+    """Filas (id, padre, detalle) del plan de ejecución de una consulta"""
+    with database.db_connection() as conn:
+        return [(row[0], row[1], row[3]) for row in conn.execute('EXPLAIN QUERY PLAN ' + statement)]
+
+def plan_warnings(plan):
+    """Pasos del plan que indican un recorrido completo de una tabla grande o una ordenación temporal"""
+    warnings = []
+    for _, _, detail in plan:
+        match = re.match(r'SCAN (\w+)', detail)
+        if match and ' USING ' not in detail:
+            table = match.group(1)
+            aliases = {'ir': 'incident_records', 'ia': 'incident_actions'}
+            if aliases.get(table, table) in LARGE_TABLES:
+                warnings.append(f'full scan: {detail}')
+        if detail.startswith('USE TEMP B-TREE FOR ORDER BY'):
+            warnings.append(f'sort: {detail}')
+    return warnings
+
+def format_plan(plan):
+    """Plan con sangría según la jerarquía de pasos"""
+    depth = {0: -1}
+    lines = []
+    for node_id, parent, detail in plan:
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append('    ' + '  ' * depth[node_id] + detail)
+    return '\n'.join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description='Plan de ejecución de las consultas frecuentes')
+    parser.add_argument('--db', default=database.DB_PATH, help='Base de datos de origen (se usa una copia)')
+    parser.add_argument('--strict', action='store_true', help='Terminar con error si alguna consulta recorre una tabla completa')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        target = os.path.join(temp_dir, 'cavacrm_plans.db')
+        if os.path.exists(args.db):
+            shutil.copy(args.db, target)
+        database.DB_PATH = backup_restore.DB_PATH = target
+        database.init_db()
+
+        full_scans = 0
+        for name, function in HOT_QUERIES:
+            print(f'\n=== {name}')
+            for statement in capture_statements(function):
+                plan = explain(statement)
+                print('  ' + ' '.join(statement.split())[:160])
+                print(format_plan(plan))
+                for warning in plan_warnings(plan):
+                    print(f'    !! {warning}')
+                    full_scans += warning.startswith('full scan')
+
+        print(f'\nFull scans of large tables: {full_scans}')
+        return 1 if args.strict and full_scans else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Bases de datos SQLite sintéticas para los benchmarks de la capa de datos
+Parte de los datos por defecto de utils/default_data.py (coordinadores, tipos de incidencia,
+verificadores y bodegas por zona) y añade, de forma reproducible (misma semilla, mismos datos):
+1. Más verificadores, bodegas y tipos de incidencia, en proporción al número de registros
+2. Registros de incidencia repartidos en los dos últimos años, con dos acciones de media cada uno
+
+El esquema se crea con las migraciones de utils/migrations.py, de modo que la base de datos
+tiene los mismos índices y triggers que la de la aplicación.
+
+Uso: python -m benchmarks.seed_data ruta.db --records 100000 [--seed 42]
+"""
+
+import argparse
+import datetime
+import itertools
+import logging
+import os
+import random
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.default_data import DEFAULT_COORDINATORS, DEFAULT_INCIDENTS, DEFAULT_ZONES, default_verifiers, default_warehouses
+from utils.db_pool import get_pool, close_pool
+from utils.migrations import apply_sqlite_migrations
+
+logger = logging.getLogger(__name__)
+
+# Cambiar al modificar la generación para no reutilizar bases de datos ya sembradas
+SEED_VERSION = 1
+
+STATUSES = ['Pendiente', 'En Proceso', 'Solucionado', 'Asignado a Técnicos', 'RRHH']
+STATUS_WEIGHTS = [25, 20, 45, 5, 5]
+RESPONSIBLES = ['Bodega', 'Verificador', 'Coordinador']
+
+WORDS = (
+    'bodega verificador muestra etiqueta lote palet temperatura entrega retraso albarán '
+    'documentación calidad botella caja transporte cliente revisión precinto análisis registro'
+).split()
+
+# Días de historial de los registros generados
+HISTORY_DAYS = 730
+
+# Filas por lote de inserción
+INSERT_BATCH_ROWS = 10000
+
+def dimension_sizes(records):
+    """Tamaño de las tablas de referencia según el número de registros"""
+    return {
+        'coordinators': min(len(DEFAULT_COORDINATORS) + records // 10000, 25),
+        'verifiers': min(len(DEFAULT_ZONES) + records // 1000, 300),
+        'warehouses': min(len(DEFAULT_ZONES) + records // 200, 2000),
+        'incidents': min(len(DEFAULT_INCIDENTS) + records // 5000, 40)
+    }
+
+def generate_dimensions(records):
+    """Filas de las tablas de referencia: las de utils/default_data.py más las sintéticas"""
+    sizes = dimension_sizes(records)
+    zones = itertools.cycle(DEFAULT_ZONES)
+    coordinators = list(DEFAULT_COORDINATORS) + [
+        (f'Coordinador{i}', f'Sintético{i}') for i in range(len(DEFAULT_COORDINATORS) + 1, sizes['coordinators'] + 1)
+    ]
+    verifiers = default_verifiers() + [
+        (f'Verificador{i}', f'Apellido{i}', f'6{i:08d}', next(zones)) for i in range(len(DEFAULT_ZONES) + 1, sizes['verifiers'] + 1)
+    ]
+    warehouses = default_warehouses() + [
+        (f'Bodega {i}', f'B{i:08d}S', next(zones)) for i in range(len(DEFAULT_ZONES) + 1, sizes['warehouses'] + 1)
+    ]
+    incidents = list(DEFAULT_INCIDENTS) + [
+        (f'INC{i:03d}', f'Incidencia sintética {i}') for i in range(len(DEFAULT_INCIDENTS) + 1, sizes['incidents'] + 1)
+    ]
+    return {'coordinators': coordinators, 'verifiers': verifiers, 'warehouses': warehouses, 'incidents': incidents}
+
+def generate_records(rng, records, sizes, today):
+    """Registros de incidencia (sin id) ordenados por fecha"""
+    start = today - datetime.timedelta(days=HISTORY_DAYS)
+    for index in range(records):
+        date = start + datetime.timedelta(days=HISTORY_DAYS * index // records)
+        yield (
+            date.isoformat(),
+            rng.randint(1, sizes['coordinators']),
+            rng.randint(1, sizes['warehouses']),
+            rng.randint(1, sizes['verifiers']),
+            rng.randint(1, sizes['incidents']),
+            rng.randint(1, sizes['coordinators']),
+            ' '.join(rng.choices(WORDS, k=rng.randint(4, 12))),
+            '',
+            rng.choices(STATUSES, STATUS_WEIGHTS)[0],
+            rng.choice(RESPONSIBLES)
+        )
+
+def generate_actions(rng, records, sizes, today):
+    """Acciones (0 a 4 por registro) posteriores a la fecha de su registro"""
+    start = today - datetime.timedelta(days=HISTORY_DAYS)
+    for record_id in range(1, records + 1):
+        record_date = start + datetime.timedelta(days=HISTORY_DAYS * (record_id - 1) // records)
+        for _ in range(rng.randint(0, 4)):
+            action_date = min(record_date + datetime.timedelta(days=rng.randint(0, 30)), today)
+            yield (
+                record_id,
+                action_date.isoformat(),
+                ' '.join(rng.choices(WORDS, k=rng.randint(3, 8))),
+                rng.choice([None, None] + STATUSES),
+                rng.randint(1, sizes['coordinators'])
+            )
+
+def insert_batches(conn, query, rows):
+    """Inserta las filas de un generador por lotes; retorna el número de filas insertadas"""
+    count = 0
+    while True:
+        batch = list(itertools.islice(rows, INSERT_BATCH_ROWS))
+        if not batch:
+            return count
+        conn.executemany(query, batch)
+        count += len(batch)
+
+def seed_database(path, records, seed=42):
+    """Crea en path una base de datos con records registros de incidencia sintéticos"""
+    if os.path.exists(path):
+        os.remove(path)
+    pool = get_pool(path)
+    apply_sqlite_migrations(pool)
+
+    rng = random.Random(seed)
+    today = datetime.date.today()
+    dimensions = generate_dimensions(records)
+    sizes = {table: len(rows) for table, rows in dimensions.items()}
+
+    def seed_rows(conn):
+        conn.executemany('INSERT INTO coordinators (name, surnames) VALUES (?, ?)', dimensions['coordinators'])
+        conn.executemany('INSERT INTO verifiers (name, surnames, phone, zone) VALUES (?, ?, ?, ?)', dimensions['verifiers'])
+        conn.executemany('INSERT INTO warehouses (name, codigo_consejo, zone) VALUES (?, ?, ?)', dimensions['warehouses'])
+        conn.executemany('INSERT INTO incidents (code, description) VALUES (?, ?)', dimensions['incidents'])
+        record_count = insert_batches(conn, '''
+            INSERT INTO incident_records (date, registering_coordinator_id, warehouse_id, causing_verifier_id,
+                                          incident_id, assigned_coordinator_id, explanation, enlace, status, responsible)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', generate_records(rng, records, sizes, today))
+        action_count = insert_batches(conn, '''
+            INSERT INTO incident_actions (incident_record_id, action_date, action_description, new_status, performed_by)
+            VALUES (?, ?, ?, ?, ?)
+        ''', generate_actions(rng, records, sizes, today))
+        return record_count, action_count
+
+    record_count, action_count = pool.run_write(seed_rows)
+    with pool.connection() as conn:
+        conn.execute('ANALYZE')
+        conn.commit()
+    close_pool(path)
+    logger.info(f"Seeded {path}: {record_count} records, {action_count} actions, {sizes}")
+    return {'incident_records': record_count, 'incident_actions': action_count, **sizes}
+
+def seeded_database(data_dir, records, seed=42):
+    """Ruta de la base de datos sintética de records registros, generándola solo si no existe ya"""
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f'seed_v{SEED_VERSION}_{records}_{seed}.db')
+    if not os.path.exists(path):
+        temp_path = path + '.tmp'
+        seed_database(temp_path, records, seed)
+        os.replace(temp_path, path)
+    return path
+
+def main():
+    parser = argparse.ArgumentParser(description='Genera una base de datos SQLite sintética')
+    parser.add_argument('path', help='Fichero de la base de datos a crear (se sobrescribe)')
+    parser.add_argument('--records', type=int, default=10000, help='Número de registros de incidencia')
+    parser.add_argument('--seed', type=int, default=42, help='Semilla de la generación')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    print(seed_database(args.path, args.records, args.seed))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Prueba de carga con escritores y lectores concurrentes sobre SQLite
+Trabaja sobre una copia de db/cavacrm.db (nunca sobre el fichero original) y verifica:
+1. Que ninguna escritura se pierde por "database is locked"
+2. La latencia de escrituras y lecturas mientras compiten entre sí
+
+Uso: python -m benchmarks.sqlite_concurrency --writers 8 --readers 4 --operations 50
+"""
+
+import argparse
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils.database as database
+
+def percentile(values, fraction):
+    """Percentil aproximado de una lista de latencias"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def prepare_database(source, target_dir):
+    """Copia la base de datos de origen (o crea una vacía) y apunta el módulo de datos a la copia"""
+    target = os.path.join(target_dir, 'cavacrm_stress.db')
+    if os.path.exists(source):
+        shutil.copy(source, target)
+    database.DB_PATH = target
+    database.init_db()
+    return target
+
+def get_reference_ids():
+    """Obtiene ids válidos para las claves foráneas de los registros de prueba, creándolos si faltan"""
+    if not database.get_coordinators():
+        database.insert_coordinator('Stress', 'Coordinador')
+    if not database.get_verifiers():
+        database.insert_verifier('Stress', 'Verificador', '', 'Zona')
+    if not database.get_warehouses():
+        database.insert_warehouse('Stress Bodega', 'STRESS-1', 'Zona')
+    if not database.get_incidents():
+        database.insert_incident('Incidencia de prueba de carga')
+    return {
+        'coordinator': database.get_coordinators()[0]['id'],
+        'verifier': database.get_verifiers()[0]['id'],
+        'warehouse': database.get_warehouses()[0]['id'],
+        'incident': database.get_incidents()[0][0]
+    }
+
+def count_rows(table):
+    with database.db_connection() as conn:
+        return conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+
+def writer(worker_id, operations, ids, latencies):
+    """Inserta registros de incidencia y una acción por registro, como haría un coordinador"""
+    today = datetime.date.today().isoformat()
+    for n in range(operations):
+        start = time.perf_counter()
+        database.insert_incident_record(today, ids['coordinator'], ids['warehouse'], ids['verifier'], ids['incident'],
+                                        ids['coordinator'], f'stress {worker_id}-{n}', '', 'Pendiente', 'Verificador')
+        with database.db_connection() as conn:
+            record_id = conn.execute('SELECT MAX(id) FROM incident_records').fetchone()[0]
+        database.insert_incident_action(record_id, today, f'stress action {worker_id}-{n}', None, ids['coordinator'])
+        latencies.append(time.perf_counter() - start)
+
+def reader(stop, latencies):
+    """Lee las consultas del dashboard en bucle mientras haya escritores activos"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        database.get_dashboard_stats()
+        database.get_pending_incidents_summary()
+        database.get_recent_actions()
+        latencies.append(time.perf_counter() - start)
+
+def run_stress(source, writers, readers, operations):
+    with tempfile.TemporaryDirectory() as target_dir:
+        prepare_database(source, target_dir)
+        ids = get_reference_ids()
+        records_before = count_rows('incident_records')
+        actions_before = count_rows('incident_actions')
+
+        write_latencies, read_latencies = [], []
+        stop = threading.Event()
+        writer_threads = [threading.Thread(target=writer, args=(i, operations, ids, write_latencies)) for i in range(writers)]
+        reader_threads = [threading.Thread(target=reader, args=(stop, read_latencies)) for _ in range(readers)]
+
+        start = time.perf_counter()
+        for thread in reader_threads + writer_threads:
+            thread.start()
+        for thread in writer_threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        stop.set()
+        for thread in reader_threads:
+            thread.join()
+
+        expected = writers * operations
+        return {
+            'elapsed_s': round(elapsed, 3),
+            'expected_writes': expected,
+            'records_written': count_rows('incident_records') - records_before,
+            'actions_written': count_rows('incident_actions') - actions_before,
+            'writes_per_s': round(expected / elapsed, 1) if elapsed else 0,
+            'write_p50_ms': round(percentile(write_latencies, 0.5) * 1000, 1),
+            'write_p95_ms': round(percentile(write_latencies, 0.95) * 1000, 1),
+            'reads': len(read_latencies),
+            'read_p50_ms': round(percentile(read_latencies, 0.5) * 1000, 1),
+            'read_p95_ms': round(percentile(read_latencies, 0.95) * 1000, 1)
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description='Prueba de carga de escrituras concurrentes en SQLite')
+    parser.add_argument('--db', default='db/cavacrm.db', help='Base de datos de origen (se trabaja sobre una copia)')
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--operations', type=int, default=50, help='Registros insertados por cada escritor')
+    args = parser.parse_args()
+
+    print(f"=== PRUEBA DE CONCURRENCIA SQLITE ({args.writers} escritores, {args.readers} lectores) ===")
+    result = run_stress(args.db, args.writers, args.readers, args.operations)
+    for key, value in result.items():
+        print(f"{key}: {value}")
+
+    lost = (result['expected_writes'] - result['records_written']) + (result['expected_writes'] - result['actions_written'])
+    if lost:
+        print(f"❌ Se perdieron {lost} escrituras")
+        return 1
+    print("✅ Todas las escrituras se completaron")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
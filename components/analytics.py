@@ -1,7 +1,10 @@
 import streamlit as st
 import pandas as pd
 import altair as alt
-from utils.database_unified import get_all_incident_records_df, get_all_verifiers_df, get_all_warehouses_df, get_incidents_by_zone, get_incidents_by_verifier, get_incidents_by_warehouse, get_incidents_by_type, get_incidents_by_status, get_assignments_by_verifier
+import utils.database_unified as database_unified
+from utils.database_unified import get_all_incident_records_df, get_all_verifiers_df, get_all_warehouses_df
+from utils.analytics_engine import get_incident_counts
+from utils.search_index import get_search_index, search_mask
 
 def display_filtered_table(title, df_getter):
     st.subheader(title)
@@ -10,9 +13,10 @@ def display_filtered_table(title, df_getter):
         st.warning('No hay datos disponibles.')
         return
     search_term = st.text_input('Búsqueda global', '')
-    if search_term:
-        mask = df.apply(lambda row: row.astype(str).str.contains(search_term, case=False).any(), axis=1)
-        df = df[mask]
+    if search_term.strip():
+        # Índice reutilizado mientras no cambie el contenido de la tabla; la búsqueda es vectorizada
+        search_text = get_search_index(title, df)
+        df = df[search_mask(search_text, search_term)]
     
     # Mapeos de nombres amigables para cada tipo de tabla
     friendly_mappings = {
@@ -108,16 +112,20 @@ def display_chart(title, df_getter, x_col, y_col='count'):
     st.altair_chart(chart, use_container_width=True)
 
 def analytics_incidents():
+    # Los gráficos usan conteos agrupados en la base de datos; solo la tabla necesita las filas
+    analytics = get_incident_counts(database_unified, 'by_zone', 'by_verifier', 'by_warehouse', 'by_type', 'by_status')
     display_filtered_table('Consulta de Incidencias', get_all_incident_records_df)
-    display_chart('Incidencias por Zona', get_incidents_by_zone, 'warehouse_zone')
-    display_chart('Incidencias por Verificador', get_incidents_by_verifier, 'causing_verifier')
-    display_chart('Incidencias por Bodega', get_incidents_by_warehouse, 'warehouse')
-    display_chart('Incidencias por Tipo', get_incidents_by_type, 'incident_type')
-    display_chart('Incidencias por Estado', get_incidents_by_status, 'status')
+    display_chart('Incidencias por Zona', lambda: analytics['by_zone'], 'warehouse_zone')
+    display_chart('Incidencias por Verificador', lambda: analytics['by_verifier'], 'causing_verifier')
+    display_chart('Incidencias por Bodega', lambda: analytics['by_warehouse'], 'warehouse')
+    display_chart('Incidencias por Tipo', lambda: analytics['by_type'], 'incident_type')
+    display_chart('Incidencias por Estado', lambda: analytics['by_status'], 'status')
 
 def analytics_verifiers():
+    # Solo el conteo que muestra esta pestaña, sin cargar las filas de incidencias
+    analytics = get_incident_counts(database_unified, 'assignments_by_verifier')
     display_filtered_table('Consulta de Verificadores', get_all_verifiers_df)
-    display_chart('Asignaciones por Verificador', get_assignments_by_verifier, 'causing_verifier')
+    display_chart('Asignaciones por Verificador', lambda: analytics['assignments_by_verifier'], 'causing_verifier')
 
 def analytics_warehouses():
     display_filtered_table('Consulta de Bodegas', get_all_warehouses_df)
\ No newline at end of file
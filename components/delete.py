@@ -1,7 +1,11 @@
 import streamlit as st
 import os
-from utils.database_unified import reset_database, create_backup, export_incidents_to_excel
+import tempfile
+from utils.database_unified import reset_database, create_backup, export_incidents, export_incidents_incremental, get_export_watermark, save_export_watermark
 from utils.backup_restore import restore_db
+from utils.bootstrap import reset_bootstrap
+from utils.export_engine import EXPORT_FORMATS, read_export, bundle_exports
+from utils.cache_registry import notify_write, ALL_TABLES
 
 def delete_test_data_form():
     st.subheader("Borrar Datos de Prueba")
@@ -32,6 +36,8 @@ def backup_database_form():
     
     st.info("Crea una copia de seguridad de toda la base de datos.")
     
+    compress = st.checkbox("Comprimir la copia (gzip)", key='backup_compress')
+    
     # Botones en la misma fila
     col1, col2 = st.columns(2)
     with col1:
@@ -44,81 +50,137 @@ def backup_database_form():
     
     if backup_button:
         try:
-            backup_path = create_backup()
-            st.success(f"Copia de seguridad creada exitosamente: {backup_path}")
+            backup = create_backup(compress=compress)
+            st.success(f"Copia de seguridad creada exitosamente: {backup['file_name']}")
+            if backup['file_name'].endswith('.zip'):
+                st.caption("Copia verificada (filas y checksums de cada tabla). Las copias de Supabase en .zip son "
+                           "de solo exportación: no se pueden restaurar desde la aplicación.")
             
-            # Ofrecer descarga del archivo
-            if os.path.exists(backup_path):
-                with open(backup_path, 'rb') as f:
-                    st.download_button(
-                        label="Descargar Copia de Seguridad",
-                        data=f.read(),
-                        file_name=os.path.basename(backup_path),
-                        mime="application/octet-stream"
-                    )
+            # Ofrecer descarga del archivo (el buffer se libera al leerlo)
+            st.download_button(
+                label="Descargar Copia de Seguridad",
+                data=read_export(backup),
+                file_name=backup['file_name'],
+                mime=backup['mime']
+            )
         except Exception as e:
             st.error(f"Error al crear la copia de seguridad: {str(e)}")
 
 def export_excel_form():
-    st.subheader("Exportar Historial a Excel")
+    st.subheader("Exportar Historial")
+    
+    st.info("Exporta el historial completo de incidencias y acciones a Excel, CSV comprimido o Parquet. "
+            "CSV y Parquet generan un archivo por conjunto de datos (descargados juntos en un zip) y son mucho más rápidos de generar y cargar con pandas.")
+    
+    export_format = st.selectbox(
+        "Formato de exportación",
+        options=list(EXPORT_FORMATS.keys()),
+        format_func=lambda value: EXPORT_FORMATS[value],
+        key='export_format'
+    )
     
-    st.info("Exporta el historial completo de incidencias y acciones a un archivo Excel.")
+    incremental = st.checkbox(
+        "Exportación incremental (solo registros y acciones nuevos o modificados desde la última exportación)",
+        key='export_incremental'
+    )
+    target = None
+    if incremental:
+        target = st.text_input("Destino de la exportación", value="descarga", key='export_target',
+                               help="Cada destino guarda su propia marca de agua; la primera exportación de un destino incluye todo el historial").strip()
+        if target:
+            watermark = get_export_watermark(target)
+            st.caption(f"Última exportación: registro #{watermark['incident_record_id']}, acción #{watermark['incident_action_id']}")
     
     # Botones en la misma fila
     col1, col2 = st.columns(2)
     with col1:
-        export_button = st.button("Exportar a Excel")
+        export_button = st.button("Exportar")
     with col2:
         if st.button('🏠 Volver al Dashboard', key='export_excel_dashboard_btn'):
+            # Liberar la exportación guardada en la sesión
+            st.session_state.pop('export_download', None)
             st.session_state.main_menu_override = 'Dashboard'
             st.session_state._override_just_set = True
             st.rerun()
     
     if export_button:
+        # Liberar la exportación anterior antes de generar la nueva
+        st.session_state.pop('export_download', None)
         try:
-            with st.spinner("Generando archivo Excel..."):
-                filename = export_incidents_to_excel()
-            
-            st.success(f"✅ Archivo Excel creado exitosamente: {filename}")
+            with st.spinner(f"Generando {EXPORT_FORMATS[export_format]}..."):
+                if incremental:
+                    if not target:
+                        st.error("Indica el destino de la exportación incremental.")
+                        return
+                    exports = export_incidents_incremental(target, export_format)
+                else:
+                    exports = export_incidents(export_format)
+                # La marca de agua de una exportación incremental viaja en el manifiesto (el último fichero)
+                watermark = exports[-1].get('watermark') if incremental else None
+                # Varios ficheros se descargan juntos en un zip: cada descarga provoca un rerun
+                # y solo el primero de varios botones llegaría a usarse
+                export = exports[0] if len(exports) == 1 else bundle_exports(exports)
+                # La descarga se guarda en la sesión para que siga disponible tras cada rerun hasta
+                # confirmar la entrega, generar otra exportación o volver al dashboard
+                # (el buffer se libera al leerlo)
+                st.session_state.export_download = {
+                    'file_name': export['file_name'],
+                    'mime': export['mime'],
+                    'data': read_export(export),
+                    'files': [item['file_name'] for item in exports],
+                    'target': target,
+                    'watermark': watermark,
+                    'confirmed': False
+                }
             
-            # Verificar que el archivo existe antes de ofrecer descarga
-            if os.path.exists(filename):
-                with open(filename, 'rb') as f:
-                    file_data = f.read()
-                
-                # Usar solo el nombre base del archivo para la descarga
-                base_filename = os.path.basename(filename)
-                
-                st.download_button(
-                    label="📥 Descargar Archivo Excel",
-                    data=file_data,
-                    file_name=base_filename,
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                    use_container_width=True
-                )
-                
-                # Mostrar información del archivo
-                file_size = len(file_data)
-                st.info(f"📊 Archivo generado: {base_filename} ({file_size:,} bytes)")
-            else:
-                st.error(f"❌ Error: No se pudo encontrar el archivo generado: {filename}")
+            st.success(f"✅ Exportación creada exitosamente: {', '.join(st.session_state.export_download['files'])}")
                 
         except Exception as e:
-            st.error(f"❌ Error al exportar a Excel: {str(e)}")
-            st.info("💡 Nota: Asegúrate de que openpyxl esté instalado: pip install openpyxl")
+            st.error(f"❌ Error al exportar: {str(e)}")
+            st.info("💡 Nota: Asegúrate de que openpyxl y pyarrow estén instalados: pip install openpyxl pyarrow")
             # Mostrar más detalles del error en modo debug
             with st.expander("Ver detalles del error"):
                 import traceback
                 st.code(traceback.format_exc())
+    
+    download = st.session_state.get('export_download')
+    if download and 'data' in download:
+        st.download_button(
+            label=f"📥 Descargar {download['file_name']}",
+            data=download['data'],
+            file_name=download['file_name'],
+            mime=download['mime'],
+            key='download_export',
+            on_click='ignore',
+            use_container_width=True
+        )
+        
+        # Mostrar información del archivo
+        st.info(f"📊 Archivo generado: {download['file_name']} ({len(download['data']):,} bytes)")
+        
+    # La marca de agua solo avanza (y el registro de cambios solo se depura) al confirmar la entrega
+    if download and download['watermark']:
+        if download['confirmed']:
+            st.success(f"✅ Entrega confirmada: la próxima exportación de '{download['target']}' partirá de esta.")
+        else:
+            st.warning("Confirma la entrega cuando hayas descargado y guardado el archivo. "
+                       "Hasta entonces, la siguiente exportación de este destino volverá a incluir estos registros.")
+            if st.button("✅ Confirmar entrega", key='confirm_export_delivery'):
+                save_export_watermark(download['target'], download['watermark'])
+                download['confirmed'] = True
+                # Entregada la exportación, ya no hace falta conservar su contenido en la sesión
+                download.pop('data', None)
+                st.rerun()
 
 def restore_database_form():
     st.subheader("Restaurar Copia de Seguridad")
     
     st.warning("Esta acción reemplazará completamente la base de datos actual. Asegúrate de hacer una copia de seguridad antes de proceder.")
+    st.caption("Solo se pueden restaurar copias SQLite (.db o .db.gz). Las copias de Supabase (.zip) son de solo exportación.")
     
     uploaded_file = st.file_uploader(
-        "Selecciona el archivo de copia de seguridad (.db)",
-        type=['db'],
+        "Selecciona el archivo de copia de seguridad (.db o .db.gz)",
+        type=['db', 'gz'],
         help="Sube un archivo de copia de seguridad generado previamente"
     )
     
@@ -141,14 +203,19 @@ def restore_database_form():
         
         if restore_button:
             if access_code == "197569":
+                temp_path = None
                 try:
-                    # Guardar el archivo temporalmente
-                    temp_path = f"temp_restore_{uploaded_file.name}"
-                    with open(temp_path, "wb") as f:
+                    # Guardar el archivo temporalmente (fuera del directorio de trabajo)
+                    suffix = '.db.gz' if uploaded_file.name.endswith('.gz') else '.db'
+                    with tempfile.NamedTemporaryFile(prefix='temp_restore_', suffix=suffix, delete=False) as f:
+                        temp_path = f.name
                         f.write(uploaded_file.getbuffer())
                     
                     # Restaurar la base de datos
                     restore_db(temp_path)
+                    notify_write(*ALL_TABLES)
+                    # La copia restaurada puede tener un esquema anterior: inicializar de nuevo
+                    reset_bootstrap()
                     
                     # Limpiar archivo temporal
                     os.remove(temp_path)
@@ -160,7 +227,7 @@ def restore_database_form():
                 except Exception as e:
                     st.error(f"Error al restaurar la base de datos: {str(e)}")
                     # Limpiar archivo temporal en caso de error
-                    if os.path.exists(temp_path):
+                    if temp_path and os.path.exists(temp_path):
                         os.remove(temp_path)
             else:
                 st.error("Código de acceso incorrecto.")
@@ -1,7 +1,8 @@
 import streamlit as st
 import pandas as pd
 import datetime
-from utils.database_unified import insert_coordinator, insert_verifier, insert_warehouse, load_csv_to_verifiers, load_csv_to_warehouses, insert_incident, get_coordinators, get_verifiers, get_warehouses, get_incidents, insert_incident_record, get_incident_records, insert_incident_action, get_incident_actions, get_incident_record_details, search_incident_by_code, get_incident_records_by_incident_code, update_coordinator, update_verifier, update_warehouse, update_incident, update_incident_record, get_coordinator_by_id, get_verifier_by_id, get_warehouse_by_id, get_incident_by_id
+from utils.database_unified import insert_coordinator, insert_verifier, insert_warehouse, load_csv_to_verifiers, load_csv_to_warehouses, insert_incident, get_coordinators, get_verifiers, get_warehouses, get_incidents, insert_incident_record, get_incident_records_page, get_incident_record_option, insert_incident_action, get_incident_actions, get_incident_record_details, search_incident_by_code, get_incident_records_by_incident_code, search_incidents, update_coordinator, update_verifier, update_warehouse, update_incident, update_incident_record, get_coordinator_by_id, get_verifier_by_id, get_warehouse_by_id, get_incident_by_id
+from utils.cache_registry import get_table_version
 
 def coordinator_form():
     st.subheader('Alta de Coordinador')
@@ -106,27 +107,19 @@ def csv_upload(section):
                     st.warning(f'⚠️ Separador detectado automáticamente: "{detected_sep}". Usando separador detectado en lugar de "{separator}".')
                     separator = detected_sep
                 
+                # El fichero se lee una sola vez y por lotes; las columnas se validan con el primer lote
+                progress_bar = st.progress(0.0, text='Procesando CSV...')
+                def show_progress(fraction, partial_report):
+                    progress_bar.progress(fraction, text=f'Procesando CSV... {partial_report["inserted"]} insertados, {partial_report["skipped"]} omitidos')
+                
                 if section == 'Verificadores':
-                    df = pd.read_csv(uploaded_file, sep=separator, encoding='utf-8-sig')
-                    # Limpiar nombres de columnas (eliminar espacios, BOM y caracteres especiales)
-                    df.columns = df.columns.str.strip().str.lower().str.replace(' ', '_').str.replace('ï»¿', '')
-                    required_columns = ['name', 'surnames']
-                    if not all(col in df.columns for col in required_columns):
-                        missing_cols = [col for col in required_columns if col not in df.columns]
-                        available_cols = list(df.columns)
-                        raise ValueError(f'El CSV debe contener las columnas: {", ".join(required_columns)}. Columnas faltantes: {", ".join(missing_cols)}. Columnas disponibles: {", ".join(available_cols)}')
-                    load_csv_to_verifiers(uploaded_file, sep=separator)
+                    report = load_csv_to_verifiers(uploaded_file, sep=separator, progress=show_progress)
                 elif section == 'Bodegas':
-                    df = pd.read_csv(uploaded_file, sep=separator, encoding='utf-8-sig')
-                    # Limpiar nombres de columnas (eliminar espacios, BOM y caracteres especiales)
-                    df.columns = df.columns.str.strip().str.lower().str.replace(' ', '_').str.replace('ï»¿', '')
-                    required_columns = ['name', 'codigo_consejo']
-                    if not all(col in df.columns for col in required_columns):
-                        missing_cols = [col for col in required_columns if col not in df.columns]
-                        available_cols = list(df.columns)
-                        raise ValueError(f'El CSV debe contener las columnas: {", ".join(required_columns)}. Columnas faltantes: {", ".join(missing_cols)}. Columnas disponibles: {", ".join(available_cols)}')
-                    load_csv_to_warehouses(uploaded_file, sep=separator)
-                st.success(f'{section} cargados exitosamente desde CSV.')
+                    report = load_csv_to_warehouses(uploaded_file, sep=separator, progress=show_progress)
+                progress_bar.empty()
+                st.success(f'{section} cargados exitosamente desde CSV: {report["inserted"]} insertados, {report["skipped"]} omitidos.')
+                if report['skipped']:
+                    st.info(f'Omitidos: {report["existing"]} ya existentes, {report["duplicates"]} repetidos en el CSV, {report["invalid"]} sin columnas obligatorias.')
             except Exception as e:
                 st.error(f'Error al cargar el CSV: {str(e)}')
 
@@ -191,8 +184,48 @@ def incident_form():
             st.rerun()
 
 def search_incident_form():
-    """Formulario para buscar incidencias por código"""
-    st.header("🔍 Buscar Incidencia por Código")
+    """Formulario para buscar incidencias por código o por texto de explicaciones y acciones"""
+    st.header("🔍 Buscar Incidencias")
+    
+    # Búsqueda de texto completo en explicaciones y descripciones de acciones
+    st.subheader("📝 Buscar por Texto")
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        text_query = st.text_input(
+            'Palabras en la explicación o en las acciones',
+            key='incident_text_search',
+            placeholder='Ej.: retraso camión',
+            help='Se muestran los registros que contienen todas las palabras (también como inicio de palabra)'
+        )
+    with col2:
+        status_filter = st.selectbox(
+            'Estado',
+            [None, 'Pendiente', 'En Proceso', 'Solucionado', 'Asignado a Técnicos', 'RRHH'],
+            format_func=lambda x: 'Todos' if x is None else x,
+            key='incident_text_search_status'
+        )
+    
+    if text_query.strip():
+        results = search_incidents(text_query, {'status': status_filter}, limit=50)
+        if results.empty:
+            st.info("ℹ️ No se encontraron registros que contengan esas palabras")
+        else:
+            st.success(f"✅ {len(results)} registros encontrados")
+            st.dataframe(results.rename(columns={
+                'id': 'ID',
+                'date': 'Fecha',
+                'warehouse': 'Bodega',
+                'warehouse_zone': 'Zona de Bodega',
+                'causing_verifier': 'Verificador Causante',
+                'incident_type': 'Tipo de Incidencia',
+                'assigned_coordinator': 'Coordinador Asignado',
+                'explanation': 'Explicación',
+                'status': 'Estado',
+                'responsible': 'Responsable'
+            }), use_container_width=True, hide_index=True)
+    
+    st.markdown("---")
+    st.subheader("🏷️ Buscar por Código")
     
     # Obtener todas las incidencias disponibles
     incidents = get_incidents()
@@ -418,6 +451,74 @@ def incident_record_form():
         else:
             st.warning('⚠️ Primero debe guardar el registro de incidencia para poder gestionarlo.')
 
+# Tablas de las que sale el texto de cada registro en los selectores paginados
+INCIDENT_RECORD_OPTION_TABLES = ('incident_records', 'coordinators', 'warehouses', 'verifiers', 'incidents')
+
+def load_next_incident_records_page(state_key):
+    """Añade a los registros cargados solo la página siguiente a la última"""
+    state = st.session_state[state_key]
+    page = get_incident_records_page(state['search'], state['next_cursor'])
+    # El registro seleccionado puede estar ya cargado al principio de la lista (ver select_incident_record)
+    loaded_ids = {record[0] for record in state['records']}
+    state['records'] = state['records'] + [record for record in page['records'] if record[0] not in loaded_ids]
+    state['next_cursor'] = page['next_cursor']
+
+def select_incident_record(key, label, selected_id=None, selectbox_key=None):
+    """Búsqueda paginada de registros de incidencia: solo se consultan las páginas que coinciden con la búsqueda
+    
+    Retorna la tupla (id, texto) del registro seleccionado, o None si no hay registros que mostrar
+    o el registro seleccionado previamente ya no existe y aún no se ha elegido otro.
+    """
+    search = st.text_input('🔍 Buscar registro', key=f'{key}_search',
+                           placeholder='ID, bodega, verificador, incidencia, coordinador o explicación')
+    
+    # Registros ya cargados y cursor de la página siguiente para la búsqueda actual; se reinician
+    # al cambiar la búsqueda o al escribirse en las tablas que forman el texto de cada registro
+    state_key = f'{key}_pages'
+    version = get_table_version(*INCIDENT_RECORD_OPTION_TABLES)
+    state = st.session_state.get(state_key)
+    if not state or state['search'] != search or state['version'] != version:
+        page = get_incident_records_page(search)
+        state = {'search': search, 'version': version, 'records': page['records'], 'next_cursor': page['next_cursor']}
+        st.session_state[state_key] = state
+    
+    # Si el registro seleccionado no está entre las páginas cargadas (p. ej. se cargó con "Cargar más"
+    # y el estado se ha reiniciado tras una escritura), se añade al principio para no perder la selección
+    if selected_id and all(record[0] != selected_id for record in state['records']):
+        selected_option = get_incident_record_option(selected_id)
+        if selected_option:
+            state['records'] = [selected_option] + state['records']
+    
+    records = state['records']
+    
+    if not records:
+        if search:
+            st.info('No se encontraron registros que coincidan con la búsqueda.')
+        else:
+            st.warning('No hay registros de incidencias disponibles. Por favor, registre uno primero.')
+            st.info('💡 Puede registrar una incidencia desde el menú "Incidencias" → "Registro de Incidencia"')
+        return None
+    
+    # Encontrar el índice del registro previamente seleccionado; si ya no existe no se
+    # selecciona otro en su lugar (el selector queda vacío hasta que el usuario elija)
+    default_index = 0
+    if selected_id:
+        default_index = next((i for i, record in enumerate(records) if record[0] == selected_id), None)
+    
+    selected_record = st.selectbox(
+        label,
+        options=records,
+        format_func=lambda x: x[1],
+        index=default_index,
+        key=selectbox_key or f'{key}_select'
+    )
+    
+    if state['next_cursor'] is not None:
+        st.button(f'Cargar más registros ({len(records)} mostrados)', key=f'{key}_more',
+                  on_click=load_next_incident_records_page, args=(state_key,))
+    
+    return selected_record
+
 def manage_incident_actions_form():
     st.subheader('Gestión de Acciones de Incidencia')
     
@@ -443,31 +544,19 @@ def manage_incident_actions_form():
         st.session_state['loading_large_dataset'] = False
     
     try:
-        incident_records = get_incident_records()
-        if not incident_records:
-            st.warning('No hay registros de incidencias disponibles. Por favor, registre uno primero.')
-            st.info('💡 Puede registrar una incidencia desde el menú "Incidencias" → "Registro de Incidencia"')
-            return
+        selected_record = select_incident_record(
+            'inc_act_record',
+            'Seleccionar Registro de Incidencia',
+            selected_id=st.session_state.selected_incident_record_id,
+            selectbox_key=f'inc_act_record_{st.session_state.incident_actions_counter}'
+        )
     except Exception as e:
         st.error(f'Error al cargar registros de incidencias: {e}')
         st.info('💡 Verifique la conexión a la base de datos')
         return
+    if selected_record is None:
+        return
     
-    # Encontrar el índice del registro previamente seleccionado
-    default_index = 0
-    if st.session_state.selected_incident_record_id:
-        for i, record in enumerate(incident_records):
-            if record[0] == st.session_state.selected_incident_record_id:
-                default_index = i
-                break
-    
-    selected_record = st.selectbox(
-        'Seleccionar Registro de Incidencia', 
-        options=incident_records, 
-        format_func=lambda x: x[1], 
-        index=default_index,
-        key=f'inc_act_record_{st.session_state.incident_actions_counter}'
-    )
     incident_record_id = selected_record[0]
     
     # Actualizar el ID seleccionado en session_state
@@ -707,18 +796,11 @@ def edit_incident_record_form():
     st.subheader('📝 Editar Registro de Incidencia')
     st.info('Esta opción permite editar los detalles de un registro específico de incidencia ya creado.')
     
-    # Obtener todos los registros de incidencia
-    incident_records = get_incident_records()
-    if not incident_records:
-        st.warning('No hay registros de incidencias disponibles. Por favor, registre uno primero.')
-        return
-    
-    # Selector de registro de incidencia
-    record_options = {rec[1]: rec[0] for rec in incident_records}
-    selected_record = st.selectbox('Seleccionar registro de incidencia a editar:', list(record_options.keys()))
+    # Buscar y seleccionar el registro de incidencia (solo se cargan las páginas que coinciden)
+    selected_record = select_incident_record('edit_incident_record', 'Seleccionar registro de incidencia a editar:')
     
     if selected_record:
-        record_id = record_options[selected_record]
+        record_id = selected_record[0]
         record_data = get_incident_record_details(record_id)
         
         if record_data:
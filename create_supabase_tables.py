@@ -1,99 +1,13 @@
 """Script para crear las tablas en Supabase"""
 
 from supabase_config import get_supabase_client
+from utils.migrations import apply_supabase_migrations, pending_supabase_migrations
 import logging
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# SQL para crear las tablas en PostgreSQL (Supabase)
-CREATE_TABLES_SQL = [
-    # Tabla coordinators
-    """
-    CREATE TABLE IF NOT EXISTS coordinators (
-        id SERIAL PRIMARY KEY,
-        name TEXT NOT NULL,
-        surnames TEXT NOT NULL
-    );
-    """,
-    
-    # Tabla verifiers
-    """
-    CREATE TABLE IF NOT EXISTS verifiers (
-        id SERIAL PRIMARY KEY,
-        name TEXT NOT NULL,
-        surnames TEXT NOT NULL,
-        phone TEXT,
-        zone TEXT
-    );
-    """,
-    
-    # Tabla warehouses
-    """
-    CREATE TABLE IF NOT EXISTS warehouses (
-        id SERIAL PRIMARY KEY,
-        name TEXT NOT NULL,
-        nif TEXT NOT NULL,
-        zone TEXT
-    );
-    """,
-    
-    # Tabla incidents
-    """
-    CREATE TABLE IF NOT EXISTS incidents (
-        id SERIAL PRIMARY KEY,
-        code TEXT UNIQUE,
-        description TEXT NOT NULL
-    );
-    """,
-    
-    # Tabla incident_records
-    """
-    CREATE TABLE IF NOT EXISTS incident_records (
-        id SERIAL PRIMARY KEY,
-        date DATE NOT NULL,
-        registering_coordinator_id INTEGER NOT NULL,
-        warehouse_id INTEGER NOT NULL,
-        causing_verifier_id INTEGER NOT NULL,
-        incident_id INTEGER NOT NULL,
-        assigned_coordinator_id INTEGER NOT NULL,
-        explanation TEXT,
-        status TEXT NOT NULL,
-        responsible TEXT NOT NULL,
-        FOREIGN KEY (registering_coordinator_id) REFERENCES coordinators(id),
-        FOREIGN KEY (warehouse_id) REFERENCES warehouses(id),
-        FOREIGN KEY (causing_verifier_id) REFERENCES verifiers(id),
-        FOREIGN KEY (incident_id) REFERENCES incidents(id),
-        FOREIGN KEY (assigned_coordinator_id) REFERENCES coordinators(id)
-    );
-    """,
-    
-    # Tabla incident_actions
-    """
-    CREATE TABLE IF NOT EXISTS incident_actions (
-        id SERIAL PRIMARY KEY,
-        incident_record_id INTEGER NOT NULL,
-        action_date DATE NOT NULL,
-        action_description TEXT NOT NULL,
-        new_status TEXT,
-        performed_by INTEGER NOT NULL,
-        FOREIGN KEY (incident_record_id) REFERENCES incident_records(id),
-        FOREIGN KEY (performed_by) REFERENCES coordinators(id)
-    );
-    """
-]
-
-# Índices para optimizar consultas
-CREATE_INDEXES_SQL = [
-    "CREATE INDEX IF NOT EXISTS idx_warehouses_zone ON warehouses(zone);",
-    "CREATE INDEX IF NOT EXISTS idx_verifiers_zone ON verifiers(zone);",
-    "CREATE INDEX IF NOT EXISTS idx_incident_records_status ON incident_records(status);",
-    "CREATE INDEX IF NOT EXISTS idx_incident_records_warehouse_id ON incident_records(warehouse_id);",
-    "CREATE INDEX IF NOT EXISTS idx_incident_records_causing_verifier_id ON incident_records(causing_verifier_id);",
-    "CREATE INDEX IF NOT EXISTS idx_incident_records_incident_id ON incident_records(incident_id);"
-]
-
 def create_tables():
     """Crea todas las tablas en Supabase usando RPC"""
     try:
@@ -101,14 +15,14 @@ def create_tables():
         
         logger.info("Creando tablas en Supabase...")
         
-        # Crear todas las tablas en una sola llamada RPC
-        full_sql = "\n".join(CREATE_TABLES_SQL + CREATE_INDEXES_SQL)
-        
-        logger.info("Ejecutando SQL completo...")
+        # Aplicar las migraciones pendientes (supabase_*.sql) con la RPC personalizada execute_sql
+        pending = pending_supabase_migrations(client)
+        logger.info(f"Migraciones pendientes: {[f'{m.version:04d}_{m.name}' for m in pending]}")
         try:
-            # Intentar usar la función RPC personalizada
-            result = client.rpc('execute_sql', {'query': full_sql}).execute()
-            logger.info("✅ Tablas creadas usando RPC personalizada")
+            applied = apply_supabase_migrations(client)
+            if len(applied) < len(pending):
+                raise RuntimeError("la RPC execute_sql no está disponible o alguna migración falló")
+            logger.info("✅ Migraciones aplicadas usando RPC personalizada")
         except Exception as rpc_error:
             logger.warning(f"RPC personalizada falló: {rpc_error}")
             logger.info("Intentando crear tablas individualmente...")
@@ -0,0 +1,21 @@
+-- Exportaciones incrementales: marca de agua por destino y registro de cambios de incidencias
+
+-- Última posición exportada para cada destino (p. ej. la sincronización nocturna)
+CREATE TABLE IF NOT EXISTS export_watermarks (
+    target TEXT PRIMARY KEY,
+    incident_record_id INTEGER NOT NULL DEFAULT 0,
+    incident_action_id INTEGER NOT NULL DEFAULT 0,
+    change_id INTEGER NOT NULL DEFAULT 0,
+    exported_at TEXT NOT NULL
+);
+
+-- Registros de incidencia modificados (estado, asignación, explicación...) desde su creación
+CREATE TABLE IF NOT EXISTS incident_record_changes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    incident_record_id INTEGER NOT NULL,
+    changed_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TRIGGER IF NOT EXISTS incident_record_changes_update AFTER UPDATE ON incident_records BEGIN
+    INSERT INTO incident_record_changes (incident_record_id) VALUES (new.id);
+END;
@@ -0,0 +1,21 @@
+-- Índices compuestos para las consultas frecuentes (ver python -m benchmarks.query_plans)
+
+-- Acciones de un registro en orden cronológico (get_incident_actions y triggers de búsqueda)
+CREATE INDEX IF NOT EXISTS idx_incident_actions_record_date ON incident_actions(incident_record_id, action_date);
+
+-- Últimas acciones (get_recent_actions)
+CREATE INDEX IF NOT EXISTS idx_incident_actions_date ON incident_actions(action_date);
+
+-- Registros por fecha: pendientes recientes, filtro por fecha y paginación por (date, id)
+CREATE INDEX IF NOT EXISTS idx_incident_records_date ON incident_records(date, id);
+
+-- Filtro por estado ordenado por fecha; también cubre el conteo por estado del dashboard
+CREATE INDEX IF NOT EXISTS idx_incident_records_status_date ON incident_records(status, date);
+DROP INDEX IF EXISTS idx_incident_records_status;
+
+-- Incidencias pendientes de un coordinador (dashboard y filtros)
+CREATE INDEX IF NOT EXISTS idx_incident_records_coordinator_status_date ON incident_records(assigned_coordinator_id, status, date);
+
+-- Registros de un tipo de incidencia ordenados por fecha (búsqueda por código)
+CREATE INDEX IF NOT EXISTS idx_incident_records_incident_date ON incident_records(incident_id, date);
+DROP INDEX IF EXISTS idx_incident_records_incident_id;
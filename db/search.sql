@@ -0,0 +1,43 @@
+-- Índice de texto completo (FTS5) sobre explicaciones de incidencias y descripciones de acciones
+-- Una fila por registro de incidencia (rowid = incident_records.id), mantenida por triggers
+
+CREATE VIRTUAL TABLE IF NOT EXISTS incident_search USING fts5(
+    explanation,
+    actions,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+
+-- Registros de incidencia
+CREATE TRIGGER IF NOT EXISTS incident_search_record_insert AFTER INSERT ON incident_records BEGIN
+    INSERT INTO incident_search (rowid, explanation, actions) VALUES (new.id, new.explanation, '');
+END;
+
+CREATE TRIGGER IF NOT EXISTS incident_search_record_update AFTER UPDATE OF explanation ON incident_records BEGIN
+    UPDATE incident_search SET explanation = new.explanation WHERE rowid = new.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS incident_search_record_delete AFTER DELETE ON incident_records BEGIN
+    DELETE FROM incident_search WHERE rowid = old.id;
+END;
+
+-- Acciones: se recalcula el texto de todas las acciones del registro afectado
+CREATE TRIGGER IF NOT EXISTS incident_search_action_insert AFTER INSERT ON incident_actions BEGIN
+    UPDATE incident_search
+    SET actions = (SELECT group_concat(action_description, ' ') FROM incident_actions WHERE incident_record_id = new.incident_record_id)
+    WHERE rowid = new.incident_record_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS incident_search_action_update AFTER UPDATE OF action_description, incident_record_id ON incident_actions BEGIN
+    UPDATE incident_search
+    SET actions = coalesce((SELECT group_concat(action_description, ' ') FROM incident_actions WHERE incident_record_id = old.incident_record_id), '')
+    WHERE rowid = old.incident_record_id;
+    UPDATE incident_search
+    SET actions = (SELECT group_concat(action_description, ' ') FROM incident_actions WHERE incident_record_id = new.incident_record_id)
+    WHERE rowid = new.incident_record_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS incident_search_action_delete AFTER DELETE ON incident_actions BEGIN
+    UPDATE incident_search
+    SET actions = coalesce((SELECT group_concat(action_description, ' ') FROM incident_actions WHERE incident_record_id = old.incident_record_id), '')
+    WHERE rowid = old.incident_record_id;
+END;
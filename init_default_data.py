@@ -10,6 +10,7 @@ from utils.database_unified import (
     get_db_connection, insert_coordinator, insert_verifier, 
     insert_warehouse, insert_incident
 )
+from utils.default_data import DEFAULT_COORDINATORS, DEFAULT_INCIDENTS, DEFAULT_ZONES, default_verifiers, default_warehouses
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -23,11 +24,7 @@ def init_default_coordinators():
         
         if count == 0:
             logger.info("Añadiendo coordinadores por defecto...")
-            coordinators = [
-                ("Admin", "Sistema"),
-                ("Coordinador", "Principal"),
-                ("Supervisor", "General")
-            ]
+            coordinators = DEFAULT_COORDINATORS
             
             for name, surnames in coordinators:
                 insert_coordinator(name, surnames)
@@ -48,16 +45,7 @@ def init_default_incidents():
         
         if count == 0:
             logger.info("Añadiendo tipos de incidencia por defecto...")
-            incidents = [
-                ("INC001", "Problema de calidad del producto"),
-                ("INC002", "Retraso en la entrega"),
-                ("INC003", "Documentación incorrecta"),
-                ("INC004", "Problema de temperatura"),
-                ("INC005", "Daño en el transporte"),
-                ("INC006", "Cantidad incorrecta"),
-                ("INC007", "Problema de etiquetado"),
-                ("INC008", "Incumplimiento de especificaciones")
-            ]
+            incidents = DEFAULT_INCIDENTS
             
             for code, description in incidents:
                 insert_incident(code, description)
@@ -71,7 +59,7 @@ def init_default_incidents():
 
 def init_default_zones_data():
     """Inicializa verificadores y bodegas por defecto para cada zona"""
-    zones = ["PENEDÈS", "ALT CAMP", "CONCA DE BARBERÀ", "ALMENDRALEJO", "REQUENA", "CARIÑENA"]
+    zones = DEFAULT_ZONES
     
     try:
         # Verificar si ya hay verificadores
@@ -83,8 +71,8 @@ def init_default_zones_data():
         # Añadir verificadores por defecto
         if verifier_count == 0:
             logger.info("Añadiendo verificadores por defecto...")
-            for i, zone in enumerate(zones, 1):
-                insert_verifier(f"Verificador{i}", f"Zona{zone}", f"60000000{i}", zone)
+            for name, surnames, phone, zone in default_verifiers(zones):
+                insert_verifier(name, surnames, phone, zone)
             logger.info(f"Añadidos {len(zones)} verificadores por defecto")
         else:
             logger.info(f"Ya existen {verifier_count} verificadores, omitiendo inicialización")
@@ -92,8 +80,8 @@ def init_default_zones_data():
         # Añadir bodegas por defecto
         if warehouse_count == 0:
             logger.info("Añadiendo bodegas por defecto...")
-            for i, zone in enumerate(zones, 1):
-                insert_warehouse(f"Bodega {zone}", f"B{12345678+i:08d}A", zone)
+            for name, codigo_consejo, zone in default_warehouses(zones):
+                insert_warehouse(name, codigo_consejo, zone)
             logger.info(f"Añadidas {len(zones)} bodegas por defecto")
         else:
             logger.info(f"Ya existen {warehouse_count} bodegas, omitiendo inicialización")
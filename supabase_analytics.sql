@@ -0,0 +1,97 @@
+-- Funciones de agregación para la página de análisis y el dashboard
+-- Ejecutar este script en el SQL Editor del dashboard de Supabase después de supabase_schema.sql
+-- Se exponen como RPC (client.rpc('nombre_funcion')) y devuelven conteos ya agrupados
+
+-- Incidencias por zona de bodega
+CREATE OR REPLACE FUNCTION incidents_by_zone()
+RETURNS TABLE (warehouse_zone TEXT, "count" BIGINT)
+LANGUAGE sql STABLE AS $$
+    SELECT w.zone::TEXT, COUNT(*)
+    FROM incident_records ir
+    JOIN warehouses w ON ir.warehouse_id = w.id
+    WHERE w.zone IS NOT NULL
+    GROUP BY w.zone
+    ORDER BY w.zone;
+$$;
+
+-- Incidencias por verificador causante
+CREATE OR REPLACE FUNCTION incidents_by_verifier()
+RETURNS TABLE (causing_verifier TEXT, "count" BIGINT)
+LANGUAGE sql STABLE AS $$
+    SELECT v.name || ' ' || v.surnames, COUNT(*)
+    FROM incident_records ir
+    JOIN verifiers v ON ir.causing_verifier_id = v.id
+    GROUP BY 1
+    ORDER BY 1;
+$$;
+
+-- Incidencias por bodega
+CREATE OR REPLACE FUNCTION incidents_by_warehouse()
+RETURNS TABLE (warehouse TEXT, "count" BIGINT)
+LANGUAGE sql STABLE AS $$
+    SELECT w.name::TEXT, COUNT(*)
+    FROM incident_records ir
+    JOIN warehouses w ON ir.warehouse_id = w.id
+    GROUP BY w.name
+    ORDER BY w.name;
+$$;
+
+-- Incidencias por tipo
+CREATE OR REPLACE FUNCTION incidents_by_type()
+RETURNS TABLE (incident_type TEXT, "count" BIGINT)
+LANGUAGE sql STABLE AS $$
+    SELECT i.description, COUNT(*)
+    FROM incident_records ir
+    JOIN incidents i ON ir.incident_id = i.id
+    GROUP BY i.description
+    ORDER BY i.description;
+$$;
+
+-- Incidencias por estado
+CREATE OR REPLACE FUNCTION incidents_by_status()
+RETURNS TABLE (status TEXT, "count" BIGINT)
+LANGUAGE sql STABLE AS $$
+    SELECT ir.status::TEXT, COUNT(*)
+    FROM incident_records ir
+    WHERE ir.status IS NOT NULL
+    GROUP BY ir.status
+    ORDER BY ir.status;
+$$;
+
+-- Incidencias asignadas a verificadores (responsable = 'Verificador')
+CREATE OR REPLACE FUNCTION assignments_by_verifier()
+RETURNS TABLE (causing_verifier TEXT, "count" BIGINT)
+LANGUAGE sql STABLE AS $$
+    SELECT v.name || ' ' || v.surnames, COUNT(*)
+    FROM incident_records ir
+    JOIN verifiers v ON ir.causing_verifier_id = v.id
+    WHERE ir.responsible = 'Verificador'
+    GROUP BY 1
+    ORDER BY 1;
+$$;
+
+-- Conteo por estado junto con las incidencias de los últimos 7 días (dashboard)
+CREATE OR REPLACE FUNCTION dashboard_stats()
+RETURNS TABLE (status TEXT, "count" BIGINT, recent BIGINT)
+LANGUAGE sql STABLE AS $$
+    SELECT ir.status::TEXT, COUNT(*),
+           SUM(CASE WHEN ir.date >= now() - interval '7 days' THEN 1 ELSE 0 END)
+    FROM incident_records ir
+    GROUP BY ir.status
+    ORDER BY 2 DESC;
+$$;
+
+-- Permitir la ejecución desde la API
+GRANT EXECUTE ON FUNCTION incidents_by_zone() TO anon, authenticated;
+GRANT EXECUTE ON FUNCTION incidents_by_verifier() TO anon, authenticated;
+GRANT EXECUTE ON FUNCTION incidents_by_warehouse() TO anon, authenticated;
+GRANT EXECUTE ON FUNCTION incidents_by_type() TO anon, authenticated;
+GRANT EXECUTE ON FUNCTION incidents_by_status() TO anon, authenticated;
+GRANT EXECUTE ON FUNCTION assignments_by_verifier() TO anon, authenticated;
+GRANT EXECUTE ON FUNCTION dashboard_stats() TO anon, authenticated;
+
+-- Registrar la migración (ver utils/migrations.py)
+INSERT INTO schema_migrations (version, name) VALUES (2, 'analytics_functions') ON CONFLICT (version) DO NOTHING;
+
+-- Mensaje de confirmación
+SELECT 'Funciones de análisis creadas exitosamente en Supabase' as resultado;
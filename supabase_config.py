@@ -15,6 +15,12 @@ def get_supabase_client() -> Client:
     """Obtiene el cliente de Supabase (singleton)"""
     global _supabase_client
     
+    if _supabase_client is None and os.environ.get("SUPABASE_FAKE_DB"):
+        # Cliente simulado sobre SQLite para pruebas y benchmarks sin red (ver supabase_fake.py)
+        from supabase_fake import FakeSupabaseClient
+        latency = float(os.environ.get("SUPABASE_FAKE_LATENCY_MS", "0")) / 1000
+        _supabase_client = FakeSupabaseClient(os.environ["SUPABASE_FAKE_DB"], latency=latency)
+    
     if _supabase_client is None:
         # Permitir override desde variables de entorno para mayor seguridad
         url = os.environ.get("SUPABASE_URL", SUPABASE_URL)
@@ -0,0 +1,38 @@
+-- Exportaciones incrementales: marca de agua por destino y registro de cambios de incidencias
+-- Ejecutar este script en el SQL Editor del dashboard de Supabase después de supabase_schema.sql
+
+-- Última posición exportada para cada destino (p. ej. la sincronización nocturna)
+CREATE TABLE IF NOT EXISTS export_watermarks (
+    target VARCHAR(100) PRIMARY KEY,
+    incident_record_id BIGINT NOT NULL DEFAULT 0,
+    incident_action_id BIGINT NOT NULL DEFAULT 0,
+    change_id BIGINT NOT NULL DEFAULT 0,
+    exported_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+-- Registros de incidencia modificados (estado, asignación, explicación...) desde su creación
+CREATE TABLE IF NOT EXISTS incident_record_changes (
+    id BIGSERIAL PRIMARY KEY,
+    incident_record_id INTEGER NOT NULL,
+    changed_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+CREATE OR REPLACE FUNCTION incident_record_changes_trigger()
+RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO incident_record_changes (incident_record_id) VALUES (NEW.id);
+    RETURN NULL;
+END;
+$$;
+
+-- Se ignoran las actualizaciones que solo recalculan search_vector (ver supabase_search.sql)
+DROP TRIGGER IF EXISTS incident_record_changes_update ON incident_records;
+CREATE TRIGGER incident_record_changes_update
+    AFTER UPDATE ON incident_records
+    FOR EACH ROW
+    WHEN ((to_jsonb(OLD) - 'search_vector') IS DISTINCT FROM (to_jsonb(NEW) - 'search_vector'))
+    EXECUTE FUNCTION incident_record_changes_trigger();
+
+-- Registrar la migración (ver utils/migrations.py)
+INSERT INTO schema_migrations (version, name) VALUES (4, 'incremental_export_tracking') ON CONFLICT (version) DO NOTHING;
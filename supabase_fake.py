@@ -0,0 +1,731 @@
+"""Cliente de Supabase simulado sobre SQLite para pruebas y benchmarks sin red
+
+Implementa la parte de la API del cliente supabase-py (PostgREST) que usa
+utils/database_supabase.py, ejecutando cada petición sobre una base de datos SQLite
+local con un esquema equivalente al de Supabase:
+
+- table()/from_(): select (con count='exact' y recursos embebidos, también !inner y
+  filtros sobre ellos), insert (una fila o lista), update, upsert y delete.
+- Filtros: eq, neq, gt, gte, lt, lte, like, ilike, is_, in_, or_ (con and()/or()
+  anidados) y filter(); el operador fts sobre search_vector se aproxima con LIKE sobre
+  la explicación y las acciones del registro.
+- order (varias columnas), limit y range, con el límite de filas por respuesta de
+  PostgREST (max_rows).
+- rpc(): las funciones de supabase_analytics.sql reescritas para SQLite. Las demás
+  (p. ej. execute_sql) fallan como una función inexistente en PostgREST.
+
+Cada execute() cuenta como una petición HTTP: se suma a request_count y espera la
+latencia configurada, de modo que los benchmarks miden tiempos y número de peticiones
+como contra un proyecto real. Los errores se lanzan como postgrest.exceptions.APIError.
+
+Uso:
+    client = FakeSupabaseClient('fake.db', latency=0.02)
+    use_fake_client(client)   # utils.database_supabase pasa a usar este cliente
+
+o bien, sin tocar el código, con las variables de entorno SUPABASE_FAKE_DB y
+SUPABASE_FAKE_LATENCY_MS (ver supabase_config.get_supabase_client).
+"""
+
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from postgrest.exceptions import APIError
+from utils.migrations import SUPABASE_MIGRATIONS
+
+logger = logging.getLogger(__name__)
+
+# Límite de filas por respuesta (db-max-rows de PostgREST en Supabase)
+DEFAULT_MAX_ROWS = 1000
+
+# Valores por lista IN en las consultas de recursos embebidos
+EMBED_BATCH_SIZE = 500
+
+# Esquema de supabase_schema.sql y supabase_export.sql en SQLite. Como en el proyecto
+# en producción, warehouses usa la columna nif en lugar de codigo_consejo
+FAKE_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    applied_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS coordinators (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    surnames TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS verifiers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    surnames TEXT NOT NULL,
+    phone TEXT,
+    zone TEXT
+);
+
+CREATE TABLE IF NOT EXISTS warehouses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    nif TEXT,
+    zone TEXT
+);
+
+CREATE TABLE IF NOT EXISTS incidents (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    code TEXT NOT NULL UNIQUE,
+    description TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS incident_records (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    date TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    registering_coordinator_id INTEGER REFERENCES coordinators(id),
+    warehouse_id INTEGER REFERENCES warehouses(id),
+    causing_verifier_id INTEGER REFERENCES verifiers(id),
+    incident_id INTEGER REFERENCES incidents(id),
+    assigned_coordinator_id INTEGER REFERENCES coordinators(id),
+    explanation TEXT,
+    enlace TEXT,
+    status TEXT DEFAULT 'Pendiente',
+    responsible TEXT
+);
+
+CREATE TABLE IF NOT EXISTS incident_actions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    incident_record_id INTEGER REFERENCES incident_records(id) ON DELETE CASCADE,
+    action_date TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    action_description TEXT NOT NULL,
+    new_status TEXT,
+    performed_by TEXT
+);
+
+CREATE TABLE IF NOT EXISTS export_watermarks (
+    target TEXT PRIMARY KEY,
+    incident_record_id INTEGER NOT NULL DEFAULT 0,
+    incident_action_id INTEGER NOT NULL DEFAULT 0,
+    change_id INTEGER NOT NULL DEFAULT 0,
+    exported_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS incident_record_changes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    incident_record_id INTEGER NOT NULL,
+    changed_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TRIGGER IF NOT EXISTS incident_record_changes_update AFTER UPDATE ON incident_records BEGIN
+    INSERT INTO incident_record_changes (incident_record_id) VALUES (new.id);
+END;
+
+CREATE INDEX IF NOT EXISTS idx_incident_records_date ON incident_records(date);
+CREATE INDEX IF NOT EXISTS idx_incident_records_status ON incident_records(status);
+CREATE INDEX IF NOT EXISTS idx_incident_records_warehouse ON incident_records(warehouse_id);
+CREATE INDEX IF NOT EXISTS idx_incident_records_coordinator ON incident_records(assigned_coordinator_id);
+CREATE INDEX IF NOT EXISTS idx_incident_actions_record ON incident_actions(incident_record_id);
+CREATE INDEX IF NOT EXISTS idx_incident_actions_date ON incident_actions(action_date);
+'''
+
+# Funciones RPC de supabase_analytics.sql en SQLite
+RPC_FUNCTIONS = {
+    'incidents_by_zone': '''
+        SELECT w.zone AS warehouse_zone, COUNT(*) AS count
+        FROM incident_records ir JOIN warehouses w ON ir.warehouse_id = w.id
+        WHERE w.zone IS NOT NULL GROUP BY w.zone ORDER BY w.zone''',
+    'incidents_by_verifier': '''
+        SELECT v.name || ' ' || v.surnames AS causing_verifier, COUNT(*) AS count
+        FROM incident_records ir JOIN verifiers v ON ir.causing_verifier_id = v.id
+        GROUP BY 1 ORDER BY 1''',
+    'incidents_by_warehouse': '''
+        SELECT w.name AS warehouse, COUNT(*) AS count
+        FROM incident_records ir JOIN warehouses w ON ir.warehouse_id = w.id
+        GROUP BY w.name ORDER BY w.name''',
+    'incidents_by_type': '''
+        SELECT i.description AS incident_type, COUNT(*) AS count
+        FROM incident_records ir JOIN incidents i ON ir.incident_id = i.id
+        GROUP BY i.description ORDER BY i.description''',
+    'incidents_by_status': '''
+        SELECT ir.status AS status, COUNT(*) AS count
+        FROM incident_records ir WHERE ir.status IS NOT NULL
+        GROUP BY ir.status ORDER BY ir.status''',
+    'assignments_by_verifier': '''
+        SELECT v.name || ' ' || v.surnames AS causing_verifier, COUNT(*) AS count
+        FROM incident_records ir JOIN verifiers v ON ir.causing_verifier_id = v.id
+        WHERE ir.responsible = 'Verificador' GROUP BY 1 ORDER BY 1''',
+    'dashboard_stats': '''
+        SELECT ir.status AS status, COUNT(*) AS count,
+               SUM(CASE WHEN ir.date >= datetime('now', '-7 days') THEN 1 ELSE 0 END) AS recent
+        FROM incident_records ir GROUP BY ir.status ORDER BY 2 DESC'''
+}
+
+# Columnas tsvector simuladas: tabla -> {columna: (columnas de texto, (tabla hija, fk, columna de texto))}
+SEARCH_COLUMNS = {
+    'incident_records': {
+        'search_vector': (('explanation',), (('incident_actions', 'incident_record_id', 'action_description'),))
+    }
+}
+
+# Operadores de comparación de PostgREST
+COMPARISON_OPERATORS = {'eq': '=', 'neq': '<>', 'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<='}
+
+FakeResponse = namedtuple('FakeResponse', ['data', 'count'])
+
+def api_error(message, code, hint=None):
+    return APIError({'message': message, 'code': code, 'hint': hint, 'details': None})
+
+def quote(identifier):
+    return '"' + identifier.replace('"', '""') + '"'
+
+def split_top_level(text, separator=','):
+    """Divide text por separator fuera de paréntesis y comillas dobles"""
+    parts, depth, quoted, current = [], 0, False, ''
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == '(':
+            depth += 1
+        elif not quoted and char == ')':
+            depth -= 1
+        if char == separator and depth == 0 and not quoted:
+            parts.append(current.strip())
+            current = ''
+        else:
+            current += char
+    if current.strip():
+        parts.append(current.strip())
+    return parts
+
+def unquote(value):
+    return value[1:-1] if len(value) >= 2 and value[0] == value[-1] == '"' else value
+
+# Columnas del select: [alias:]nombre  o  [alias:]tabla[!pista][!inner](columnas)
+EMBED_PATTERN = re.compile(r'^(?:(\w+):)?(\w+)((?:!\w+)*)\((.*)\)$', re.DOTALL)
+COLUMN_PATTERN = re.compile(r'^(?:(\w+):)?(\*|\w+)$')
+
+def parse_select(columns):
+    """Árbol de columnas y recursos embebidos de un select"""
+    items = []
+    for part in split_top_level(columns or '*'):
+        embed = EMBED_PATTERN.match(part)
+        if embed:
+            alias, table, modifiers, children = embed.groups()
+            modifiers = [m for m in modifiers.split('!') if m]
+            hints = [m for m in modifiers if m not in ('inner', 'left')]
+            items.append({
+                'kind': 'embed', 'key': alias or table, 'table': table,
+                'hint': hints[0] if hints else None, 'inner': 'inner' in modifiers,
+                'children': parse_select(children)
+            })
+            continue
+        column = COLUMN_PATTERN.match(part)
+        if not column:
+            raise api_error(f'failed to parse select parameter ({part})', 'PGRST100')
+        alias, name = column.groups()
+        items.append({'kind': 'column', 'key': alias or name, 'name': name})
+    return items
+
+def parse_condition(column, operator, value):
+    """Nodo de filtro a partir de columna, operador (con prefijo not. opcional) y valor textual"""
+    negate = operator.startswith('not.')
+    if negate:
+        operator = operator[4:]
+    if operator == 'in':
+        value = [unquote(v) for v in split_top_level(value.strip()[1:-1])]
+    else:
+        value = unquote(value)
+    return {'kind': 'condition', 'column': column, 'operator': operator, 'value': value, 'negate': negate}
+
+def parse_logic(text, kind='or'):
+    """Nodo and/or a partir de la sintaxis de or_(): 'col.op.valor,and(...),or(...)'"""
+    nodes = []
+    for part in split_top_level(text):
+        nested = re.match(r'^(not\.)?(and|or)\((.*)\)$', part, re.DOTALL)
+        if nested:
+            node = parse_logic(nested.group(3), nested.group(2))
+            node['negate'] = bool(nested.group(1))
+            nodes.append(node)
+            continue
+        pieces = part.split('.', 2)
+        if len(pieces) < 3:
+            raise api_error(f'failed to parse logic tree ({text})', 'PGRST100')
+        column, operator, value = pieces
+        if operator == 'not':
+            operator, value = value.split('.', 1)
+            operator = 'not.' + operator
+        nodes.append(parse_condition(column, operator, value))
+    return {'kind': kind, 'nodes': nodes, 'negate': False}
+
+def to_filter_value(value):
+    """Valor de un filtro tal como viaja en la URL de PostgREST"""
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return value if isinstance(value, (int, float, str)) else str(value)
+
+def split_embed_filters(embed_filters, key):
+    """Filtros del recurso embebido key y, con claves relativas a él, los de sus recursos anidados"""
+    nested = {path[len(key) + 1:]: nodes for path, nodes in embed_filters.items() if path.startswith(key + '.')}
+    return embed_filters.get(key, []), nested
+
+class FakeQueryBuilder:
+    """Petición a una tabla, construida encadenando métodos como en supabase-py"""
+
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.method = 'select'
+        self.columns = '*'
+        self.count = None
+        self.payload = None
+        self.on_conflict = None
+        self.filters = []
+        self.embed_filters = {}
+        self.orders = []
+        self.limit_rows = None
+        self.offset = 0
+        self.aliases = 0
+
+    # Tipo de petición
+    def select(self, *columns, count=None, **kwargs):
+        self.columns = ','.join(columns) if columns else '*'
+        self.count = count
+        return self
+
+    def insert(self, json, count=None, **kwargs):
+        self.method, self.payload, self.count = 'insert', json, count
+        return self
+
+    def upsert(self, json, on_conflict='', count=None, **kwargs):
+        self.method, self.payload, self.count = 'upsert', json, count
+        self.on_conflict = [c.strip() for c in on_conflict.split(',') if c.strip()] or None
+        return self
+
+    def update(self, json, count=None, **kwargs):
+        self.method, self.payload, self.count = 'update', json, count
+        return self
+
+    def delete(self, count=None, **kwargs):
+        self.method, self.count = 'delete', count
+        return self
+
+    # Filtros
+    def filter(self, column, operator, value):
+        node = parse_condition(column, operator, str(value))
+        if '.' in column:
+            path, node['column'] = column.rsplit('.', 1)
+            self.embed_filters.setdefault(path, []).append(node)
+        else:
+            self.filters.append(node)
+        return self
+
+    def eq(self, column, value):
+        return self.filter(column, 'eq', to_filter_value(value))
+
+    def neq(self, column, value):
+        return self.filter(column, 'neq', to_filter_value(value))
+
+    def gt(self, column, value):
+        return self.filter(column, 'gt', to_filter_value(value))
+
+    def gte(self, column, value):
+        return self.filter(column, 'gte', to_filter_value(value))
+
+    def lt(self, column, value):
+        return self.filter(column, 'lt', to_filter_value(value))
+
+    def lte(self, column, value):
+        return self.filter(column, 'lte', to_filter_value(value))
+
+    def like(self, column, pattern):
+        return self.filter(column, 'like', pattern)
+
+    def ilike(self, column, pattern):
+        return self.filter(column, 'ilike', pattern)
+
+    def is_(self, column, value):
+        return self.filter(column, 'is', 'null' if value is None else to_filter_value(value))
+
+    def in_(self, column, values):
+        return self.filter(column, 'in', '(' + ','.join(str(to_filter_value(v)) for v in values) + ')')
+
+    def or_(self, filters, reference_table=None):
+        node = parse_logic(filters)
+        if reference_table:
+            self.embed_filters.setdefault(reference_table, []).append(node)
+        else:
+            self.filters.append(node)
+        return self
+
+    # Orden y paginación
+    def order(self, column, desc=False, nullsfirst=None, **kwargs):
+        self.orders.append((column, desc, desc if nullsfirst is None else nullsfirst))
+        return self
+
+    def limit(self, size, **kwargs):
+        self.limit_rows = size
+        return self
+
+    def range(self, start, end, **kwargs):
+        self.offset, self.limit_rows = start, end - start + 1
+        return self
+
+    def execute(self):
+        return self.client._request(f'{self.method.upper()} /{self.table}', lambda conn: getattr(self, f'_{self.method}')(conn))
+
+    # Ejecución sobre SQLite
+    def _where(self, conn, table, qualifier, nodes, embeds=(), embed_filters=None):
+        """Cláusula WHERE (sql, parámetros) de los filtros y de los recursos embebidos !inner"""
+        clauses, params = [], []
+        for node in nodes:
+            sql, node_params = self.client._compile(conn, table, qualifier, node)
+            clauses.append(sql)
+            params.extend(node_params)
+        for embed in embeds:
+            sql, embed_params = self._embed_exists(conn, table, qualifier, embed, embed_filters or {})
+            if sql:
+                clauses.append(sql)
+                params.extend(embed_params)
+        return (' AND '.join(clauses) if clauses else '1'), params
+
+    def _embed_exists(self, conn, table, qualifier, embed, embed_filters):
+        """EXISTS que descarta las filas sin recurso embebido !inner (con sus filtros y anidados)"""
+        if not embed['inner']:
+            return None, []
+        relation = self.client._relationship(conn, table, embed['table'], embed['hint'])
+        self.aliases += 1
+        alias = f'e{self.aliases}'
+        own_filters, nested_filters = split_embed_filters(embed_filters, embed['key'])
+        children = [item for item in embed['children'] if item['kind'] == 'embed']
+        where, params = self._where(conn, embed['table'], alias, own_filters, children, nested_filters)
+        join = self.client._join_condition(relation, qualifier, alias)
+        return f'EXISTS (SELECT 1 FROM {quote(embed["table"])} AS {alias} WHERE {join} AND {where})', params
+
+    def _select(self, conn):
+        items = parse_select(self.columns)
+        table_columns = self.client._columns(conn, self.table)
+        embeds = [item for item in items if item['kind'] == 'embed']
+        where, params = self._where(conn, self.table, quote(self.table), self.filters, embeds, self.embed_filters)
+
+        count = None
+        if self.count:
+            count = conn.execute(f'SELECT COUNT(*) FROM {quote(self.table)} WHERE {where}', params).fetchone()[0]
+
+        # select('count'): agregado de PostgREST, una única fila con el conteo
+        if [item.get('name') for item in items] == ['count'] and 'count' not in table_columns:
+            if count is None:
+                count = conn.execute(f'SELECT COUNT(*) FROM {quote(self.table)} WHERE {where}', params).fetchone()[0]
+            return [{'count': count}], count
+
+        sql = f'SELECT * FROM {quote(self.table)} WHERE {where}'
+        if self.orders:
+            terms = []
+            for column, desc, nullsfirst in self.orders:
+                self.client._check_column(conn, self.table, column)
+                terms.append(f'{quote(column)} {"DESC" if desc else "ASC"} NULLS {"FIRST" if nullsfirst else "LAST"}')
+            sql += ' ORDER BY ' + ', '.join(terms)
+        limit = self.limit_rows
+        if self.client.max_rows is not None:
+            limit = self.client.max_rows if limit is None else min(limit, self.client.max_rows)
+        if limit is not None or self.offset:
+            sql += ' LIMIT ? OFFSET ?'
+            params = params + [-1 if limit is None else limit, self.offset]
+        rows = [dict(row) for row in conn.execute(sql, params)]
+        return self.client._shape(conn, self.table, rows, items, self.embed_filters), count
+
+    def _rows_payload(self):
+        rows = self.payload if isinstance(self.payload, list) else [self.payload]
+        # Mismo requisito que el cliente real: el cuerpo de la petición se serializa como JSON
+        return json.loads(json.dumps(rows))
+
+    def _insert(self, conn, upsert=False):
+        rows = self._rows_payload()
+        columns = self.client._columns(conn, self.table)
+        result = []
+        for row in rows:
+            for column in row:
+                if column not in columns:
+                    raise api_error(f"Could not find the '{column}' column of '{self.table}' in the schema cache", 'PGRST204')
+            names = ', '.join(quote(c) for c in row)
+            sql = f'INSERT INTO {quote(self.table)} ({names}) VALUES ({", ".join("?" for _ in row)})' if row else \
+                f'INSERT INTO {quote(self.table)} DEFAULT VALUES'
+            if upsert:
+                conflict = self.on_conflict or self.client._primary_key(conn, self.table)
+                updates = ', '.join(f'{quote(c)} = excluded.{quote(c)}' for c in row if c not in conflict)
+                sql += f' ON CONFLICT ({", ".join(quote(c) for c in conflict)}) ' + (f'DO UPDATE SET {updates}' if updates else 'DO NOTHING')
+            result.extend(dict(r) for r in conn.execute(sql + ' RETURNING *', list(row.values())))
+        return result, (len(result) if self.count else None)
+
+    def _upsert(self, conn):
+        return self._insert(conn, upsert=True)
+
+    def _update(self, conn):
+        values = self._rows_payload()[0]
+        columns = self.client._columns(conn, self.table)
+        for column in values:
+            if column not in columns:
+                raise api_error(f"Could not find the '{column}' column of '{self.table}' in the schema cache", 'PGRST204')
+        where, params = self._where(conn, self.table, quote(self.table), self.filters)
+        assignments = ', '.join(f'{quote(c)} = ?' for c in values)
+        rows = [dict(r) for r in conn.execute(
+            f'UPDATE {quote(self.table)} SET {assignments} WHERE {where} RETURNING *', list(values.values()) + params
+        )]
+        return rows, (len(rows) if self.count else None)
+
+    def _delete(self, conn):
+        where, params = self._where(conn, self.table, quote(self.table), self.filters)
+        rows = [dict(r) for r in conn.execute(f'DELETE FROM {quote(self.table)} WHERE {where} RETURNING *', params)]
+        return rows, (len(rows) if self.count else None)
+
+class FakeRpcBuilder:
+    """Llamada a una función RPC"""
+
+    def __init__(self, client, name, params):
+        self.client = client
+        self.name = name
+        self.params = params or {}
+
+    def execute(self):
+        def run(conn):
+            if self.name not in self.client.functions:
+                raise api_error(f'Could not find the function public.{self.name} in the schema cache', 'PGRST202')
+            return [dict(row) for row in conn.execute(self.client.functions[self.name], self.params)], None
+        return self.client._request(f'POST /rpc/{self.name}', run)
+
+class FakeSupabaseClient:
+    """Cliente con la interfaz de supabase-py que resuelve cada petición sobre SQLite
+
+    latency son los segundos de espera añadidos a cada petición (ida y vuelta a la red);
+    max_rows, el límite de filas por respuesta de PostgREST (None para no limitar).
+    """
+
+    def __init__(self, path=':memory:', latency=0.0, max_rows=DEFAULT_MAX_ROWS):
+        self.path = path
+        self.latency = latency
+        self.max_rows = max_rows
+        self.functions = dict(RPC_FUNCTIONS)
+        self.request_count = 0
+        self.requests = []
+        self._lock = threading.Lock()
+        self._schema = {}
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA foreign_keys = ON')
+        self.conn.executescript(FAKE_SCHEMA)
+        # El esquema simulado equivale a todas las migraciones de Supabase ya aplicadas
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO schema_migrations (version, name) VALUES (?, ?)',
+                [(migration.version, migration.name) for migration in SUPABASE_MIGRATIONS]
+            )
+
+    def table(self, name):
+        return FakeQueryBuilder(self, name)
+
+    from_ = table
+
+    def rpc(self, name, params=None, **kwargs):
+        return FakeRpcBuilder(self, name, params)
+
+    def reset_stats(self):
+        """Pone a cero el contador y el registro de peticiones"""
+        with self._lock:
+            self.request_count = 0
+            self.requests = []
+
+    def close(self):
+        self.conn.close()
+
+    def _request(self, description, run):
+        """Ejecuta una petición en su propia transacción, como PostgREST, con la latencia simulada"""
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.request_count += 1
+            self.requests.append(description)
+            try:
+                with self.conn:
+                    data, count = run(self.conn)
+            except sqlite3.IntegrityError as e:
+                message = str(e)
+                code = '23505' if 'UNIQUE' in message else '23502' if 'NOT NULL' in message else '23503' if 'FOREIGN KEY' in message else '23000'
+                raise api_error(message, code)
+            except sqlite3.OperationalError as e:
+                raise api_error(str(e), '42P01' if 'no such table' in str(e) else '42703')
+        return FakeResponse(data, count)
+
+    # Metadatos del esquema
+    def _table_info(self, conn, table):
+        if table not in self._schema:
+            columns = [row[1] for row in conn.execute(f'PRAGMA table_info({quote(table)})')]
+            if not columns:
+                raise api_error(f"Could not find the table 'public.{table}' in the schema cache", 'PGRST205')
+            primary_key = [row[1] for row in sorted(conn.execute(f'PRAGMA table_info({quote(table)})'), key=lambda r: r[5]) if row[5]]
+            foreign_keys = {row[3]: row[2] for row in conn.execute(f'PRAGMA foreign_key_list({quote(table)})')}
+            self._schema[table] = (columns, primary_key, foreign_keys)
+        return self._schema[table]
+
+    def _columns(self, conn, table):
+        return self._table_info(conn, table)[0]
+
+    def _primary_key(self, conn, table):
+        return self._table_info(conn, table)[1]
+
+    def _check_column(self, conn, table, column):
+        if column not in self._columns(conn, table) and column not in SEARCH_COLUMNS.get(table, {}):
+            raise api_error(f'column {table}.{column} does not exist', '42703')
+
+    def _relationship(self, conn, source, target, hint=None):
+        """Relación entre dos tablas: ('one', fk en source) o ('many', fk en target)
+
+        hint es la columna o el nombre de la restricción (tabla_columna_fkey), como en PostgREST.
+        """
+        candidates = [('one', column) for column, table in self._table_info(conn, source)[2].items() if table == target]
+        candidates += [('many', column) for column, table in self._table_info(conn, target)[2].items() if table == source]
+        if hint:
+            candidates = [
+                (kind, column) for kind, column in candidates
+                if hint in (column, f'{source if kind == "one" else target}_{column}_fkey')
+            ]
+        if not candidates:
+            raise api_error(f"Could not find a relationship between '{source}' and '{target}' in the schema cache", 'PGRST200')
+        if len(candidates) > 1:
+            raise api_error(f"Could not embed because more than one relationship was found for '{source}' and '{target}'", 'PGRST201')
+        return candidates[0]
+
+    @staticmethod
+    def _join_condition(relation, parent, child):
+        kind, column = relation
+        return f'{child}.id = {parent}.{quote(column)}' if kind == 'one' else f'{child}.{quote(column)} = {parent}.id'
+
+    def _compile(self, conn, table, qualifier, node):
+        """SQL (texto, parámetros) de un nodo de filtro"""
+        if node['kind'] in ('and', 'or'):
+            parts, params = [], []
+            for child in node['nodes']:
+                sql, child_params = self._compile(conn, table, qualifier, child)
+                parts.append(sql)
+                params.extend(child_params)
+            sql = '(' + f' {node["kind"].upper()} '.join(parts or ['1']) + ')'
+        else:
+            column, operator, value = node['column'], node['operator'], node['value']
+            self._check_column(conn, table, column)
+            target = f'{qualifier}.{quote(column)}'
+            if operator in COMPARISON_OPERATORS:
+                sql, params = f'{target} {COMPARISON_OPERATORS[operator]} ?', [value]
+            elif operator == 'like':
+                sql, params = f'{target} GLOB ?', [value.replace('%', '*')]
+            elif operator == 'ilike':
+                sql, params = f'lower({target}) LIKE lower(?)', [value.replace('*', '%')]
+            elif operator == 'in':
+                sql, params = f'{target} IN ({", ".join("?" for _ in value)})', list(value)
+            elif operator == 'is':
+                sql, params = f'{target} IS ' + {'null': 'NULL', 'true': '1', 'false': '0'}[value.lower()], []
+            elif operator.startswith('fts') and column in SEARCH_COLUMNS.get(table, {}):
+                sql, params = self._search_condition(table, qualifier, column, value)
+            else:
+                raise api_error(f'operator {operator} is not supported', 'PGRST100')
+        return (f'NOT {sql}' if node.get('negate') else sql), params
+
+    @staticmethod
+    def _search_condition(table, qualifier, column, tsquery):
+        """Aproximación del operador fts: cada término (prefijo) debe aparecer en algún texto del documento"""
+        text_columns, children = SEARCH_COLUMNS[table][column]
+        clauses, params = [], []
+        for term in re.findall(r'\w+', tsquery.replace(':*', ' ')):
+            pattern = f'%{term.lower()}%'
+            options = [f'lower(coalesce({qualifier}.{quote(c)}, \'\')) LIKE ?' for c in text_columns]
+            options += [
+                f'EXISTS (SELECT 1 FROM {quote(child)} AS s WHERE s.{quote(fk)} = {qualifier}.id AND lower(s.{quote(text)}) LIKE ?)'
+                for child, fk, text in children
+            ]
+            clauses.append('(' + ' OR '.join(options) + ')')
+            params.extend([pattern] * len(options))
+        return '(' + (' AND '.join(clauses) or '1') + ')', params
+
+    def _shape(self, conn, table, rows, items, embed_filters):
+        """Proyecta las columnas pedidas y añade los recursos embebidos (una consulta IN por recurso)"""
+        columns = self._columns(conn, table)
+        for item in items:
+            if item['kind'] == 'column' and item['name'] != '*':
+                self._check_column(conn, table, item['name'])
+
+        embedded = {}
+        for item in items:
+            if item['kind'] != 'embed':
+                continue
+            own_filters, nested_filters = split_embed_filters(embed_filters, item['key'])
+            relation = self._relationship(conn, table, item['table'], item['hint'])
+            kind, fk = relation
+            parent_column, child_column = (fk, 'id') if kind == 'one' else ('id', fk)
+            keys = sorted({row[parent_column] for row in rows if row[parent_column] is not None})
+            nested = [child for child in item['children'] if child['kind'] == 'embed']
+            children = []
+            for start in range(0, len(keys), EMBED_BATCH_SIZE):
+                batch = keys[start:start + EMBED_BATCH_SIZE]
+                builder = FakeQueryBuilder(self, item['table'])
+                qualifier = quote(item['table'])
+                where, params = builder._where(conn, item['table'], qualifier, own_filters, nested, nested_filters)
+                children.extend(dict(r) for r in conn.execute(
+                    f'SELECT * FROM {qualifier} WHERE {qualifier}.{quote(child_column)} IN ({", ".join("?" for _ in batch)}) AND {where}',
+                    batch + params
+                ))
+            by_key = {}
+            for child, shaped in zip(children, self._shape(conn, item['table'], children, item['children'], nested_filters)):
+                by_key.setdefault(child[child_column], []).append(shaped)
+            embedded[item['key']] = (kind, parent_column, by_key)
+
+        shaped_rows = []
+        for row in rows:
+            shaped = {}
+            for item in items:
+                if item['kind'] == 'column':
+                    if item['name'] == '*':
+                        shaped.update((column, row[column]) for column in columns)
+                    else:
+                        shaped[item['key']] = row[item['name']]
+                else:
+                    kind, parent_column, by_key = embedded[item['key']]
+                    matches = by_key.get(row[parent_column], [])
+                    shaped[item['key']] = (matches[0] if matches else None) if kind == 'one' else matches
+            shaped_rows.append(shaped)
+        return shaped_rows
+
+def seed_from_sqlite(client, sqlite_path, tables=None):
+    """Copia las tablas de una base de datos SQLite de la aplicación (db/cavacrm.db) al cliente simulado
+
+    Se copia directamente, sin contar peticiones. codigo_consejo pasa a la columna nif.
+    """
+    tables = tables or ['coordinators', 'verifiers', 'warehouses', 'incidents', 'incident_records', 'incident_actions']
+    renamed = {'warehouses': {'codigo_consejo': 'nif'}}
+    source = sqlite3.connect(sqlite_path)
+    source.row_factory = sqlite3.Row
+    try:
+        with client._lock, client.conn:
+            for table in tables:
+                target_columns = client._columns(client.conn, table)
+                cursor = source.execute(f'SELECT * FROM {quote(table)}')
+                columns = [renamed.get(table, {}).get(d[0], d[0]) for d in cursor.description]
+                selected = [index for index, column in enumerate(columns) if column in target_columns]
+                names = ', '.join(quote(columns[index]) for index in selected)
+                client.conn.executemany(
+                    f'INSERT OR REPLACE INTO {quote(table)} ({names}) VALUES ({", ".join("?" for _ in selected)})',
+                    ([row[index] for index in selected] for row in cursor)
+                )
+                logger.info(f"Seeded fake Supabase table {table}")
+            # Los datos copiados no son cambios pendientes de exportar
+            client.conn.execute('DELETE FROM incident_record_changes')
+    finally:
+        source.close()
+
+def use_fake_client(client):
+    """Hace que supabase_config y utils.database_supabase usen el cliente simulado"""
+    import supabase_config
+    supabase_config._supabase_client = client
+    try:
+        from utils.database_supabase import get_supabase_connection
+        get_supabase_connection.clear()
+    except ImportError:
+        pass
+    return client
@@ -0,0 +1,24 @@
+-- Índices compuestos para las consultas frecuentes
+-- Ejecutar este script en el SQL Editor del dashboard de Supabase después de supabase_export.sql
+
+-- Acciones de un registro en orden cronológico (get_incident_actions y documento de búsqueda)
+CREATE INDEX IF NOT EXISTS idx_incident_actions_record_date ON incident_actions(incident_record_id, action_date);
+DROP INDEX IF EXISTS idx_incident_actions_record;
+
+-- Registros por fecha: pendientes recientes, filtro por fecha y paginación por (date, id)
+CREATE INDEX IF NOT EXISTS idx_incident_records_date_id ON incident_records(date, id);
+DROP INDEX IF EXISTS idx_incident_records_date;
+
+-- Filtro por estado ordenado por fecha; también cubre el conteo por estado del dashboard
+CREATE INDEX IF NOT EXISTS idx_incident_records_status_date ON incident_records(status, date);
+DROP INDEX IF EXISTS idx_incident_records_status;
+
+-- Incidencias pendientes de un coordinador (dashboard y filtros)
+CREATE INDEX IF NOT EXISTS idx_incident_records_coordinator_status_date ON incident_records(assigned_coordinator_id, status, date);
+DROP INDEX IF EXISTS idx_incident_records_coordinator;
+
+-- Registrar la migración (ver utils/migrations.py)
+INSERT INTO schema_migrations (version, name) VALUES (5, 'hot_query_indexes') ON CONFLICT (version) DO NOTHING;
+
+-- Mensaje de confirmación
+SELECT 'Índices de consultas frecuentes creados exitosamente en Supabase' as resultado;
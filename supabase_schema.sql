@@ -1,6 +1,15 @@
 -- Script SQL para crear las tablas en Supabase
 -- Ejecutar este script en el SQL Editor del dashboard de Supabase
 
+-- Versiones del esquema aplicadas (ver utils/migrations.py)
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    applied_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+GRANT SELECT ON schema_migrations TO anon, authenticated;
+
 -- Tabla de coordinadores
 CREATE TABLE IF NOT EXISTS coordinators (
     id SERIAL PRIMARY KEY,
@@ -68,5 +77,8 @@ CREATE INDEX IF NOT EXISTS idx_incident_actions_date ON incident_actions(action_
 -- Las tablas se crean vacías, sin datos de prueba
 -- Puedes agregar tus propios datos a través de la aplicación
 
+-- Registrar la migración (ver utils/migrations.py)
+INSERT INTO schema_migrations (version, name) VALUES (1, 'initial_schema') ON CONFLICT (version) DO NOTHING;
+
 -- Mensaje de confirmación
 SELECT 'Tablas creadas exitosamente en Supabase' as resultado;
\ No newline at end of file
@@ -0,0 +1,63 @@
+-- Búsqueda de texto completo sobre explicaciones de incidencias y descripciones de acciones
+-- Ejecutar este script en el SQL Editor del dashboard de Supabase después de supabase_schema.sql
+-- La columna search_vector se mantiene sincronizada mediante triggers y se consulta con el operador fts
+
+ALTER TABLE incident_records ADD COLUMN IF NOT EXISTS search_vector TSVECTOR;
+
+CREATE INDEX IF NOT EXISTS idx_incident_records_search ON incident_records USING GIN (search_vector);
+
+-- Documento de búsqueda de un registro: explicación (peso A) y texto de sus acciones (peso B)
+CREATE OR REPLACE FUNCTION incident_search_document(p_explanation TEXT, p_record_id INTEGER)
+RETURNS TSVECTOR
+LANGUAGE sql STABLE AS $$
+    SELECT setweight(to_tsvector('simple', coalesce(p_explanation, '')), 'A') ||
+           setweight(to_tsvector('simple', coalesce(
+               (SELECT string_agg(ia.action_description, ' ') FROM incident_actions ia WHERE ia.incident_record_id = p_record_id), ''
+           )), 'B');
+$$;
+
+-- Registros de incidencia: recalcular al insertar o al cambiar la explicación
+CREATE OR REPLACE FUNCTION incident_records_search_trigger()
+RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.search_vector := incident_search_document(NEW.explanation, NEW.id);
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS incident_records_search_update ON incident_records;
+CREATE TRIGGER incident_records_search_update
+    BEFORE INSERT OR UPDATE OF explanation ON incident_records
+    FOR EACH ROW EXECUTE FUNCTION incident_records_search_trigger();
+
+-- Acciones: recalcular el documento del registro afectado
+CREATE OR REPLACE FUNCTION incident_actions_search_trigger()
+RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE incident_records SET search_vector = incident_search_document(explanation, id)
+        WHERE id = OLD.incident_record_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        UPDATE incident_records SET search_vector = incident_search_document(explanation, id)
+        WHERE id = NEW.incident_record_id;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS incident_actions_search_update ON incident_actions;
+CREATE TRIGGER incident_actions_search_update
+    AFTER INSERT OR UPDATE OF action_description, incident_record_id OR DELETE ON incident_actions
+    FOR EACH ROW EXECUTE FUNCTION incident_actions_search_trigger();
+
+-- Rellenar el índice con los registros existentes
+UPDATE incident_records SET search_vector = incident_search_document(explanation, id);
+
+-- Registrar la migración (ver utils/migrations.py)
+INSERT INTO schema_migrations (version, name) VALUES (3, 'incident_search_index') ON CONFLICT (version) DO NOTHING;
+
+-- Mensaje de confirmación
+SELECT 'Búsqueda de texto completo configurada exitosamente en Supabase' as resultado;
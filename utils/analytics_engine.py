@@ -0,0 +1,70 @@
+"""Motor de agregación para la página de análisis
+
+Obtiene los conteos agrupados de la capa de datos (GROUP BY en SQLite, funciones RPC en
+Supabase), de modo que solo se transfieren tantas filas como grupos y no el historial
+completo de incidencias. Cada conteo se pide una sola vez por versión de datos y se
+invalida cuando se anuncia una escritura sobre alguna de las tablas de las que depende,
+o a los ANALYTICS_TTL_SECONDS para recoger las escrituras hechas desde otro proceso.
+"""
+
+import logging
+import threading
+import time
+from .cache_registry import register_invalidation
+
+logger = logging.getLogger(__name__)
+
+# nombre del conteo: función de la capa de datos que lo calcula
+INCIDENT_COUNT_FUNCTIONS = {
+    'by_zone': 'get_incidents_by_zone',
+    'by_verifier': 'get_incidents_by_verifier',
+    'by_warehouse': 'get_incidents_by_warehouse',
+    'by_type': 'get_incidents_by_type',
+    'by_status': 'get_incidents_by_status',
+    'assignments_by_verifier': 'get_assignments_by_verifier'
+}
+
+# Vigencia máxima de un conteo (1 hora, como las funciones de análisis con st.cache_data)
+ANALYTICS_TTL_SECONDS = 3600
+
+# Tablas de las que dependen los conteos y la tabla combinada de incidencias
+ANALYTICS_TABLES = ('incident_records', 'coordinators', 'warehouses', 'verifiers', 'incidents')
+
+_lock = threading.Lock()
+_data_version = 0
+_counts = {}
+
+def get_analytics_version():
+    """Retorna la versión actual de los datos de análisis"""
+    with _lock:
+        return _data_version
+
+def invalidate_analytics():
+    """Marca como obsoletos los conteos guardados tras una escritura"""
+    global _data_version
+    with _lock:
+        _data_version += 1
+        _counts.clear()
+
+def get_incident_counts(backend, *names):
+    """Retorna {nombre: df} con los conteos pedidos (todos si no se indica ninguno), calculados en la base de datos"""
+    names = names or tuple(INCIDENT_COUNT_FUNCTIONS)
+    with _lock:
+        version = _data_version
+        now = time.monotonic()
+        cached = {name: _counts[name][0] for name in names
+                  if name in _counts and now - _counts[name][1] < ANALYTICS_TTL_SECONDS}
+
+    missing = [name for name in names if name not in cached]
+    loaded_at = time.monotonic()
+    loaded = {name: getattr(backend, INCIDENT_COUNT_FUNCTIONS[name])() for name in missing}
+
+    with _lock:
+        # No guardar los conteos si los datos cambiaron mientras se calculaban
+        if _data_version == version:
+            _counts.update({name: (df, loaded_at) for name, df in loaded.items()})
+    if loaded:
+        logger.info(f"Loaded incident counts v{version}: {', '.join(loaded)}")
+    return {**cached, **loaded}
+
+register_invalidation(invalidate_analytics, *ANALYTICS_TABLES)
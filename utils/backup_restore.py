@@ -1,20 +1,113 @@
 import sqlite3
 import shutil
 import datetime
+import gzip
+import logging
 import os
+import tempfile
+from .db_pool import get_pool, close_pool, BUSY_TIMEOUT_MS
+
+logger = logging.getLogger(__name__)
 
 DB_PATH = 'db/cavacrm.db'
 
-def backup_db(backup_dir='backups'):
+# Páginas copiadas en cada paso de la copia en caliente y pausa entre pasos:
+# entre un paso y el siguiente las demás conexiones pueden seguir escribiendo
+BACKUP_PAGES_PER_STEP = 256
+BACKUP_STEP_SLEEP = 0.005
+
+def copy_database(source, target_path, pages=BACKUP_PAGES_PER_STEP):
+    """Copia la base de datos abierta en source a target_path con la API de backup de SQLite"""
+    target = sqlite3.connect(target_path)
+    try:
+        source.backup(target, pages=pages, sleep=BACKUP_STEP_SLEEP)
+    finally:
+        target.close()
+
+def verify_backup(path):
+    """Comprueba la integridad de una copia; lanza ValueError si está dañada"""
+    conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        result = conn.execute('PRAGMA integrity_check').fetchone()[0]
+    except sqlite3.DatabaseError as e:
+        raise ValueError(f"La copia de seguridad no es una base de datos válida: {e}")
+    finally:
+        conn.close()
+    if result != 'ok':
+        raise ValueError(f"La copia de seguridad está dañada: {result}")
+
+def write_backup(output, compress=False, verify=True):
+    """Copia en caliente la base de datos en output (objeto de fichero binario)
+
+    La copia se hace paso a paso con la API de backup en un fichero temporal, que se
+    verifica y se vuelca (opcionalmente comprimido con gzip) en output.
+    """
+    fd, temp_path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    try:
+        with get_pool(DB_PATH).connection() as conn:
+            copy_database(conn, temp_path)
+        if verify:
+            verify_backup(temp_path)
+        with open(temp_path, 'rb') as f:
+            if compress:
+                with gzip.GzipFile(fileobj=output, mode='wb') as compressed:
+                    shutil.copyfileobj(f, compressed)
+            else:
+                shutil.copyfileobj(f, output)
+    finally:
+        os.remove(temp_path)
+    return output
+
+def backup_db(backup_dir='backups', compress=False, verify=True):
     if not os.path.exists(backup_dir):
         os.makedirs(backup_dir)
     timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-    backup_path = os.path.join(backup_dir, f'cavacrm_backup_{timestamp}.db')
-    shutil.copy(DB_PATH, backup_path)
+    backup_path = os.path.join(backup_dir, f'cavacrm_backup_{timestamp}.db' + ('.gz' if compress else ''))
+    try:
+        with open(backup_path, 'wb') as f:
+            write_backup(f, compress=compress, verify=verify)
+    except Exception:
+        if os.path.exists(backup_path):
+            os.remove(backup_path)
+        raise
+    logger.info(f"Backup created: {backup_path}")
     return backup_path
 
+def backup_db_to_buffer(buffer, compress=False, verify=True):
+    """Copia la base de datos en buffer (objeto de fichero binario) sin dejar ficheros en disco"""
+    return write_backup(buffer, compress=compress, verify=verify)
+
 def restore_db(backup_path):
     if not os.path.exists(backup_path):
         raise FileNotFoundError(f"Backup file not found: {backup_path}")
-    shutil.copy(backup_path, DB_PATH)
-    return DB_PATH
\ No newline at end of file
+
+    # Las copias comprimidas se descomprimen en un fichero temporal
+    temp_path = None
+    if backup_path.endswith('.gz'):
+        fd, temp_path = tempfile.mkstemp(suffix='.db')
+        with os.fdopen(fd, 'wb') as f, gzip.open(backup_path, 'rb') as compressed:
+            shutil.copyfileobj(compressed, f)
+        source_path = temp_path
+    else:
+        source_path = backup_path
+
+    try:
+        verify_backup(source_path)
+        # Copiar con la API de backup sobre la base de datos abierta, en un único paso para
+        # que ninguna conexión vea una restauración a medias
+        source = sqlite3.connect(f'file:{source_path}?mode=ro', uri=True)
+        target = sqlite3.connect(DB_PATH, timeout=BUSY_TIMEOUT_MS / 1000)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+    finally:
+        if temp_path:
+            os.remove(temp_path)
+
+    # Descartar las conexiones inactivas del pool para que las siguientes consultas partan de cero
+    close_pool(DB_PATH)
+    logger.info(f"Database restored from {backup_path}")
+    return DB_PATH
@@ -0,0 +1,38 @@
+"""Inicialización de la base de datos una sola vez por proceso
+
+Streamlit vuelve a ejecutar app.py completo en cada interacción. init_db() y la carga
+de datos por defecto solo tienen que ejecutarse al arrancar el proceso, así que se
+guardan con st.cache_resource: la primera sesión los ejecuta (las demás esperan al
+mismo resultado) y los reruns posteriores no vuelven a consultar la base de datos.
+"""
+
+import datetime
+import logging
+import streamlit as st
+
+logger = logging.getLogger(__name__)
+
+@st.cache_resource(show_spinner=False)
+def bootstrap_database():
+    """Inicializa la base de datos y los datos por defecto (en deploy) una vez por proceso"""
+    from .database_unified import init_db, get_database_type
+    
+    logger.info("Initializing database (once per process)...")
+    init_db()
+    logger.info("Database initialization completed.")
+    
+    # Inicializar datos por defecto en entornos de deploy
+    try:
+        from config import is_deployed_environment
+        if is_deployed_environment():
+            from init_default_data import run_default_initialization
+            logger.info("Deploy environment detected, checking for default data...")
+            run_default_initialization()
+    except ImportError:
+        logger.info("Default data initialization not available")
+    
+    return {'database': get_database_type(), 'initialized_at': datetime.datetime.now()}
+
+def reset_bootstrap():
+    """Fuerza una nueva inicialización en el siguiente rerun (p. ej. tras restaurar una copia)"""
+    bootstrap_database.clear()
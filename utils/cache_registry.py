@@ -0,0 +1,52 @@
+"""Registro central de invalidación de cachés
+
+Las funciones cacheadas declaran de qué tablas dependen y las funciones de escritura
+anuncian qué tablas han modificado. Solo se limpian las cachés que dependen de esas
+tablas, en lugar de listas de .clear() mantenidas a mano en cada función de escritura.
+"""
+
+import logging
+import threading
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+ALL_TABLES = ('coordinators', 'verifiers', 'warehouses', 'incidents', 'incident_records', 'incident_actions')
+
+_lock = threading.Lock()
+_dependents = defaultdict(list)
+_table_versions = defaultdict(int)
+
+def register_invalidation(callback, *tables):
+    """Registra callback() para que se ejecute cuando cambie cualquiera de las tablas"""
+    with _lock:
+        for table in tables:
+            _dependents[table].append(callback)
+
+def depends_on(*tables):
+    """Decorador para funciones con st.cache_data: limpia su caché cuando cambian las tablas indicadas"""
+    def decorator(cached_func):
+        register_invalidation(cached_func.clear, *tables)
+        return cached_func
+    return decorator
+
+def get_table_version(*tables):
+    """Retorna una tupla con la versión actual de las tablas indicadas"""
+    with _lock:
+        return tuple(_table_versions[table] for table in tables)
+
+def notify_write(*tables):
+    """Anuncia que las tablas han cambiado: incrementa su versión y limpia las cachés dependientes"""
+    with _lock:
+        callbacks = []
+        for table in tables:
+            _table_versions[table] += 1
+            for callback in _dependents[table]:
+                if callback not in callbacks:
+                    callbacks.append(callback)
+
+    for callback in callbacks:
+        try:
+            callback()
+        except Exception as e:
+            logger.warning(f"Error clearing cache after write to {', '.join(tables)}: {e}")
@@ -0,0 +1,118 @@
+"""Preparación de las importaciones masivas desde CSV (verificadores y bodegas)
+
+La lógica compartida por ambos backends vive aquí: limpieza de columnas, validación
+y deduplicación con pandas. Cada backend solo obtiene las claves existentes con una
+consulta y ejecuta la inserción por lotes de las filas nuevas.
+"""
+
+import pandas as pd
+
+# Filas leídas del CSV en cada lote: la memoria usada no depende del tamaño del fichero
+CSV_CHUNK_SIZE = 5000
+
+# tabla: columnas obligatorias, columnas que identifican un registro y columnas opcionales
+CSV_IMPORT_TARGETS = {
+    'verifiers': {
+        'required': ('name', 'surnames'),
+        'key': ('name', 'surnames'),
+        'optional': ('phone', 'zone')
+    },
+    'warehouses': {
+        'required': ('name', 'codigo_consejo'),
+        'key': ('codigo_consejo',),
+        'optional': ('zone',)
+    }
+}
+
+def import_columns(table):
+    """Columnas que se insertan para la tabla, en orden"""
+    target = CSV_IMPORT_TARGETS[table]
+    return list(target['required']) + list(target['optional'])
+
+def normalize_columns(df):
+    """Limpia los nombres de columnas (eliminar espacios, BOM y caracteres especiales)"""
+    df.columns = df.columns.str.strip().str.lower().str.replace(' ', '_').str.replace('ï»¿', '')
+    return df
+
+def validate_columns(table, columns):
+    """Lanza ValueError si al CSV le falta alguna columna obligatoria"""
+    required_columns = CSV_IMPORT_TARGETS[table]['required']
+    missing_cols = [col for col in required_columns if col not in columns]
+    if missing_cols:
+        raise ValueError(f'El CSV debe contener las columnas: {", ".join(required_columns)}. Columnas faltantes: {", ".join(missing_cols)}. Columnas disponibles: {", ".join(columns)}')
+
+def make_key(values):
+    """Clave comparable de un registro (los valores se comparan como texto sin espacios extremos)"""
+    return tuple('' if value is None else str(value).strip() for value in values)
+
+def empty_report():
+    return {'inserted': 0, 'skipped': 0, 'existing': 0, 'duplicates': 0, 'invalid': 0}
+
+def merge_reports(total, report):
+    """Acumula el informe de un lote en el informe total"""
+    for key, value in report.items():
+        total[key] += value
+    return total
+
+def stream_csv_import(csv_file, table, import_rows, existing_keys, sep=',', progress=None, chunksize=CSV_CHUNK_SIZE):
+    """Lee el CSV por lotes en una sola pasada e inserta cada lote con import_rows(table, df, existing_keys)
+
+    Las columnas se validan leyendo solo la cabecera, antes de insertar nada, también si el CSV
+    no tiene filas de datos. progress(fracción, informe) se llama después de cada lote con la
+    fracción del fichero procesada.
+    Retorna el informe total de insertadas/omitidas.
+    """
+    total_size = csv_file.seek(0, 2)
+    csv_file.seek(0)
+    report = empty_report()
+
+    header = normalize_columns(pd.read_csv(csv_file, sep=sep, encoding='utf-8-sig', dtype=str, nrows=0))
+    validate_columns(table, list(header.columns))
+    csv_file.seek(0)
+
+    reader = pd.read_csv(csv_file, sep=sep, encoding='utf-8-sig', dtype=str, chunksize=chunksize)
+    for chunk in reader:
+        chunk = normalize_columns(chunk)
+        merge_reports(report, import_rows(table, chunk, existing_keys))
+        if progress:
+            progress(min(csv_file.tell() / total_size, 1.0) if total_size else 1.0, report)
+
+    return report
+
+def split_new_rows(table, df, existing_keys):
+    """Separa las filas nuevas del CSV de las que ya existen o están repetidas
+
+    existing_keys es el conjunto de claves ya presentes en la base de datos; se amplía con
+    las claves de las filas nuevas para que los lotes siguientes también las omitan.
+    Retorna (lista de diccionarios a insertar, informe sin el conteo de insertadas).
+    """
+    target = CSV_IMPORT_TARGETS[table]
+    key_columns = list(target['key'])
+    columns = import_columns(table)
+    report = empty_report()
+
+    df = df.copy()
+    for col in target['optional']:
+        if col not in df.columns:
+            df[col] = ''
+
+    # Las filas sin valor en alguna columna obligatoria no se pueden insertar
+    valid = df[list(target['required'])].notna().all(axis=1)
+    report['invalid'] = int((~valid).sum())
+    df = df[valid]
+
+    keys = pd.Series([make_key(values) for values in df[key_columns].itertuples(index=False)], index=df.index, dtype=object)
+
+    # Duplicados dentro del propio CSV: se conserva la primera aparición
+    duplicated = keys.duplicated()
+    report['duplicates'] = int(duplicated.sum())
+
+    exists = keys.map(lambda key: key in existing_keys).astype(bool) & ~duplicated
+    report['existing'] = int(exists.sum())
+
+    new_mask = ~duplicated & ~exists
+    new_rows = df.loc[new_mask, columns].astype(object).where(df.loc[new_mask, columns].notna(), None)
+    existing_keys.update(keys[new_mask])
+
+    report['skipped'] = report['invalid'] + report['duplicates'] + report['existing']
+    return new_rows.to_dict('records'), report
@@ -3,7 +3,13 @@ import pandas as pd
 import os
 import logging
 import datetime
-from .backup_restore import backup_db
+import re
+from .backup_restore import backup_db, backup_db_to_buffer
+from .cache_registry import notify_write, ALL_TABLES
+from .migrations import SQLITE_MIGRATIONS, apply_sqlite_migrations, pending_sqlite_migrations
+from .db_pool import get_pool, BUSY_TIMEOUT_MS
+from .export_engine import INCIDENT_EXPORT_COLUMNS, ACTION_EXPORT_COLUMNS, EMPTY_WATERMARK, GZIP_MIME, SQLITE_MIME, new_export_buffer, export_result, write_export, build_export_manifest, safe_file_part
+from .csv_import import CSV_IMPORT_TARGETS, import_columns, make_key, split_new_rows, stream_csv_import
 try:
     from config import is_deployed_environment, DB_CONFIG
 except ImportError:
@@ -18,9 +24,16 @@ logger = logging.getLogger(__name__)
 DB_PATH = DB_CONFIG['path']
 
 def get_db_connection():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Presta una conexión del pool; conn.close() la devuelve al pool en lugar de cerrarla"""
+    return get_pool(DB_PATH).acquire()
+
+def db_connection():
+    """Context manager para usar una conexión del pool: with db_connection() as conn: ..."""
+    return get_pool(DB_PATH).connection()
+
+def run_write(operation):
+    """Ejecuta operation(conn) en una transacción de escritura, reintentando si la base de datos está bloqueada"""
+    return get_pool(DB_PATH).run_write(operation)
 
 def init_db():
     # Verificar entorno y configuración
@@ -36,152 +49,146 @@ def init_db():
     # Crear directorio si no existe
     os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
     
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    # Verificar si hay datos existentes antes de ejecutar el schema
-    existing_records = 0
-    tables_exist = False
-    
-    if db_exists:
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        
+        # Modo WAL: los lectores no bloquean a los escritores y las escrituras concurrentes esperan al bloqueo
+        journal_mode = cursor.execute('PRAGMA journal_mode = WAL').fetchone()[0]
+        cursor.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}')
+        if journal_mode.lower() == 'wal':
+            logger.info(f"Journal mode: WAL (busy timeout {BUSY_TIMEOUT_MS} ms)")
+        else:
+            logger.warning(f"Could not enable WAL mode, journal mode is {journal_mode}")
+        
+        # Esquema al día: no hace falta repetir las comprobaciones
+        pending = pending_sqlite_migrations(conn)
+        if not pending:
+            logger.info(f"Schema up to date (version {SQLITE_MIGRATIONS[-1].version}), skipping checks")
+            return
+        logger.info(f"Pending migrations: {[f'{m.version:04d}_{m.name}' for m in pending]}")
+        
+        # Verificar si hay datos existentes antes de migrar
+        existing_records = 0
+        tables_exist = False
+        
+        if db_exists:
+            try:
+                # Verificar si las tablas existen
+                cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='coordinators'")
+                tables_exist = cursor.fetchone() is not None
+                
+                if tables_exist:
+                    count_result = cursor.execute('SELECT COUNT(*) FROM coordinators').fetchone()
+                    existing_records = count_result[0] if count_result else 0
+                    logger.info(f"Existing coordinators in database: {existing_records}")
+                else:
+                    logger.info("Database file exists but tables don't exist yet")
+            except sqlite3.OperationalError as e:
+                logger.info(f"Database tables don't exist yet: {e}")
+                tables_exist = False
+        else:
+            logger.info("Creating new database...")
+        
+        # Crear backup automático si estamos en deploy y hay datos que migrar
+        if deployed and existing_records > 0 and DB_CONFIG.get('backup_on_deploy', True):
+            try:
+                backup_path = backup_db()
+                logger.info(f"Automatic backup created before init: {backup_path}")
+            except Exception as e:
+                logger.warning(f"Could not create automatic backup: {e}")
+        
+        # Aplicar solo las migraciones pendientes, cada una en su propia transacción
+        applied = apply_sqlite_migrations(get_pool(DB_PATH))
+        logger.info(f"Applied migrations: {applied}")
+        
+        # Verificar datos después de la inicialización
         try:
-            # Verificar si las tablas existen
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='coordinators'")
-            tables_exist = cursor.fetchone() is not None
+            final_count = cursor.execute('SELECT COUNT(*) FROM coordinators').fetchone()[0]
+            logger.info(f"Final coordinators count after init: {final_count}")
+            
+            # Verificar otras tablas importantes
+            incident_count = cursor.execute('SELECT COUNT(*) FROM incident_records').fetchone()[0]
+            logger.info(f"Total incident records: {incident_count}")
             
-            if tables_exist:
-                count_result = cursor.execute('SELECT COUNT(*) FROM coordinators').fetchone()
-                existing_records = count_result[0] if count_result else 0
-                logger.info(f"Existing coordinators in database: {existing_records}")
-            else:
-                logger.info("Database file exists but tables don't exist yet")
         except sqlite3.OperationalError as e:
-            logger.info(f"Database tables don't exist yet: {e}")
-            tables_exist = False
-    else:
-        logger.info("Creating new database...")
-    
-    # Crear backup automático si estamos en deploy y hay datos
-    if deployed and existing_records > 0 and DB_CONFIG.get('backup_on_deploy', True):
+            logger.warning(f"Could not count records after init: {e}")
+        
+        # Chequeo de integridad
         try:
-            backup_path = backup_db()
-            logger.info(f"Automatic backup created before init: {backup_path}")
+            integrity_result = cursor.execute('PRAGMA integrity_check').fetchone()[0]
+            if integrity_result != 'ok':
+                logger.error(f"Integrity check failed: {integrity_result}")
+                raise sqlite3.IntegrityError("Database integrity check failed")
+            else:
+                logger.info("Database integrity check passed")
         except Exception as e:
-            logger.warning(f"Could not create automatic backup: {e}")
-    
-    # Solo ejecutar el schema si las tablas no existen
-    # En entornos de deploy, ser extra cuidadoso
-    if not tables_exist or (not deployed and not preserve_data):
-        logger.info("Executing schema to create/update tables...")
-        with open(os.path.join('db', 'schema.sql'), 'r', encoding='utf-8') as f:
-            cursor.executescript(f.read())
-        conn.commit()
-        logger.info("Schema executed successfully")
-    else:
-        logger.info("Tables already exist, skipping schema execution to preserve data")
-    
-    # Verificar datos después de la inicialización
-    try:
-        final_count = cursor.execute('SELECT COUNT(*) FROM coordinators').fetchone()[0]
-        logger.info(f"Final coordinators count after init: {final_count}")
+            logger.error(f"Error during integrity check: {e}")
         
-        # Verificar otras tablas importantes
-        incident_count = cursor.execute('SELECT COUNT(*) FROM incident_records').fetchone()[0]
-        logger.info(f"Total incident records: {incident_count}")
-        
-    except sqlite3.OperationalError as e:
-        logger.warning(f"Could not count records after init: {e}")
-    
-    # Chequeo de integridad
-    try:
-        integrity_result = cursor.execute('PRAGMA integrity_check').fetchone()[0]
-        if integrity_result != 'ok':
-            logger.error(f"Integrity check failed: {integrity_result}")
-            raise sqlite3.IntegrityError("Database integrity check failed")
-        else:
-            logger.info("Database integrity check passed")
-    except Exception as e:
-        logger.error(f"Error during integrity check: {e}")
-    
-    conn.close()
     logger.info("Database initialization completed successfully")
 
 def insert_coordinator(name, surnames):
     try:
-        conn = get_db_connection()
-        conn.execute('INSERT INTO coordinators (name, surnames) VALUES (?, ?)', (name, surnames))
-        conn.commit()
+        run_write(lambda conn: conn.execute('INSERT INTO coordinators (name, surnames) VALUES (?, ?)', (name, surnames)))
+        notify_write('coordinators')
         logger.info(f"Inserted coordinator: {name} {surnames}")
     except sqlite3.Error as e:
         logger.error(f"Error inserting coordinator: {e}")
-    finally:
-        conn.close()
 
 def insert_verifier(name, surnames, phone, zone):
     try:
-        conn = get_db_connection()
-        conn.execute('INSERT INTO verifiers (name, surnames, phone, zone) VALUES (?, ?, ?, ?)', (name, surnames, phone, zone))
-        conn.commit()
+        run_write(lambda conn: conn.execute('INSERT INTO verifiers (name, surnames, phone, zone) VALUES (?, ?, ?, ?)', (name, surnames, phone, zone)))
+        notify_write('verifiers')
         logger.info(f"Inserted verifier: {name} {surnames}")
     except sqlite3.Error as e:
         logger.error(f"Error inserting verifier: {e}")
-    finally:
-        conn.close()
 
 def insert_warehouse(name, codigo_consejo, zone):
     try:
-        conn = get_db_connection()
-        conn.execute('INSERT INTO warehouses (name, codigo_consejo, zone) VALUES (?, ?, ?)', (name, codigo_consejo, zone))
-        conn.commit()
+        run_write(lambda conn: conn.execute('INSERT INTO warehouses (name, codigo_consejo, zone) VALUES (?, ?, ?)', (name, codigo_consejo, zone)))
+        notify_write('warehouses')
         logger.info(f"Inserted warehouse: {name} with Código Consejo {codigo_consejo}")
     except sqlite3.Error as e:
         logger.error(f"Error inserting warehouse: {e}")
-    finally:
-        conn.close()
-
-def load_csv_to_verifiers(csv_file, sep=','):
-    # Resetear el puntero del archivo al inicio
-    csv_file.seek(0)
-    df = pd.read_csv(csv_file, sep=sep, encoding='utf-8-sig')
-    # Limpiar nombres de columnas (eliminar espacios, BOM y caracteres especiales)
-    df.columns = df.columns.str.strip().str.lower().str.replace(' ', '_').str.replace('ï»¿', '')
-    conn = get_db_connection()
-    for _, row in df.iterrows():
-        name = row['name']
-        surnames = row['surnames']
-        cursor = conn.execute('SELECT COUNT(*) FROM verifiers WHERE name = ? AND surnames = ?', (name, surnames))
-        if cursor.fetchone()[0] == 0:
-            insert_verifier(name, surnames, row.get('phone', ''), row.get('zone', ''))
-        else:
-            print(f"Verifier {name} {surnames} already exists, skipping.")
-    conn.close()
-
-def load_csv_to_warehouses(csv_file, sep=','):
-    # Resetear el puntero del archivo al inicio
-    csv_file.seek(0)
-    df = pd.read_csv(csv_file, sep=sep, encoding='utf-8-sig')
-    # Limpiar nombres de columnas (eliminar espacios, BOM y caracteres especiales)
-    df.columns = df.columns.str.strip().str.lower().str.replace(' ', '_').str.replace('ï»¿', '')
-    conn = get_db_connection()
-    for _, row in df.iterrows():
-        codigo_consejo = row['codigo_consejo']
-        cursor = conn.execute('SELECT COUNT(*) FROM warehouses WHERE codigo_consejo = ?', (codigo_consejo,))
-        if cursor.fetchone()[0] == 0:
-            insert_warehouse(row['name'], codigo_consejo, row.get('zone', ''))
-        else:
-            print(f"Warehouse with Código Consejo {codigo_consejo} already exists, skipping.")
-    conn.close()
+
+def get_existing_import_keys(table):
+    """Obtiene con una sola consulta las claves de los registros ya existentes en la tabla"""
+    key_columns = CSV_IMPORT_TARGETS[table]['key']
+    with db_connection() as conn:
+        rows = conn.execute(f"SELECT {', '.join(key_columns)} FROM {table}").fetchall()
+    return {make_key(row) for row in rows}
+
+def import_csv_rows(table, df, existing_keys=None):
+    """Inserta por lotes las filas nuevas de un DataFrame del CSV y retorna el informe de insertadas/omitidas"""
+    if existing_keys is None:
+        existing_keys = get_existing_import_keys(table)
+    rows, report = split_new_rows(table, df, existing_keys)
+    
+    if rows:
+        columns = import_columns(table)
+        query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+        run_write(lambda conn: conn.executemany(query, [tuple(row[col] for col in columns) for row in rows]))
+        notify_write(table)
+    
+    report['inserted'] = len(rows)
+    logger.info(f"Imported {len(rows)} rows into {table} ({report['skipped']} skipped)")
+    return report
+
+def load_csv_to_verifiers(csv_file, sep=',', progress=None):
+    """Importa el CSV por lotes; progress(fracción, informe) recibe el avance tras cada lote"""
+    return stream_csv_import(csv_file, 'verifiers', import_csv_rows, get_existing_import_keys('verifiers'), sep=sep, progress=progress)
+
+def load_csv_to_warehouses(csv_file, sep=',', progress=None):
+    """Importa el CSV por lotes; progress(fracción, informe) recibe el avance tras cada lote"""
+    return stream_csv_import(csv_file, 'warehouses', import_csv_rows, get_existing_import_keys('warehouses'), sep=sep, progress=progress)
 
 def insert_incident(description, custom_code=None):
     """Inserta una nueva incidencia con código automático o personalizado"""
-    try:
-        conn = get_db_connection()
-        
+    def insert(conn):
         if custom_code:
             # Verificar si el código personalizado ya existe
             existing = conn.execute('SELECT id FROM incidents WHERE code = ?', (custom_code,)).fetchone()
             if existing:
-                return {'success': False, 'error': f'El código "{custom_code}" ya existe. Por favor, use un código diferente.'}
+                return None
             code = custom_code
         else:
             # Generar código automático
@@ -195,480 +202,629 @@ def insert_incident(description, custom_code=None):
                 code = f"{count + 1:03d}"
         
         conn.execute('INSERT INTO incidents (code, description) VALUES (?, ?)', (code, description))
-        conn.commit()
+        return code
+    
+    try:
+        code = run_write(insert)
+        if code is None:
+            return {'success': False, 'error': f'El código "{custom_code}" ya existe. Por favor, use un código diferente.'}
+        notify_write('incidents')
         logger.info(f"Inserted incident with code {code}")
         return {'success': True, 'code': code}
         
     except sqlite3.Error as e:
         logger.error(f"Error inserting incident: {e}")
         return {'success': False, 'error': f'Error al guardar la incidencia: {str(e)}'}
-    finally:
-        conn.close()
 
 def get_coordinators():
     try:
-        conn = get_db_connection()
-        coordinators = conn.execute('SELECT id, name, surnames FROM coordinators').fetchall()
-        return [dict(row) for row in coordinators]
+        with db_connection() as conn:
+            coordinators = conn.execute('SELECT id, name, surnames FROM coordinators').fetchall()
+            return [dict(row) for row in coordinators]
     except sqlite3.Error as e:
         print(f"Error getting coordinators: {e}")
         return []
-    finally:
-        conn.close()
 
 def get_verifiers():
-    conn = get_db_connection()
-    verifiers = conn.execute('SELECT id, name, surnames, phone, zone FROM verifiers').fetchall()
-    conn.close()
+    with db_connection() as conn:
+        verifiers = conn.execute('SELECT id, name, surnames, phone, zone FROM verifiers').fetchall()
     return [dict(row) for row in verifiers]
 
 def get_warehouses():
-    conn = get_db_connection()
-    warehouses = conn.execute('SELECT id, name, codigo_consejo, zone FROM warehouses').fetchall()
-    conn.close()
+    with db_connection() as conn:
+        warehouses = conn.execute('SELECT id, name, codigo_consejo, zone FROM warehouses').fetchall()
     return [dict(row) for row in warehouses]
 
 def get_incidents():
-    conn = get_db_connection()
-    incidents = conn.execute('SELECT id, code || " - " || description AS label FROM incidents').fetchall()
-    conn.close()
+    with db_connection() as conn:
+        incidents = conn.execute('SELECT id, code || " - " || description AS label FROM incidents').fetchall()
     return [(row['id'], row['label']) for row in incidents]
 
 def insert_incident_record(date, registering_coordinator_id, warehouse_id, causing_verifier_id, incident_id, assigned_coordinator_id, explanation, enlace, status, responsible):
     try:
-        conn = get_db_connection()
-        conn.execute('INSERT INTO incident_records (date, registering_coordinator_id, warehouse_id, causing_verifier_id, incident_id, assigned_coordinator_id, explanation, enlace, status, responsible) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', 
-                     (date, registering_coordinator_id, warehouse_id, causing_verifier_id, incident_id, assigned_coordinator_id, explanation, enlace, status, responsible))
-        conn.commit()
+        run_write(lambda conn: conn.execute('INSERT INTO incident_records (date, registering_coordinator_id, warehouse_id, causing_verifier_id, incident_id, assigned_coordinator_id, explanation, enlace, status, responsible) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', 
+                                            (date, registering_coordinator_id, warehouse_id, causing_verifier_id, incident_id, assigned_coordinator_id, explanation, enlace, status, responsible)))
+        notify_write('incident_records')
         logger.info(f"Inserted incident record on date {date}")
     except sqlite3.Error as e:
         logger.error(f"Error inserting incident record: {e}")
-    finally:
-        conn.close()
+
+INCIDENT_RECORDS_PAGE_SIZE = 50
+
+INCIDENT_RECORD_OPTION_QUERY = '''
+SELECT ir.id, ir.date,
+       c.name || ' ' || c.surnames AS registering_coordinator,
+       w.name AS warehouse,
+       v.name || ' ' || v.surnames AS causing_verifier,
+       i.code || ' - ' || i.description AS incident,
+       ac.name || ' ' || ac.surnames AS assigned_coordinator
+FROM incident_records ir
+JOIN coordinators c ON ir.registering_coordinator_id = c.id
+JOIN warehouses w ON ir.warehouse_id = w.id
+JOIN verifiers v ON ir.causing_verifier_id = v.id
+JOIN incidents i ON ir.incident_id = i.id
+JOIN coordinators ac ON ir.assigned_coordinator_id = ac.id
+'''
+
+def format_incident_record_option(row):
+    """Retorna la tupla (id, texto) con la que se muestra un registro en los selectores"""
+    return (row['id'], f"ID: {row['id']} - Fecha: {row['date']} - Incidencia: {row['incident']} - Bodega: {row['warehouse']} - Verificador: {row['causing_verifier']} - Coordinador: {row['assigned_coordinator']}")
 
 def get_incident_records():
-    conn = get_db_connection()
-    records = conn.execute('SELECT ir.id, ir.date, c.name || " " || c.surnames AS registering_coordinator, w.name AS warehouse, v.name || " " || v.surnames AS causing_verifier, i.code || " - " || i.description AS incident, ac.name || " " || ac.surnames AS assigned_coordinator, ir.explanation, ir.status, ir.responsible FROM incident_records ir JOIN coordinators c ON ir.registering_coordinator_id = c.id JOIN warehouses w ON ir.warehouse_id = w.id JOIN verifiers v ON ir.causing_verifier_id = v.id JOIN incidents i ON ir.incident_id = i.id JOIN coordinators ac ON ir.assigned_coordinator_id = ac.id ORDER BY ir.date DESC').fetchall()
-    conn.close()
-    return [(row['id'], f"ID: {row['id']} - Fecha: {row['date']} - Incidencia: {row['incident']} - Bodega: {row['warehouse']} - Verificador: {row['causing_verifier']} - Coordinador: {row['assigned_coordinator']}") for row in records]
+    with db_connection() as conn:
+        records = conn.execute(INCIDENT_RECORD_OPTION_QUERY + ' ORDER BY ir.date DESC').fetchall()
+    return [format_incident_record_option(row) for row in records]
+
+def get_incident_record_option(incident_record_id):
+    """Retorna la tupla (id, texto) de un registro para los selectores, o None si no existe"""
+    with db_connection() as conn:
+        row = conn.execute(INCIDENT_RECORD_OPTION_QUERY + ' WHERE ir.id = ?', (incident_record_id,)).fetchone()
+    return format_incident_record_option(row) if row else None
+
+def get_incident_records_page(search=None, cursor=None, page_size=INCIDENT_RECORDS_PAGE_SIZE):
+    """Obtiene una página de registros (id, texto) ordenados por fecha e id descendentes
+    
+    search filtra por id, explicación, bodega, verificador, incidencia o coordinadores.
+    cursor es el (date, id) del último registro de la página anterior (paginación por clave).
+    Retorna {'records': [...], 'next_cursor': (date, id) o None si no hay más páginas}
+    """
+    conditions = []
+    params = []
+    
+    if search and search.strip():
+        term = search.strip()
+        pattern = f'%{term}%'
+        conditions.append('''(CAST(ir.id AS TEXT) = ? OR ir.explanation LIKE ? OR w.name LIKE ?
+            OR v.name || ' ' || v.surnames LIKE ? OR i.code || ' - ' || i.description LIKE ?
+            OR c.name || ' ' || c.surnames LIKE ? OR ac.name || ' ' || ac.surnames LIKE ?)''')
+        params.extend([term] + [pattern] * 6)
+    
+    if cursor:
+        cursor_date, cursor_id = cursor
+        conditions.append('(ir.date < ? OR (ir.date = ? AND ir.id < ?))')
+        params.extend([cursor_date, cursor_date, cursor_id])
+    
+    query = INCIDENT_RECORD_OPTION_QUERY
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+    # Se pide un registro extra para saber si existe una página siguiente
+    query += ' ORDER BY ir.date DESC, ir.id DESC LIMIT ?'
+    params.append(page_size + 1)
+    
+    with db_connection() as conn:
+        rows = conn.execute(query, params).fetchall()
+    
+    next_cursor = (rows[page_size - 1]['date'], rows[page_size - 1]['id']) if len(rows) > page_size else None
+    return {'records': [format_incident_record_option(row) for row in rows[:page_size]], 'next_cursor': next_cursor}
 
 def insert_incident_action(incident_record_id, action_date, action_description, new_status, performed_by):
     try:
-        conn = get_db_connection()
-        conn.execute('INSERT INTO incident_actions (incident_record_id, action_date, action_description, new_status, performed_by) VALUES (?, ?, ?, ?, ?)', (incident_record_id, action_date, action_description, new_status, performed_by))
+        def insert(conn):
+            conn.execute('INSERT INTO incident_actions (incident_record_id, action_date, action_description, new_status, performed_by) VALUES (?, ?, ?, ?, ?)', (incident_record_id, action_date, action_description, new_status, performed_by))
+            if new_status:
+                conn.execute('UPDATE incident_records SET status = ? WHERE id = ?', (new_status, incident_record_id))
+        
+        run_write(insert)
         if new_status:
-            conn.execute('UPDATE incident_records SET status = ? WHERE id = ?', (new_status, incident_record_id))
-        conn.commit()
+            notify_write('incident_actions', 'incident_records')
+        else:
+            notify_write('incident_actions')
         logger.info(f"Inserted action for incident record {incident_record_id}")
     except sqlite3.Error as e:
         logger.error(f"Error inserting incident action: {e}")
-    finally:
-        conn.close()
 
 def get_incident_actions(incident_record_id):
-    conn = get_db_connection()
-    actions = conn.execute('SELECT ia.action_date, ia.action_description, ia.new_status, c.name || " " || c.surnames AS performed_by FROM incident_actions ia JOIN coordinators c ON ia.performed_by = c.id WHERE ia.incident_record_id = ? ORDER BY ia.action_date', (incident_record_id,)).fetchall()
-    conn.close()
+    with db_connection() as conn:
+        actions = conn.execute('SELECT ia.action_date, ia.action_description, ia.new_status, c.name || " " || c.surnames AS performed_by FROM incident_actions ia JOIN coordinators c ON ia.performed_by = c.id WHERE ia.incident_record_id = ? ORDER BY ia.action_date', (incident_record_id,)).fetchall()
     return actions
 
 def get_all_incident_records_df():
-    conn = get_db_connection()
-    df = pd.read_sql_query('SELECT ir.id, ir.date, ir.explanation, ir.enlace, ir.status, ir.responsible, c.name || " " || c.surnames AS registering_coordinator, w.name AS warehouse, w.zone AS warehouse_zone, v.name || " " || v.surnames AS causing_verifier, v.zone AS verifier_zone, i.description AS incident_type, ac.name || " " || ac.surnames AS assigned_coordinator FROM incident_records ir JOIN coordinators c ON ir.registering_coordinator_id = c.id JOIN warehouses w ON ir.warehouse_id = w.id JOIN verifiers v ON ir.causing_verifier_id = v.id JOIN incidents i ON ir.incident_id = i.id JOIN coordinators ac ON ir.assigned_coordinator_id = ac.id', conn)
-    conn.close()
+    with db_connection() as conn:
+        df = pd.read_sql_query('SELECT ir.id, ir.date, ir.explanation, ir.enlace, ir.status, ir.responsible, c.name || " " || c.surnames AS registering_coordinator, w.name AS warehouse, w.zone AS warehouse_zone, v.name || " " || v.surnames AS causing_verifier, v.zone AS verifier_zone, i.description AS incident_type, ac.name || " " || ac.surnames AS assigned_coordinator FROM incident_records ir JOIN coordinators c ON ir.registering_coordinator_id = c.id JOIN warehouses w ON ir.warehouse_id = w.id JOIN verifiers v ON ir.causing_verifier_id = v.id JOIN incidents i ON ir.incident_id = i.id JOIN coordinators ac ON ir.assigned_coordinator_id = ac.id', conn)
     return df
 
 def get_all_verifiers_df():
-    conn = get_db_connection()
-    df = pd.read_sql_query('SELECT * FROM verifiers', conn)
-    conn.close()
+    with db_connection() as conn:
+        df = pd.read_sql_query('SELECT * FROM verifiers', conn)
     return df
 
 def get_all_warehouses_df():
-    conn = get_db_connection()
-    df = pd.read_sql_query('SELECT * FROM warehouses', conn)
-    conn.close()
+    with db_connection() as conn:
+        df = pd.read_sql_query('SELECT * FROM warehouses', conn)
+    return df
+
+def get_incident_counts(label, expression, joins='', condition=None):
+    """Cuenta registros de incidencia agrupados por una expresión con GROUP BY en SQLite"""
+    where = f'{expression} IS NOT NULL'
+    if condition:
+        where += f' AND {condition}'
+    query = f'''
+    SELECT {expression} AS {label}, COUNT(*) AS count
+    FROM incident_records ir
+    {joins}
+    WHERE {where}
+    GROUP BY {label}
+    ORDER BY {label}
+    '''
+    with db_connection() as conn:
+        df = pd.read_sql_query(query, conn)
     return df
 
 def get_incidents_by_zone():
-    df = get_all_incident_records_df()
-    return df.groupby('warehouse_zone').size().reset_index(name='count')
+    return get_incident_counts('warehouse_zone', 'w.zone', 'JOIN warehouses w ON ir.warehouse_id = w.id')
 
 def get_incidents_by_verifier():
-    df = get_all_incident_records_df()
-    return df.groupby('causing_verifier').size().reset_index(name='count')
+    return get_incident_counts('causing_verifier', "v.name || ' ' || v.surnames", 'JOIN verifiers v ON ir.causing_verifier_id = v.id')
 
 def get_incidents_by_warehouse():
-    df = get_all_incident_records_df()
-    return df.groupby('warehouse').size().reset_index(name='count')
+    return get_incident_counts('warehouse', 'w.name', 'JOIN warehouses w ON ir.warehouse_id = w.id')
 
 def get_incidents_by_type():
-    df = get_all_incident_records_df()
-    return df.groupby('incident_type').size().reset_index(name='count')
+    return get_incident_counts('incident_type', 'i.description', 'JOIN incidents i ON ir.incident_id = i.id')
 
 def get_incidents_by_status():
-    df = get_all_incident_records_df()
-    return df.groupby('status').size().reset_index(name='count')
+    return get_incident_counts('status', 'ir.status')
 
 def get_assignments_by_verifier():
-    df = get_all_incident_records_df()
-    return df[df['responsible'] == 'Verificador'].groupby('causing_verifier').size().reset_index(name='count')
+    return get_incident_counts('causing_verifier', "v.name || ' ' || v.surnames", 'JOIN verifiers v ON ir.causing_verifier_id = v.id', "ir.responsible = 'Verificador'")
 
 def reset_database():
-    conn = get_db_connection()
-    tables = ['coordinators', 'verifiers', 'warehouses', 'incidents', 'incident_records', 'incident_actions']
-    for table in tables:
-        conn.execute(f'DELETE FROM {table}')
-    conn.commit()
-    conn.close()
+    def delete_all(conn):
+        tables = ['coordinators', 'verifiers', 'warehouses', 'incidents', 'incident_records', 'incident_actions']
+        for table in tables:
+            conn.execute(f'DELETE FROM {table}')
+    
+    run_write(delete_all)
+    notify_write(*ALL_TABLES)
 
 def get_incident_record_details(incident_record_id):
-    conn = get_db_connection()
-    row = conn.execute('SELECT ir.*, c.name || " " || c.surnames AS registering_coordinator, w.name AS warehouse, w.zone AS warehouse_zone, v.name || " " || v.surnames AS causing_verifier, v.zone AS verifier_zone, i.description AS incident_type, ac.name || " " || ac.surnames AS assigned_coordinator FROM incident_records ir JOIN coordinators c ON ir.registering_coordinator_id = c.id JOIN warehouses w ON ir.warehouse_id = w.id JOIN verifiers v ON ir.causing_verifier_id = v.id JOIN incidents i ON ir.incident_id = i.id JOIN coordinators ac ON ir.assigned_coordinator_id = ac.id WHERE ir.id = ?', (incident_record_id,)).fetchone()
-    conn.close()
+    with db_connection() as conn:
+        row = conn.execute('SELECT ir.*, c.name || " " || c.surnames AS registering_coordinator, w.name AS warehouse, w.zone AS warehouse_zone, v.name || " " || v.surnames AS causing_verifier, v.zone AS verifier_zone, i.description AS incident_type, ac.name || " " || ac.surnames AS assigned_coordinator FROM incident_records ir JOIN coordinators c ON ir.registering_coordinator_id = c.id JOIN warehouses w ON ir.warehouse_id = w.id JOIN verifiers v ON ir.causing_verifier_id = v.id JOIN incidents i ON ir.incident_id = i.id JOIN coordinators ac ON ir.assigned_coordinator_id = ac.id WHERE ir.id = ?', (incident_record_id,)).fetchone()
     if row:
         return dict(row)
     return {}
 
-def export_incidents_to_excel():
-    """Exporta historial completo de incidencias con acciones a Excel"""
-    conn = get_db_connection()
+INCIDENTS_EXPORT_SELECT = '''
+SELECT
+    ir.id as 'ID Registro',
+    ir.date as 'Fecha',
+    c.name || " " || c.surnames as 'Coordinador Registrador',
+    w.name as 'Bodega',
+    w.zone as 'Zona Bodega',
+    v.name || " " || v.surnames as 'Verificador Causante',
+    v.zone as 'Zona Verificador',
+    i.code || " - " || i.description as 'Incidencia',
+    ac.name || " " || ac.surnames as 'Coordinador Asignado',
+    ir.explanation as 'Explicación',
+    ir.status as 'Estado',
+    ir.responsible as 'Responsable'
+FROM incident_records ir
+JOIN coordinators c ON ir.registering_coordinator_id = c.id
+JOIN warehouses w ON ir.warehouse_id = w.id
+JOIN verifiers v ON ir.causing_verifier_id = v.id
+JOIN incidents i ON ir.incident_id = i.id
+JOIN coordinators ac ON ir.assigned_coordinator_id = ac.id
+'''
+
+INCIDENTS_EXPORT_QUERY = INCIDENTS_EXPORT_SELECT + 'ORDER BY ir.date DESC'
+
+# Registros nuevos o modificados entre dos marcas de agua
+INCIDENTS_INCREMENTAL_QUERY = INCIDENTS_EXPORT_SELECT + '''
+WHERE ir.id <= :record_id_to
+  AND (ir.id > :record_id_from
+       OR ir.id IN (SELECT incident_record_id FROM incident_record_changes WHERE id > :change_id_from AND id <= :change_id_to))
+ORDER BY ir.id
+'''
+
+ACTIONS_EXPORT_SELECT = '''
+SELECT
+    ia.incident_record_id as 'ID Registro',
+    ia.action_date as 'Fecha Acción',
+    ia.action_description as 'Descripción Acción',
+    ia.new_status as 'Nuevo Estado',
+    c.name || " " || c.surnames as 'Realizado Por'
+FROM incident_actions ia
+JOIN coordinators c ON ia.performed_by = c.id
+'''
+
+ACTIONS_EXPORT_QUERY = ACTIONS_EXPORT_SELECT + 'ORDER BY ia.incident_record_id, ia.action_date'
+
+ACTIONS_INCREMENTAL_QUERY = ACTIONS_EXPORT_SELECT + '''
+WHERE ia.id > :action_id_from AND ia.id <= :action_id_to
+ORDER BY ia.id
+'''
+
+def export_incidents(export_format='xlsx'):
+    """Exporta historial completo de incidencias con acciones en el formato indicado (ver EXPORT_FORMATS)
     
-    # Obtener datos de incidencias
-    incidents_query = '''
-    SELECT 
-        ir.id as 'ID Registro',
-        ir.date as 'Fecha',
-        c.name || " " || c.surnames as 'Coordinador Registrador',
-        w.name as 'Bodega',
-        w.zone as 'Zona Bodega',
-        v.name || " " || v.surnames as 'Verificador Causante',
-        v.zone as 'Zona Verificador',
-        i.code || " - " || i.description as 'Incidencia',
-        ac.name || " " || ac.surnames as 'Coordinador Asignado',
-        ir.explanation as 'Explicación',
-        ir.status as 'Estado',
-        ir.responsible as 'Responsable'
-    FROM incident_records ir 
-    JOIN coordinators c ON ir.registering_coordinator_id = c.id 
-    JOIN warehouses w ON ir.warehouse_id = w.id 
-    JOIN verifiers v ON ir.causing_verifier_id = v.id 
-    JOIN incidents i ON ir.incident_id = i.id 
-    JOIN coordinators ac ON ir.assigned_coordinator_id = ac.id
-    ORDER BY ir.date DESC
-    '''
+    Las filas se escriben directamente desde el cursor y cada fichero se genera en un buffer
+    (ver new_export_buffer). Retorna una lista de {'file_name', 'buffer', 'mime'}.
+    """
+    timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
     
-    # Obtener datos de acciones
-    actions_query = '''
-    SELECT 
-        ia.incident_record_id as 'ID Registro',
-        ia.action_date as 'Fecha Acción',
-        ia.action_description as 'Descripción Acción',
-        ia.new_status as 'Nuevo Estado',
-        c.name || " " || c.surnames as 'Realizado Por'
-    FROM incident_actions ia
-    JOIN coordinators c ON ia.performed_by = c.id
-    ORDER BY ia.incident_record_id, ia.action_date
-    '''
+    with db_connection() as conn:
+        return write_export([
+            ('Incidencias', INCIDENT_EXPORT_COLUMNS, conn.execute(INCIDENTS_EXPORT_QUERY)),
+            ('Acciones', ACTION_EXPORT_COLUMNS, conn.execute(ACTIONS_EXPORT_QUERY))
+        ], export_format, f'historial_incidencias_{timestamp}')
+
+def export_incidents_to_excel():
+    """Exporta historial completo de incidencias con acciones a Excel
     
-    df_incidents = pd.read_sql_query(incidents_query, conn)
-    df_actions = pd.read_sql_query(actions_query, conn)
-    conn.close()
+    Retorna {'file_name', 'buffer', 'mime'}.
+    """
+    return export_incidents('xlsx')[0]
+
+def get_export_watermark(target):
+    """Marca de agua de la última exportación incremental del destino (EMPTY_WATERMARK si no hay ninguna)"""
+    with db_connection() as conn:
+        row = conn.execute(
+            'SELECT incident_record_id, incident_action_id, change_id FROM export_watermarks WHERE target = ?', (target,)
+        ).fetchone()
+    return dict(row) if row else dict(EMPTY_WATERMARK)
+
+def get_current_watermark(conn):
+    """Marca de agua con los últimos ids actuales; fija el límite superior de la exportación"""
+    return dict(conn.execute('''
+    SELECT coalesce((SELECT MAX(id) FROM incident_records), 0) AS incident_record_id,
+           coalesce((SELECT MAX(id) FROM incident_actions), 0) AS incident_action_id,
+           coalesce((SELECT MAX(id) FROM incident_record_changes), 0) AS change_id
+    ''').fetchone())
+
+def save_export_watermark(target, watermark):
+    """Guarda la marca de agua del destino y descarta los cambios ya exportados por todos los destinos
+
+    Se llama al confirmar la entrega de una exportación incremental. La marca de agua nunca
+    retrocede: confirmar una exportación anterior a la última confirmada no la modifica.
+    """
+    def save(conn):
+        conn.execute('''
+        INSERT INTO export_watermarks (target, incident_record_id, incident_action_id, change_id, exported_at)
+        VALUES (:target, :incident_record_id, :incident_action_id, :change_id, :exported_at)
+        ON CONFLICT(target) DO UPDATE SET
+            incident_record_id = MAX(incident_record_id, excluded.incident_record_id),
+            incident_action_id = MAX(incident_action_id, excluded.incident_action_id),
+            change_id = MAX(change_id, excluded.change_id),
+            exported_at = excluded.exported_at
+        ''', dict(watermark, target=target, exported_at=datetime.datetime.now().isoformat(timespec='seconds')))
+        conn.execute('DELETE FROM incident_record_changes WHERE id <= (SELECT MIN(change_id) FROM export_watermarks)')
+    run_write(save)
+
+def export_incidents_incremental(target, export_format='xlsx'):
+    """Exporta solo los registros y acciones nuevos o modificados desde la última exportación del destino
     
-    # Crear archivo Excel
+    La primera exportación de un destino incluye todo el historial. Además de los ficheros de
+    datos se genera un manifiesto JSON con las marcas de agua y los checksums. La marca de agua
+    del destino no se modifica: una vez entregados los ficheros se guarda con
+    save_export_watermark(target, manifest['watermark']); hasta entonces, repetir la exportación
+    vuelve a incluir los mismos registros.
+    Retorna una lista de {'file_name', 'buffer', 'mime'} (el manifiesto en último lugar).
+    """
     timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-    filename = f'historial_incidencias_{timestamp}.xlsx'
+    base_name = f'historial_incidencias_{safe_file_part(target)}_{timestamp}'
+    previous = get_export_watermark(target)
     
-    with pd.ExcelWriter(filename, engine='openpyxl') as writer:
-        df_incidents.to_excel(writer, sheet_name='Incidencias', index=False)
-        df_actions.to_excel(writer, sheet_name='Acciones', index=False)
+    with db_connection() as conn:
+        watermark = get_current_watermark(conn)
+        params = {
+            'record_id_from': previous['incident_record_id'], 'record_id_to': watermark['incident_record_id'],
+            'change_id_from': previous['change_id'], 'change_id_to': watermark['change_id'],
+            'action_id_from': previous['incident_action_id'], 'action_id_to': watermark['incident_action_id']
+        }
+        exports = write_export([
+            ('Incidencias', INCIDENT_EXPORT_COLUMNS, conn.execute(INCIDENTS_INCREMENTAL_QUERY, params)),
+            ('Acciones', ACTION_EXPORT_COLUMNS, conn.execute(ACTIONS_INCREMENTAL_QUERY, params))
+        ], export_format, base_name)
     
-    return filename
+    manifest = build_export_manifest(target, export_format, previous, watermark, exports, base_name)
+    logger.info(f"Incremental export for {target}: {[export.get('rows') for export in exports]}")
+    return exports + [manifest]
 
-def create_backup():
-    """Crea una copia de seguridad de la base de datos"""
+def create_backup(compress=False):
+    """Crea una copia en caliente y verificada de la base de datos en un buffer listo para descargar
+    
+    Con compress=True la copia se comprime con gzip (.db.gz). Retorna {'file_name', 'buffer', 'mime'}.
+    """
     try:
-        backup_path = backup_db()
-        return backup_path
+        timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+        buffer = backup_db_to_buffer(new_export_buffer(), compress=compress)
+        if compress:
+            return export_result(buffer, f'cavacrm_backup_{timestamp}.db.gz', GZIP_MIME)
+        return export_result(buffer, f'cavacrm_backup_{timestamp}.db', SQLITE_MIME)
     except Exception as e:
         logger.error(f"Error creating backup: {e}")
         raise e
 
 def get_dashboard_stats():
-    """Obtiene estadísticas para el dashboard"""
-    conn = get_db_connection()
+    """Obtiene estadísticas para el dashboard con una única consulta agregada"""
+    with db_connection() as conn:
+        
+        # Conteo por estado junto con las incidencias de los últimos 7 días en cada estado
+        query = '''
+        SELECT status,
+               COUNT(*) AS count,
+               SUM(CASE WHEN date >= date('now', '-7 days') THEN 1 ELSE 0 END) AS recent
+        FROM incident_records
+        GROUP BY status
+        ORDER BY count DESC
+        '''
+        by_status = pd.read_sql_query(query, conn)
     
-    # Estadísticas generales
+    # Estadísticas generales derivadas del conteo por estado
     stats = {}
+    resolved = by_status['status'] == 'Solucionado'
+    stats['total_incidents'] = int(by_status['count'].sum())
+    stats['pending_incidents'] = int(by_status.loc[~resolved & by_status['status'].notna(), 'count'].sum())
+    stats['resolved_incidents'] = int(by_status.loc[resolved, 'count'].sum())
+    stats['by_status'] = by_status[['status', 'count']]
+    stats['recent_incidents'] = int(by_status['recent'].sum())
     
-    # Total de incidencias
-    stats['total_incidents'] = conn.execute('SELECT COUNT(*) FROM incident_records').fetchone()[0]
-    
-    # Incidencias no resueltas (pendientes)
-    stats['pending_incidents'] = conn.execute('SELECT COUNT(*) FROM incident_records WHERE status != "Solucionado"').fetchone()[0]
-    
-    # Incidencias resueltas
-    stats['resolved_incidents'] = conn.execute('SELECT COUNT(*) FROM incident_records WHERE status = "Solucionado"').fetchone()[0]
-    
-    # Incidencias por estado
-    status_query = '''
-    SELECT status, COUNT(*) as count 
-    FROM incident_records 
-    GROUP BY status 
-    ORDER BY count DESC
-    '''
-    stats['by_status'] = pd.read_sql_query(status_query, conn)
-    
-    # Incidencias recientes (últimos 7 días)
-    recent_query = '''
-    SELECT COUNT(*) 
-    FROM incident_records 
-    WHERE date >= date('now', '-7 days')
-    '''
-    stats['recent_incidents'] = conn.execute(recent_query).fetchone()[0]
-    
-    conn.close()
     return stats
 
 def get_pending_incidents_summary():
     """Obtiene resumen de incidencias pendientes para el dashboard"""
-    conn = get_db_connection()
-    
-    query = '''
-    SELECT 
-        ir.id,
-        ir.date,
-        w.name as warehouse,
-        w.zone as warehouse_zone,
-        v.name || " " || v.surnames as causing_verifier,
-        i.description as incident_type,
-        ac.name || " " || ac.surnames as assigned_coordinator,
-        ir.status,
-        ir.responsible
-    FROM incident_records ir 
-    JOIN warehouses w ON ir.warehouse_id = w.id 
-    JOIN verifiers v ON ir.causing_verifier_id = v.id 
-    JOIN incidents i ON ir.incident_id = i.id 
-    JOIN coordinators ac ON ir.assigned_coordinator_id = ac.id
-    WHERE ir.status != "Solucionado"
-    ORDER BY ir.date DESC
-    LIMIT 10
-    '''
-    
-    df = pd.read_sql_query(query, conn)
-    conn.close()
+    with db_connection() as conn:
+        
+        query = '''
+        SELECT 
+            ir.id,
+            ir.date,
+            w.name as warehouse,
+            w.zone as warehouse_zone,
+            v.name || " " || v.surnames as causing_verifier,
+            i.description as incident_type,
+            ac.name || " " || ac.surnames as assigned_coordinator,
+            ir.status,
+            ir.responsible
+        FROM incident_records ir 
+        JOIN warehouses w ON ir.warehouse_id = w.id 
+        JOIN verifiers v ON ir.causing_verifier_id = v.id 
+        JOIN incidents i ON ir.incident_id = i.id 
+        JOIN coordinators ac ON ir.assigned_coordinator_id = ac.id
+        WHERE ir.status != "Solucionado"
+        ORDER BY ir.date DESC
+        LIMIT 10
+        '''
+        
+        df = pd.read_sql_query(query, conn)
     return df
 
 def get_recent_actions():
     """Obtiene las acciones más recientes para el dashboard"""
-    conn = get_db_connection()
-    
-    query = '''
-    SELECT 
-        ia.action_date,
-        ia.action_description,
-        ia.new_status,
-        c.name || " " || c.surnames as performed_by,
-        ir.id as incident_id,
-        w.name as warehouse
-    FROM incident_actions ia
-    JOIN coordinators c ON ia.performed_by = c.id
-    JOIN incident_records ir ON ia.incident_record_id = ir.id
-    JOIN warehouses w ON ir.warehouse_id = w.id
-    ORDER BY ia.action_date DESC
-    LIMIT 5
-    '''
-    
-    df = pd.read_sql_query(query, conn)
-    conn.close()
+    with db_connection() as conn:
+        
+        query = '''
+        SELECT 
+            ia.action_date,
+            ia.action_description,
+            ia.new_status,
+            c.name || " " || c.surnames as performed_by,
+            ir.id as incident_id,
+            w.name as warehouse
+        FROM incident_actions ia
+        JOIN coordinators c ON ia.performed_by = c.id
+        JOIN incident_records ir ON ia.incident_record_id = ir.id
+        JOIN warehouses w ON ir.warehouse_id = w.id
+        ORDER BY ia.action_date DESC
+        LIMIT 5
+        '''
+        
+        df = pd.read_sql_query(query, conn)
     return df
 
 def search_incident_by_code(code):
     """Busca una incidencia por su código único"""
     try:
-        conn = get_db_connection()
-        incident = conn.execute('SELECT * FROM incidents WHERE code = ?', (code,)).fetchone()
-        if incident:
-            return {'success': True, 'incident': dict(incident)}
-        else:
-            return {'success': False, 'error': f'No se encontró ninguna incidencia con el código "{code}"'}
+        with db_connection() as conn:
+            incident = conn.execute('SELECT * FROM incidents WHERE code = ?', (code,)).fetchone()
+            if incident:
+                return {'success': True, 'incident': dict(incident)}
+            else:
+                return {'success': False, 'error': f'No se encontró ninguna incidencia con el código "{code}"'}
     except sqlite3.Error as e:
         logger.error(f"Error searching incident by code: {e}")
         return {'success': False, 'error': f'Error al buscar la incidencia: {str(e)}'}
-    finally:
-        conn.close()
 
 def get_incident_records_by_incident_code(code):
     """Obtiene todos los registros de incidencia asociados a un código de incidencia"""
     try:
-        conn = get_db_connection()
-        query = '''
-        SELECT 
-            ir.id,
-            ir.date,
-            ir.explanation,
-            ir.enlace,
-            ir.status,
-            ir.responsible,
-            i.code as incident_code,
-            i.description as incident_description,
-            c.name || " " || c.surnames as registering_coordinator,
-            w.name as warehouse,
-            w.zone as warehouse_zone,
-            v.name || " " || v.surnames as causing_verifier,
-            ac.name || " " || ac.surnames as assigned_coordinator
-        FROM incident_records ir
-        JOIN incidents i ON ir.incident_id = i.id
-        JOIN coordinators c ON ir.registering_coordinator_id = c.id
-        JOIN warehouses w ON ir.warehouse_id = w.id
-        JOIN verifiers v ON ir.causing_verifier_id = v.id
-        JOIN coordinators ac ON ir.assigned_coordinator_id = ac.id
-        WHERE i.code = ?
-        ORDER BY ir.date DESC
-        '''
-        
-        records = conn.execute(query, (code,)).fetchall()
-        if records:
-            return {'success': True, 'records': [dict(record) for record in records]}
-        else:
-            return {'success': False, 'error': f'No se encontraron registros para el código de incidencia "{code}"'}
+        with db_connection() as conn:
+            query = '''
+            SELECT 
+                ir.id,
+                ir.date,
+                ir.explanation,
+                ir.enlace,
+                ir.status,
+                ir.responsible,
+                i.code as incident_code,
+                i.description as incident_description,
+                c.name || " " || c.surnames as registering_coordinator,
+                w.name as warehouse,
+                w.zone as warehouse_zone,
+                v.name || " " || v.surnames as causing_verifier,
+                ac.name || " " || ac.surnames as assigned_coordinator
+            FROM incident_records ir
+            JOIN incidents i ON ir.incident_id = i.id
+            JOIN coordinators c ON ir.registering_coordinator_id = c.id
+            JOIN warehouses w ON ir.warehouse_id = w.id
+            JOIN verifiers v ON ir.causing_verifier_id = v.id
+            JOIN coordinators ac ON ir.assigned_coordinator_id = ac.id
+            WHERE i.code = ?
+            ORDER BY ir.date DESC
+            '''
+            
+            records = conn.execute(query, (code,)).fetchall()
+            if records:
+                return {'success': True, 'records': [dict(record) for record in records]}
+            else:
+                return {'success': False, 'error': f'No se encontraron registros para el código de incidencia "{code}"'}
     except sqlite3.Error as e:
         logger.error(f"Error getting incident records by code: {e}")
         return {'success': False, 'error': f'Error al buscar registros: {str(e)}'}
-    finally:
-        conn.close()
 
 # Funciones de actualización/edición
 def update_coordinator(coordinator_id, name, surnames):
     """Actualizar un coordinador existente"""
     try:
-        conn = get_db_connection()
-        conn.execute('UPDATE coordinators SET name = ?, surnames = ? WHERE id = ?', (name, surnames, coordinator_id))
-        conn.commit()
+        run_write(lambda conn: conn.execute('UPDATE coordinators SET name = ?, surnames = ? WHERE id = ?', (name, surnames, coordinator_id)))
+        notify_write('coordinators')
         logger.info(f"Updated coordinator ID {coordinator_id}: {name} {surnames}")
         return True
     except sqlite3.Error as e:
         logger.error(f"Error updating coordinator: {e}")
         return False
-    finally:
-        conn.close()
 
 def update_verifier(verifier_id, name, surnames, phone, zone):
     """Actualizar un verificador existente"""
     try:
-        conn = get_db_connection()
-        conn.execute('UPDATE verifiers SET name = ?, surnames = ?, phone = ?, zone = ? WHERE id = ?', 
-                     (name, surnames, phone, zone, verifier_id))
-        conn.commit()
+        run_write(lambda conn: conn.execute('UPDATE verifiers SET name = ?, surnames = ?, phone = ?, zone = ? WHERE id = ?', 
+                                        (name, surnames, phone, zone, verifier_id)))
+        notify_write('verifiers')
         logger.info(f"Updated verifier ID {verifier_id}: {name} {surnames}")
         return True
     except sqlite3.Error as e:
         logger.error(f"Error updating verifier: {e}")
         return False
-    finally:
-        conn.close()
 
 def update_warehouse(warehouse_id, name, codigo_consejo, zone):
     """Actualizar una bodega existente"""
     try:
-        conn = get_db_connection()
-        conn.execute('UPDATE warehouses SET name = ?, codigo_consejo = ?, zone = ? WHERE id = ?', 
-                     (name, codigo_consejo, zone, warehouse_id))
-        conn.commit()
+        run_write(lambda conn: conn.execute('UPDATE warehouses SET name = ?, codigo_consejo = ?, zone = ? WHERE id = ?', 
+                                        (name, codigo_consejo, zone, warehouse_id)))
+        notify_write('warehouses')
         logger.info(f"Updated warehouse ID {warehouse_id}: {name}")
         return True
     except sqlite3.Error as e:
         logger.error(f"Error updating warehouse: {e}")
         return False
-    finally:
-        conn.close()
 
 def update_incident(incident_id, code, description):
     """Actualizar un tipo de incidencia existente"""
     try:
-        conn = get_db_connection()
-        conn.execute('UPDATE incidents SET code = ?, description = ? WHERE id = ?', 
-                     (code, description, incident_id))
-        conn.commit()
+        run_write(lambda conn: conn.execute('UPDATE incidents SET code = ?, description = ? WHERE id = ?', 
+                                        (code, description, incident_id)))
+        notify_write('incidents')
         logger.info(f"Updated incident ID {incident_id}: {code}")
         return True
     except sqlite3.Error as e:
         logger.error(f"Error updating incident: {e}")
         return False
-    finally:
-        conn.close()
 
 # Funciones para obtener registros individuales
 def get_coordinator_by_id(coordinator_id):
     """Obtener un coordinador por ID"""
     try:
-        conn = get_db_connection()
-        coordinator = conn.execute('SELECT * FROM coordinators WHERE id = ?', (coordinator_id,)).fetchone()
-        return dict(coordinator) if coordinator else None
+        with db_connection() as conn:
+            coordinator = conn.execute('SELECT * FROM coordinators WHERE id = ?', (coordinator_id,)).fetchone()
+            return dict(coordinator) if coordinator else None
     except sqlite3.Error as e:
         logger.error(f"Error getting coordinator: {e}")
         return None
-    finally:
-        conn.close()
 
 def get_verifier_by_id(verifier_id):
     """Obtener un verificador por ID"""
     try:
-        conn = get_db_connection()
-        verifier = conn.execute('SELECT * FROM verifiers WHERE id = ?', (verifier_id,)).fetchone()
-        return dict(verifier) if verifier else None
+        with db_connection() as conn:
+            verifier = conn.execute('SELECT * FROM verifiers WHERE id = ?', (verifier_id,)).fetchone()
+            return dict(verifier) if verifier else None
     except sqlite3.Error as e:
         logger.error(f"Error getting verifier: {e}")
         return None
-    finally:
-        conn.close()
 
 def get_warehouse_by_id(warehouse_id):
     """Obtener una bodega por ID"""
     try:
-        conn = get_db_connection()
-        warehouse = conn.execute('SELECT * FROM warehouses WHERE id = ?', (warehouse_id,)).fetchone()
-        return dict(warehouse) if warehouse else None
+        with db_connection() as conn:
+            warehouse = conn.execute('SELECT * FROM warehouses WHERE id = ?', (warehouse_id,)).fetchone()
+            return dict(warehouse) if warehouse else None
     except sqlite3.Error as e:
         logger.error(f"Error getting warehouse: {e}")
         return None
-    finally:
-        conn.close()
 
 def get_incident_by_id(incident_id):
     """Obtener un tipo de incidencia por ID"""
     try:
-        conn = get_db_connection()
-        incident = conn.execute('SELECT * FROM incidents WHERE id = ?', (incident_id,)).fetchone()
-        return dict(incident) if incident else None
+        with db_connection() as conn:
+            incident = conn.execute('SELECT * FROM incidents WHERE id = ?', (incident_id,)).fetchone()
+            return dict(incident) if incident else None
     except sqlite3.Error as e:
         logger.error(f"Error getting incident: {e}")
         return None
-    finally:
-        conn.close()
 
 def get_pending_incidents_by_coordinator(coordinator_id=None):
     """Obtiene incidencias pendientes filtradas por coordinador asignado"""
     try:
-        conn = get_db_connection()
-        
-        if coordinator_id:
-            query = '''
-            SELECT ir.id, ir.date, ir.status, ir.responsible,
-                   w.name as warehouse, w.zone as warehouse_zone,
-                   v.name || " " || v.surnames as causing_verifier,
-                   i.description as incident_type,
-                   ac.name || " " || ac.surnames as assigned_coordinator
-            FROM incident_records ir
-            JOIN warehouses w ON ir.warehouse_id = w.id
-            JOIN verifiers v ON ir.causing_verifier_id = v.id
-            JOIN incidents i ON ir.incident_id = i.id
-            JOIN coordinators ac ON ir.assigned_coordinator_id = ac.id
-            WHERE ir.status != 'Solucionado' AND ir.assigned_coordinator_id = ?
-            ORDER BY ir.date DESC
-            LIMIT 10
-            '''
-            records = conn.execute(query, (coordinator_id,)).fetchall()
-        else:
+        with db_connection() as conn:
+            
+            if coordinator_id:
+                query = '''
+                SELECT ir.id, ir.date, ir.status, ir.responsible,
+                       w.name as warehouse, w.zone as warehouse_zone,
+                       v.name || " " || v.surnames as causing_verifier,
+                       i.description as incident_type,
+                       ac.name || " " || ac.surnames as assigned_coordinator
+                FROM incident_records ir
+                JOIN warehouses w ON ir.warehouse_id = w.id
+                JOIN verifiers v ON ir.causing_verifier_id = v.id
+                JOIN incidents i ON ir.incident_id = i.id
+                JOIN coordinators ac ON ir.assigned_coordinator_id = ac.id
+                WHERE ir.status != 'Solucionado' AND ir.assigned_coordinator_id = ?
+                ORDER BY ir.date DESC
+                LIMIT 10
+                '''
+                records = conn.execute(query, (coordinator_id,)).fetchall()
+            else:
+                query = '''
+                SELECT ir.id, ir.date, ir.status, ir.responsible,
+                       w.name as warehouse, w.zone as warehouse_zone,
+                       v.name || " " || v.surnames as causing_verifier,
+                       i.description as incident_type,
+                       ac.name || " " || ac.surnames as assigned_coordinator
+                FROM incident_records ir
+                JOIN warehouses w ON ir.warehouse_id = w.id
+                JOIN verifiers v ON ir.causing_verifier_id = v.id
+                JOIN incidents i ON ir.incident_id = i.id
+                JOIN coordinators ac ON ir.assigned_coordinator_id = ac.id
+                WHERE ir.status != 'Solucionado'
+                ORDER BY ir.date DESC
+                LIMIT 10
+                '''
+                records = conn.execute(query).fetchall()
+            
+            import pandas as pd
+            return pd.DataFrame([dict(record) for record in records])
+    except sqlite3.Error as e:
+        logger.error(f"Error getting pending incidents by coordinator: {e}")
+        import pandas as pd
+        return pd.DataFrame()
+
+def get_filtered_pending_incidents(coordinator_id=None, status=None, days=None, selected_date=None):
+    """Obtiene incidencias pendientes con filtros múltiples"""
+    try:
+        with db_connection() as conn:
+            
+            # Construir la consulta base
             query = '''
             SELECT ir.id, ir.date, ir.status, ir.responsible,
                    w.name as warehouse, w.zone as warehouse_zone,
@@ -681,67 +837,105 @@ def get_pending_incidents_by_coordinator(coordinator_id=None):
             JOIN incidents i ON ir.incident_id = i.id
             JOIN coordinators ac ON ir.assigned_coordinator_id = ac.id
             WHERE ir.status != 'Solucionado'
-            ORDER BY ir.date DESC
-            LIMIT 10
             '''
-            records = conn.execute(query).fetchall()
-        
-        import pandas as pd
-        return pd.DataFrame([dict(record) for record in records])
+            
+            params = []
+            
+            # Agregar filtros según los parámetros
+            if coordinator_id:
+                query += " AND ir.assigned_coordinator_id = ?"
+                params.append(coordinator_id)
+            
+            if status:
+                query += " AND ir.status = ?"
+                params.append(status)
+            
+            if days:
+                query += " AND ir.date >= date('now', '-{} days')".format(days)
+            
+            
+            if selected_date:
+                query += " AND ir.date = ?"
+                params.append(selected_date.strftime('%Y-%m-%d'))
+            query += " ORDER BY ir.date DESC LIMIT 20"
+            
+            records = conn.execute(query, params).fetchall()
+            
+            import pandas as pd
+            return pd.DataFrame([dict(record) for record in records])
     except sqlite3.Error as e:
-        logger.error(f"Error getting pending incidents by coordinator: {e}")
+        logger.error(f"Error getting filtered pending incidents: {e}")
         import pandas as pd
         return pd.DataFrame()
-    finally:
-        conn.close()
 
-def get_filtered_pending_incidents(coordinator_id=None, status=None, days=None, selected_date=None):
-    """Obtiene incidencias pendientes con filtros múltiples"""
+SEARCH_RESULTS_QUERY = '''
+SELECT ir.id, ir.date, ir.status, ir.responsible, ir.explanation,
+       w.name as warehouse, w.zone as warehouse_zone,
+       v.name || " " || v.surnames as causing_verifier,
+       i.description as incident_type,
+       ac.name || " " || ac.surnames as assigned_coordinator
+FROM incident_records ir
+JOIN warehouses w ON ir.warehouse_id = w.id
+JOIN verifiers v ON ir.causing_verifier_id = v.id
+JOIN incidents i ON ir.incident_id = i.id
+JOIN coordinators ac ON ir.assigned_coordinator_id = ac.id
+'''
+
+def get_search_terms(query):
+    """Separa la consulta de búsqueda en palabras (sin operadores ni signos de puntuación)"""
+    return re.findall(r'\w+', query or '')
+
+def build_search_filters(filters):
+    """Traduce los filtros de search_incidents a condiciones SQL y sus parámetros"""
+    conditions = []
+    params = []
+    filters = filters or {}
+    if filters.get('status'):
+        conditions.append('ir.status = ?')
+        params.append(filters['status'])
+    if filters.get('coordinator_id'):
+        conditions.append('ir.assigned_coordinator_id = ?')
+        params.append(filters['coordinator_id'])
+    if filters.get('date_from'):
+        conditions.append('ir.date >= ?')
+        params.append(str(filters['date_from']))
+    if filters.get('date_to'):
+        conditions.append('ir.date <= ?')
+        params.append(str(filters['date_to']))
+    return conditions, params
+
+def search_incidents(query, filters=None, limit=50):
+    """Busca registros de incidencia por palabras de la explicación o de las descripciones de sus acciones
+    
+    Todas las palabras deben aparecer (también como prefijo). filters admite status, coordinator_id
+    (coordinador asignado), date_from y date_to. Los resultados se ordenan por relevancia.
+    """
+    terms = get_search_terms(query)
+    if not terms:
+        return pd.DataFrame()
+    conditions, params = build_search_filters(filters)
+    
     try:
-        conn = get_db_connection()
-        
-        # Construir la consulta base
-        query = '''
-        SELECT ir.id, ir.date, ir.status, ir.responsible,
-               w.name as warehouse, w.zone as warehouse_zone,
-               v.name || " " || v.surnames as causing_verifier,
-               i.description as incident_type,
-               ac.name || " " || ac.surnames as assigned_coordinator
-        FROM incident_records ir
-        JOIN warehouses w ON ir.warehouse_id = w.id
-        JOIN verifiers v ON ir.causing_verifier_id = v.id
-        JOIN incidents i ON ir.incident_id = i.id
-        JOIN coordinators ac ON ir.assigned_coordinator_id = ac.id
-        WHERE ir.status != 'Solucionado'
-        '''
-        
-        params = []
-        
-        # Agregar filtros según los parámetros
-        if coordinator_id:
-            query += " AND ir.assigned_coordinator_id = ?"
-            params.append(coordinator_id)
-        
-        if status:
-            query += " AND ir.status = ?"
-            params.append(status)
-        
-        if days:
-            query += " AND ir.date >= date('now', '-{} days')".format(days)
-        
-        
-        if selected_date:
-            query += " AND ir.date = ?"
-            params.append(selected_date.strftime('%Y-%m-%d'))
-        query += " ORDER BY ir.date DESC LIMIT 20"
-        
-        records = conn.execute(query, params).fetchall()
-        
-        import pandas as pd
-        return pd.DataFrame([dict(record) for record in records])
+        with db_connection() as conn:
+            try:
+                fts_query = ' '.join(f'"{term}"*' for term in terms)
+                sql = SEARCH_RESULTS_QUERY + ' JOIN incident_search s ON s.rowid = ir.id WHERE incident_search MATCH ?'
+                for condition in conditions:
+                    sql += f' AND {condition}'
+                sql += ' ORDER BY s.rank LIMIT ?'
+                return pd.read_sql_query(sql, conn, params=[fts_query] + params + [limit])
+            except (sqlite3.OperationalError, pd.errors.DatabaseError) as e:
+                # Sin FTS5 o sin índice (p. ej. tras restaurar una copia antigua): búsqueda con LIKE
+                logger.warning(f"Full-text search unavailable, using LIKE search: {str(e).splitlines()[-1]}")
+                like_conditions = []
+                like_params = []
+                for term in terms:
+                    like_conditions.append('''(ir.explanation LIKE ? OR EXISTS (
+                        SELECT 1 FROM incident_actions ia WHERE ia.incident_record_id = ir.id AND ia.action_description LIKE ?))''')
+                    like_params.extend([f'%{term}%', f'%{term}%'])
+                sql = SEARCH_RESULTS_QUERY + ' WHERE ' + ' AND '.join(like_conditions + conditions)
+                sql += ' ORDER BY ir.date DESC LIMIT ?'
+                return pd.read_sql_query(sql, conn, params=like_params + params + [limit])
     except sqlite3.Error as e:
-        logger.error(f"Error getting filtered pending incidents: {e}")
-        import pandas as pd
+        logger.error(f"Error searching incidents: {e}")
         return pd.DataFrame()
-    finally:
-        conn.close()
\ No newline at end of file
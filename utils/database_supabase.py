@@ -2,9 +2,16 @@ import pandas as pd
 import os
 import logging
 import datetime
+import re
 import streamlit as st
 from supabase_config import get_supabase_client, test_connection
 from .backup_restore import backup_db
+from .dimension_cache import get_dimension, peek_dimension
+from .cache_registry import depends_on, notify_write, ALL_TABLES
+from .export_engine import INCIDENT_EXPORT_COLUMNS, ACTION_EXPORT_COLUMNS, EMPTY_WATERMARK, new_export_buffer, export_result, write_export, build_export_manifest, safe_file_part
+from .migrations import SUPABASE_MIGRATIONS, apply_supabase_migrations
+from .backup_engine import ZIP_MIME, write_backup_archive, verify_backup_archive
+from .csv_import import CSV_IMPORT_TARGETS, make_key, split_new_rows, stream_csv_import
 try:
     from config import is_deployed_environment, DB_CONFIG
 except ImportError:
@@ -16,12 +23,23 @@ except ImportError:
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Vigencia de las lecturas con st.cache_data. Cada una declara con depends_on las tablas de
+# las que depende y se limpia al escribir en ellas desde este proceso; el TTL solo acota lo
+# que tardan en verse las escrituras hechas desde otro proceso
+DASHBOARD_CACHE_TTL = 1800  # 30 minutos
+ANALYTICS_CACHE_TTL = 3600  # 1 hora (análisis y tabla combinada de incidencias)
+
 @st.cache_resource
 def get_supabase_connection():
     """Obtiene el cliente de Supabase con cache de recursos para reutilización"""
     logger.info("Initializing Supabase connection (cached)")
     return get_supabase_client()
 
+def get_dimension_rows(table):
+    """Obtiene {id: fila} de una tabla de referencia desde la caché de dimensiones"""
+    client = get_supabase_connection()
+    return get_dimension(table, lambda: client.table(table).select('*').execute().data)
+
 def init_db():
     """Inicializa la base de datos Supabase"""
     # Verificar entorno y configuración
@@ -34,6 +52,11 @@ def init_db():
         # Verificar conexión con Supabase
         client = get_supabase_connection()
         
+        # Aplicar las migraciones pendientes (o avisar de los scripts que faltan por ejecutar)
+        applied = apply_supabase_migrations(client)
+        if applied:
+            logger.info(f"Applied Supabase migrations: {applied}")
+        
         # Verificar si las tablas existen y tienen datos
         existing_records = 0
         tables_exist = True
@@ -49,7 +72,7 @@ def init_db():
         
         if not tables_exist:
             logger.warning("⚠️ Las tablas no existen en Supabase.")
-            logger.info("Por favor, ejecuta el script supabase_schema.sql en el SQL Editor de Supabase")
+            logger.info(f"Por favor, ejecuta en orden en el SQL Editor de Supabase: {', '.join(m.apply for m in SUPABASE_MIGRATIONS)}")
             return False
         
         # Verificar datos después de la inicialización
@@ -80,6 +103,7 @@ def insert_coordinator(name, surnames):
             'name': name,
             'surnames': surnames
         }).execute()
+        notify_write('coordinators')
         logger.info(f"Inserted coordinator: {name} {surnames}")
         return True
     except Exception as e:
@@ -95,6 +119,7 @@ def insert_verifier(name, surnames, phone, zone):
             'phone': phone,
             'zone': zone
         }).execute()
+        notify_write('verifiers')
         logger.info(f"Inserted verifier: {name} {surnames}")
         return True
     except Exception as e:
@@ -109,50 +134,57 @@ def insert_warehouse(name, codigo_consejo, zone):
             'nif': codigo_consejo,  # Usar 'nif' en lugar de 'codigo_consejo'
             'zone': zone
         }).execute()
+        notify_write('warehouses')
         logger.info(f"Inserted warehouse: {name} with Código Consejo {codigo_consejo}")
         return True
     except Exception as e:
         logger.error(f"Error inserting warehouse: {e}")
         return False
 
-def load_csv_to_verifiers(csv_file, sep=','):
-    # Resetear el puntero del archivo al inicio
-    csv_file.seek(0)
-    df = pd.read_csv(csv_file, sep=sep, encoding='utf-8-sig')
-    # Limpiar nombres de columnas (eliminar espacios, BOM y caracteres especiales)
-    df.columns = df.columns.str.strip().str.lower().str.replace(' ', '_').str.replace('ï»¿', '')
-    client = get_supabase_connection()
+# Filas por petición en las inserciones masivas
+IMPORT_BATCH_SIZE = 500
+
+# Columnas con distinto nombre en Supabase (warehouses usa 'nif' en lugar de 'codigo_consejo')
+SUPABASE_COLUMN_NAMES = {'warehouses': {'codigo_consejo': 'nif'}}
+
+def get_existing_import_keys(table):
+    """Obtiene las claves de los registros ya existentes desde la caché de dimensiones (una consulta como máximo)"""
+    key_columns = CSV_IMPORT_TARGETS[table]['key']
+    renamed = SUPABASE_COLUMN_NAMES.get(table, {})
+    return {make_key(row.get(renamed.get(col, col)) for col in key_columns) for row in get_dimension_rows(table).values()}
+
+def import_csv_rows(table, df, existing_keys=None):
+    """Inserta con peticiones multi-fila las filas nuevas de un DataFrame del CSV y retorna el informe de insertadas/omitidas"""
+    if existing_keys is None:
+        existing_keys = get_existing_import_keys(table)
+    rows, report = split_new_rows(table, df, existing_keys)
+    
+    renamed = SUPABASE_COLUMN_NAMES.get(table, {})
+    rows = [{renamed.get(col, col): value for col, value in row.items()} for row in rows]
     
-    for _, row in df.iterrows():
-        name = row['name']
-        surnames = row['surnames']
-        
-        # Verificar si ya existe
-        existing = client.table('verifiers').select('id').eq('name', name).eq('surnames', surnames).execute()
-        
-        if not existing.data:
-            insert_verifier(name, surnames, row.get('phone', ''), row.get('zone', ''))
-        else:
-            print(f"Verifier {name} {surnames} already exists, skipping.")
-
-def load_csv_to_warehouses(csv_file, sep=','):
-    # Resetear el puntero del archivo al inicio
-    csv_file.seek(0)
-    df = pd.read_csv(csv_file, sep=sep, encoding='utf-8-sig')
-    # Limpiar nombres de columnas (eliminar espacios, BOM y caracteres especiales)
-    df.columns = df.columns.str.strip().str.lower().str.replace(' ', '_').str.replace('ï»¿', '')
     client = get_supabase_connection()
+    inserted = 0
+    try:
+        # Cada petición inserta su lote completo en una única transacción
+        for start in range(0, len(rows), IMPORT_BATCH_SIZE):
+            batch = rows[start:start + IMPORT_BATCH_SIZE]
+            client.table(table).insert(batch).execute()
+            inserted += len(batch)
+    finally:
+        if inserted:
+            notify_write(table)
     
-    for _, row in df.iterrows():
-        codigo_consejo = row['codigo_consejo']
-        
-        # Verificar si ya existe (usar 'nif' en lugar de 'codigo_consejo')
-        existing = client.table('warehouses').select('id').eq('nif', codigo_consejo).execute()
-        
-        if not existing.data:
-            insert_warehouse(row['name'], codigo_consejo, row.get('zone', ''))
-        else:
-            print(f"Warehouse with Código Consejo {codigo_consejo} already exists, skipping.")
+    report['inserted'] = inserted
+    logger.info(f"Imported {inserted} rows into {table} ({report['skipped']} skipped)")
+    return report
+
+def load_csv_to_verifiers(csv_file, sep=',', progress=None):
+    """Importa el CSV por lotes; progress(fracción, informe) recibe el avance tras cada lote"""
+    return stream_csv_import(csv_file, 'verifiers', import_csv_rows, get_existing_import_keys('verifiers'), sep=sep, progress=progress)
+
+def load_csv_to_warehouses(csv_file, sep=',', progress=None):
+    """Importa el CSV por lotes; progress(fracción, informe) recibe el avance tras cada lote"""
+    return stream_csv_import(csv_file, 'warehouses', import_csv_rows, get_existing_import_keys('warehouses'), sep=sep, progress=progress)
 
 def insert_incident(description, custom_code=None):
     """Inserta una nueva incidencia con código automático o personalizado"""
@@ -183,6 +215,7 @@ def insert_incident(description, custom_code=None):
             'code': code,
             'description': description
         }).execute()
+        notify_write('incidents')
         
         logger.info(f"Inserted incident with code {code}")
         return {'success': True, 'code': code}
@@ -191,35 +224,33 @@ def insert_incident(description, custom_code=None):
         logger.error(f"Error inserting incident: {e}")
         return {'success': False, 'error': f'Error al guardar la incidencia: {str(e)}'}
 
-@st.cache_data(ttl=600)  # Cache por 10 minutos (datos estáticos)
 def get_coordinators():
     try:
-        client = get_supabase_connection()
-        result = client.table('coordinators').select('id, name, surnames').execute()
-        return result.data
+        coordinators = get_dimension_rows('coordinators')
+        return [{'id': coord['id'], 'name': coord['name'], 'surnames': coord['surnames']} for coord in coordinators.values()]
     except Exception as e:
         logger.error(f"Error getting coordinators: {e}")
         return []
 
 def get_verifiers():
     try:
-        client = get_supabase_connection()
-        result = client.table('verifiers').select('id, name, surnames, phone, zone').execute()
-        return result.data
+        verifiers = get_dimension_rows('verifiers')
+        return [{key: ver.get(key) for key in ('id', 'name', 'surnames', 'phone', 'zone')} for ver in verifiers.values()]
     except Exception as e:
         logger.error(f"Error getting verifiers: {e}")
         return []
 
 def get_warehouses():
     try:
-        client = get_supabase_connection()
-        result = client.table('warehouses').select('id, name, nif, zone').execute()
         # Mapear 'nif' a 'codigo_consejo' para mantener compatibilidad
         warehouses = []
-        for warehouse in result.data:
-            warehouse_copy = warehouse.copy()
-            warehouse_copy['codigo_consejo'] = warehouse_copy.pop('nif', '')
-            warehouses.append(warehouse_copy)
+        for warehouse in get_dimension_rows('warehouses').values():
+            warehouses.append({
+                'id': warehouse['id'],
+                'name': warehouse['name'],
+                'zone': warehouse.get('zone'),
+                'codigo_consejo': warehouse.get('nif', '')
+            })
         return warehouses
     except Exception as e:
         logger.error(f"Error getting warehouses: {e}")
@@ -227,9 +258,8 @@ def get_warehouses():
 
 def get_incidents():
     try:
-        client = get_supabase_connection()
-        result = client.table('incidents').select('id, code, description').execute()
-        return [(row['id'], f"{row['code']} - {row['description']}") for row in result.data]
+        incidents = get_dimension_rows('incidents')
+        return [(row['id'], f"{row['code']} - {row['description']}") for row in incidents.values()]
     except Exception as e:
         logger.error(f"Error getting incidents: {e}")
         return []
@@ -255,6 +285,7 @@ def insert_incident_record(date, registering_coordinator_id, warehouse_id, causi
         
         if result.data and len(result.data) > 0:
             record_id = result.data[0]['id']
+            notify_write('incident_records')
             logger.info(f"Inserted incident record with ID {record_id} on date {date_str}")
             return {'success': True, 'record_id': record_id}
         else:
@@ -264,41 +295,126 @@ def insert_incident_record(date, registering_coordinator_id, warehouse_id, causi
         logger.error(f"Error inserting incident record: {e}")
         return {'success': False, 'error': str(e)}
 
+INCIDENT_RECORDS_PAGE_SIZE = 50
+
+INCIDENT_RECORD_OPTION_COLUMNS = 'id, date, registering_coordinator_id, warehouse_id, causing_verifier_id, incident_id, assigned_coordinator_id'
+
+# Campos de las tablas de referencia en los que busca get_incident_records_page:
+# tabla: (función que construye el texto buscable, columnas de incident_records que la referencian)
+RECORD_SEARCH_FIELDS = {
+    'warehouses': (lambda row: row.get('name') or '', ('warehouse_id',)),
+    'verifiers': (lambda row: f"{row.get('name', '')} {row.get('surnames', '')}", ('causing_verifier_id',)),
+    'incidents': (lambda row: f"{row.get('code', '')} - {row.get('description', '')}", ('incident_id',)),
+    'coordinators': (lambda row: f"{row.get('name', '')} {row.get('surnames', '')}", ('registering_coordinator_id', 'assigned_coordinator_id'))
+}
+
+# Máximo de ids de una tabla de referencia en un filtro in.() de la búsqueda. Un término muy
+# general (p. ej. una sola letra) coincide con casi todas las filas y la URL de la petición
+# superaría el límite del servidor; en ese caso esa tabla no se usa para buscar
+RECORD_SEARCH_MAX_IDS = 100
+
+def format_incident_record_option(record):
+    """Retorna la tupla (id, texto) con la que se muestra un registro en los selectores"""
+    coordinators = get_dimension_rows('coordinators')
+    reg_coord = coordinators.get(record['registering_coordinator_id'], {})
+    warehouse = get_dimension_rows('warehouses').get(record['warehouse_id'], {})
+    verifier = get_dimension_rows('verifiers').get(record['causing_verifier_id'], {})
+    incident = get_dimension_rows('incidents').get(record['incident_id'], {})
+    assigned_coord = coordinators.get(record['assigned_coordinator_id'], {})
+    
+    registering_coordinator = f"{reg_coord.get('name', '')} {reg_coord.get('surnames', '')}"
+    warehouse_name = warehouse.get('name', 'N/A')
+    causing_verifier = f"{verifier.get('name', '')} {verifier.get('surnames', '')}"
+    incident_desc = f"{incident.get('code', '')} - {incident.get('description', '')}"
+    assigned_coordinator = f"{assigned_coord.get('name', '')} {assigned_coord.get('surnames', '')}"
+    
+    display_text = f"ID: {record['id']} - Fecha: {record['date']} - Incidencia: {incident_desc} - Bodega: {warehouse_name} - Verificador: {causing_verifier} - Coordinador: {assigned_coordinator}"
+    return (record['id'], display_text)
+
 def get_incident_records():
     try:
         client = get_supabase_connection()
-        result = client.table('incident_records').select(
-            'id, date, registering_coordinator_id, warehouse_id, causing_verifier_id, incident_id, assigned_coordinator_id, explanation, enlace, status, responsible'
-        ).order('date', desc=True).execute()
-        
-        # Obtener datos relacionados por separado para evitar conflictos
-        coordinators = {coord['id']: coord for coord in client.table('coordinators').select('*').execute().data}
-        warehouses = {wh['id']: wh for wh in client.table('warehouses').select('*').execute().data}
-        verifiers = {ver['id']: ver for ver in client.table('verifiers').select('*').execute().data}
-        incidents = {inc['id']: inc for inc in client.table('incidents').select('*').execute().data}
-        
-        records = []
-        for record in result.data:
-            reg_coord = coordinators.get(record['registering_coordinator_id'], {})
-            warehouse = warehouses.get(record['warehouse_id'], {})
-            verifier = verifiers.get(record['causing_verifier_id'], {})
-            incident = incidents.get(record['incident_id'], {})
-            assigned_coord = coordinators.get(record['assigned_coordinator_id'], {})
-            
-            registering_coordinator = f"{reg_coord.get('name', '')} {reg_coord.get('surnames', '')}"
-            warehouse_name = warehouse.get('name', 'N/A')
-            causing_verifier = f"{verifier.get('name', '')} {verifier.get('surnames', '')}"
-            incident_desc = f"{incident.get('code', '')} - {incident.get('description', '')}"
-            assigned_coordinator = f"{assigned_coord.get('name', '')} {assigned_coord.get('surnames', '')}"
-            
-            display_text = f"ID: {record['id']} - Fecha: {record['date']} - Incidencia: {incident_desc} - Bodega: {warehouse_name} - Verificador: {causing_verifier} - Coordinador: {assigned_coordinator}"
-            records.append((record['id'], display_text))
+        result = client.table('incident_records').select(INCIDENT_RECORD_OPTION_COLUMNS).order('date', desc=True).execute()
         
-        return records
+        # Los datos relacionados se obtienen de la caché de dimensiones
+        return [format_incident_record_option(record) for record in result.data]
     except Exception as e:
         logger.error(f"Error getting incident records: {e}")
         return []
 
+def get_incident_record_option(incident_record_id):
+    """Retorna la tupla (id, texto) de un registro para los selectores, o None si no existe"""
+    try:
+        client = get_supabase_connection()
+        result = client.table('incident_records').select(INCIDENT_RECORD_OPTION_COLUMNS).eq('id', incident_record_id).execute()
+        return format_incident_record_option(result.data[0]) if result.data else None
+    except Exception as e:
+        logger.error(f"Error getting incident record option {incident_record_id}: {e}")
+        return None
+
+def build_record_search_filter(search):
+    """Construye el filtro or() de PostgREST para buscar un texto en un registro y sus tablas de referencia
+    
+    Los nombres de bodegas, verificadores, incidencias y coordinadores se buscan en la caché de
+    dimensiones y se traducen a filtros in.() sobre las claves foráneas de incident_records.
+    Las tablas con más de RECORD_SEARCH_MAX_IDS coincidencias se omiten y la búsqueda queda
+    en la explicación, el id y las demás tablas.
+    """
+    # Las comas, paréntesis y asteriscos son caracteres reservados en la sintaxis de filtros
+    term = re.sub(r'[,()*]', ' ', search).strip()
+    if not term:
+        return None
+    
+    conditions = [f'explanation.ilike.*{term}*']
+    if term.isdigit():
+        conditions.append(f'id.eq.{term}')
+    
+    lowered = term.lower()
+    for table, (searchable_text, fk_columns) in RECORD_SEARCH_FIELDS.items():
+        ids = [str(row_id) for row_id, row in get_dimension_rows(table).items() if lowered in searchable_text(row).lower()]
+        if len(ids) > RECORD_SEARCH_MAX_IDS:
+            logger.info(f"Record search '{term}' matches {len(ids)} {table}; not filtering by {table}")
+            continue
+        if ids:
+            for fk in fk_columns:
+                conditions.append(f"{fk}.in.({','.join(ids)})")
+    
+    return ','.join(conditions)
+
+def get_incident_records_page(search=None, cursor=None, page_size=INCIDENT_RECORDS_PAGE_SIZE):
+    """Obtiene una página de registros (id, texto) ordenados por fecha e id descendentes
+    
+    search filtra en el servidor por id, explicación, bodega, verificador, incidencia o coordinadores.
+    cursor es el (date, id) del último registro de la página anterior (paginación por clave).
+    Retorna {'records': [...], 'next_cursor': (date, id) o None si no hay más páginas}
+    """
+    try:
+        client = get_supabase_connection()
+        query = client.table('incident_records').select(INCIDENT_RECORD_OPTION_COLUMNS)
+        
+        conditions = []
+        if search and search.strip():
+            search_filter = build_record_search_filter(search)
+            if search_filter:
+                conditions.append(f'or({search_filter})')
+        
+        if cursor:
+            cursor_date, cursor_id = cursor
+            conditions.append(f'or(date.lt.{cursor_date},and(date.eq.{cursor_date},id.lt.{cursor_id}))')
+        
+        if conditions:
+            query = query.or_(f"and({','.join(conditions)})")
+        
+        # Se pide un registro extra para saber si existe una página siguiente
+        result = query.order('date', desc=True).order('id', desc=True).limit(page_size + 1).execute()
+        rows = result.data
+        
+        next_cursor = (rows[page_size - 1]['date'], rows[page_size - 1]['id']) if len(rows) > page_size else None
+        return {'records': [format_incident_record_option(row) for row in rows[:page_size]], 'next_cursor': next_cursor}
+    except Exception as e:
+        logger.error(f"Error getting incident records page: {e}")
+        return {'records': [], 'next_cursor': None}
+
 def insert_incident_action(incident_record_id, action_date, action_description, new_status, performed_by):
     try:
         client = get_supabase_connection()
@@ -341,23 +457,11 @@ def insert_incident_action(incident_record_id, action_date, action_description,
             if not update_result.data:
                 logger.warning(f"Update may have failed for incident record {incident_record_id}")
         
-        # Limpiar caches específicos que pueden estar afectados por esta actualización
-        try:
-            # Limpiar funciones con cache que muestran estadísticas y datos dinámicos
-            get_dashboard_stats.clear()
-            get_recent_actions.clear()
-            get_recent_incidents.clear()
-            get_all_incident_records_df.clear()
-            get_pending_incidents_summary.clear()
-            get_filtered_pending_incidents.clear()
-            get_pending_incidents_by_coordinator.clear()
-            
-            # Limpiar caches de análisis por estado
-            get_incidents_by_status.clear()
-            
-            logger.info(f"Cleared relevant caches after updating incident {incident_record_id}")
-        except Exception as cache_error:
-            logger.warning(f"Error clearing caches: {cache_error}")
+        # Limpiar solo las cachés que dependen de las tablas modificadas
+        if new_status:
+            notify_write('incident_actions', 'incident_records')
+        else:
+            notify_write('incident_actions')
         
         logger.info(f"Inserted action for incident record {incident_record_id}")
         return True
@@ -386,7 +490,8 @@ def get_incident_actions(incident_record_id):
         logger.error(f"Error getting incident actions: {e}")
         return []
 
-@st.cache_data(ttl=300)  # Cache por 5 minutos
+@depends_on('incident_records', 'coordinators', 'warehouses', 'verifiers', 'incidents')
+@st.cache_data(ttl=ANALYTICS_CACHE_TTL)
 def get_all_incident_records_df():
     try:
         client = get_supabase_connection()
@@ -394,11 +499,11 @@ def get_all_incident_records_df():
         # Obtener todos los registros de incidencias
         result = client.table('incident_records').select('*').execute()
         
-        # Obtener datos relacionados por separado para evitar conflictos
-        coordinators = {coord['id']: coord for coord in client.table('coordinators').select('*').execute().data}
-        warehouses = {wh['id']: wh for wh in client.table('warehouses').select('*').execute().data}
-        verifiers = {ver['id']: ver for ver in client.table('verifiers').select('*').execute().data}
-        incidents = {inc['id']: inc for inc in client.table('incidents').select('*').execute().data}
+        # Obtener datos relacionados desde la caché de dimensiones
+        coordinators = get_dimension_rows('coordinators')
+        warehouses = get_dimension_rows('warehouses')
+        verifiers = get_dimension_rows('verifiers')
+        incidents = get_dimension_rows('incidents')
         
         # Procesar los datos para crear el DataFrame
         processed_data = []
@@ -431,67 +536,67 @@ def get_all_incident_records_df():
         logger.error(f"Error getting incident records dataframe: {e}")
         return pd.DataFrame()
 
-@st.cache_data(ttl=600)  # Cache por 10 minutos (datos menos frecuentes)
 def get_all_verifiers_df():
     try:
-        client = get_supabase_connection()
-        result = client.table('verifiers').select('*').execute()
-        return pd.DataFrame(result.data)
+        return pd.DataFrame(list(get_dimension_rows('verifiers').values()))
     except Exception as e:
         logger.error(f"Error getting verifiers dataframe: {e}")
         return pd.DataFrame()
 
-@st.cache_data(ttl=600)  # Cache por 10 minutos (datos menos frecuentes)
 def get_all_warehouses_df():
     try:
-        client = get_supabase_connection()
-        result = client.table('warehouses').select('*').execute()
-        return pd.DataFrame(result.data)
+        return pd.DataFrame(list(get_dimension_rows('warehouses').values()))
     except Exception as e:
         logger.error(f"Error getting warehouses dataframe: {e}")
         return pd.DataFrame()
 
-@st.cache_data(ttl=240)  # Cache por 4 minutos
+def get_rpc_counts(function_name, label, fallback_filter=None):
+    """Obtiene conteos agrupados desde una función RPC de supabase_analytics.sql"""
+    try:
+        client = get_supabase_connection()
+        result = client.rpc(function_name).execute()
+        if not result.data:
+            return pd.DataFrame()
+        return pd.DataFrame(result.data)[[label, 'count']]
+    except Exception as e:
+        # Si las funciones aún no están creadas, agrupar en cliente como antes
+        logger.warning(f"RPC {function_name} not available, grouping client-side: {e}")
+        df = get_all_incident_records_df()
+        if df.empty:
+            return pd.DataFrame()
+        if fallback_filter:
+            df = df[df[fallback_filter[0]] == fallback_filter[1]]
+        return df.groupby(label).size().reset_index(name='count')
+
+@depends_on('incident_records', 'warehouses')
+@st.cache_data(ttl=ANALYTICS_CACHE_TTL)
 def get_incidents_by_zone():
-    df = get_all_incident_records_df()
-    if not df.empty:
-        return df.groupby('warehouse_zone').size().reset_index(name='count')
-    return pd.DataFrame()
+    return get_rpc_counts('incidents_by_zone', 'warehouse_zone')
 
-@st.cache_data(ttl=240)  # Cache por 4 minutos
+@depends_on('incident_records', 'verifiers')
+@st.cache_data(ttl=ANALYTICS_CACHE_TTL)
 def get_incidents_by_verifier():
-    df = get_all_incident_records_df()
-    if not df.empty:
-        return df.groupby('causing_verifier').size().reset_index(name='count')
-    return pd.DataFrame()
+    return get_rpc_counts('incidents_by_verifier', 'causing_verifier')
 
-@st.cache_data(ttl=240)  # Cache por 4 minutos
+@depends_on('incident_records', 'warehouses')
+@st.cache_data(ttl=ANALYTICS_CACHE_TTL)
 def get_incidents_by_warehouse():
-    df = get_all_incident_records_df()
-    if not df.empty:
-        return df.groupby('warehouse').size().reset_index(name='count')
-    return pd.DataFrame()
+    return get_rpc_counts('incidents_by_warehouse', 'warehouse')
 
-@st.cache_data(ttl=240)  # Cache por 4 minutos
+@depends_on('incident_records', 'incidents')
+@st.cache_data(ttl=ANALYTICS_CACHE_TTL)
 def get_incidents_by_type():
-    df = get_all_incident_records_df()
-    if not df.empty:
-        return df.groupby('incident_type').size().reset_index(name='count')
-    return pd.DataFrame()
+    return get_rpc_counts('incidents_by_type', 'incident_type')
 
-@st.cache_data(ttl=240)  # Cache por 4 minutos
+@depends_on('incident_records')
+@st.cache_data(ttl=ANALYTICS_CACHE_TTL)
 def get_incidents_by_status():
-    df = get_all_incident_records_df()
-    if not df.empty:
-        return df.groupby('status').size().reset_index(name='count')
-    return pd.DataFrame()
+    return get_rpc_counts('incidents_by_status', 'status')
 
-@st.cache_data(ttl=240)  # Cache por 4 minutos
+@depends_on('incident_records', 'verifiers')
+@st.cache_data(ttl=ANALYTICS_CACHE_TTL)
 def get_assignments_by_verifier():
-    df = get_all_incident_records_df()
-    if not df.empty:
-        return df[df['responsible'] == 'Verificador'].groupby('causing_verifier').size().reset_index(name='count')
-    return pd.DataFrame()
+    return get_rpc_counts('assignments_by_verifier', 'causing_verifier', ('responsible', 'Verificador'))
 
 def reset_database():
     try:
@@ -506,6 +611,7 @@ def reset_database():
             except Exception as e:
                 logger.warning(f"Could not clear table {table}: {e}")
         
+        notify_write(*ALL_TABLES)
         logger.info("Database reset completed")
         return True
     except Exception as e:
@@ -523,11 +629,11 @@ def get_incident_record_details(incident_record_id):
         if result.data:
             record = result.data[0]
             
-            # Obtener datos relacionados por separado
-            warehouse = client.table('warehouses').select('name, zone').eq('id', record['warehouse_id']).execute().data[0] if record['warehouse_id'] else {}
-            verifier = client.table('verifiers').select('name, surnames').eq('id', record['causing_verifier_id']).execute().data[0] if record['causing_verifier_id'] else {}
-            incident = client.table('incidents').select('code, description').eq('id', record['incident_id']).execute().data[0] if record['incident_id'] else {}
-            assigned_coord = client.table('coordinators').select('name, surnames').eq('id', record['assigned_coordinator_id']).execute().data[0] if record['assigned_coordinator_id'] else {}
+            # Obtener datos relacionados desde la caché de dimensiones
+            warehouse = get_dimension_rows('warehouses').get(record['warehouse_id'], {})
+            verifier = get_dimension_rows('verifiers').get(record['causing_verifier_id'], {})
+            incident = get_dimension_rows('incidents').get(record['incident_id'], {})
+            assigned_coord = get_dimension_rows('coordinators').get(record['assigned_coordinator_id'], {})
             
             return {
                 'id': record['id'],
@@ -548,173 +654,293 @@ def get_incident_record_details(incident_record_id):
         logger.error(f"Error getting incident record details: {e}")
         return None
 
-def export_incidents_to_excel():
-    """Exporta historial completo de incidencias con acciones a Excel"""
+# Filas por petición al recorrer tablas completas (exportaciones)
+EXPORT_PAGE_SIZE = 1000
+
+# Columnas de incident_records necesarias para exportar
+RECORD_EXPORT_COLUMNS = 'id, date, registering_coordinator_id, warehouse_id, causing_verifier_id, incident_id, assigned_coordinator_id, explanation, status, responsible'
+ACTION_EXPORT_COLUMNS_SELECT = 'id, incident_record_id, action_date, action_description, new_status, performed_by'
+
+def iter_table_rows(client, table, columns='*', page_size=EXPORT_PAGE_SIZE, after_id=None, until_id=None):
+    """Recorre una tabla por páginas de clave primaria (id > último id) sin cargarla entera
+    
+    after_id y until_id limitan opcionalmente el rango de ids (after_id < id <= until_id).
+    """
+    last_id = after_id
+    while True:
+        query = client.table(table).select(columns).order('id').limit(page_size)
+        if last_id is not None:
+            query = query.gt('id', last_id)
+        if until_id is not None:
+            query = query.lte('id', until_id)
+        rows = query.execute().data
+        # Se sigue hasta recibir una página vacía: una página corta puede deberse al límite
+        # de filas por respuesta de PostgREST y no al final de la tabla
+        if not rows:
+            break
+        yield from rows
+        last_id = rows[-1]['id']
+
+def format_export_date(value):
+    """Formatea una fecha como dd/mm/aaaa para la exportación"""
+    if not value:
+        return "N/A"
+    try:
+        return pd.to_datetime(value).strftime('%d/%m/%Y')
+    except (ValueError, TypeError):
+        return value
+
+def iter_incident_export_rows(client, records=None):
+    """Filas de la hoja de incidencias con las claves foráneas resueltas desde la caché de dimensiones
+    
+    records es un iterable de filas de incident_records (por defecto, la tabla completa).
+    """
+    coordinators = get_dimension_rows('coordinators')
+    warehouses = get_dimension_rows('warehouses')
+    verifiers = get_dimension_rows('verifiers')
+    incidents = get_dimension_rows('incidents')
+    
+    def full_name(row):
+        return f"{row.get('name', '')} {row.get('surnames', '')}" if row else "N/A"
+    
+    if records is None:
+        records = iter_table_rows(client, 'incident_records', RECORD_EXPORT_COLUMNS)
+    
+    for row in records:
+        warehouse = warehouses.get(row['warehouse_id'], {})
+        verifier = verifiers.get(row['causing_verifier_id'], {})
+        incident = incidents.get(row['incident_id'], {})
+        yield (
+            row['id'],
+            row['date'],
+            full_name(coordinators.get(row['registering_coordinator_id'])),
+            warehouse.get('name', 'N/A'),
+            warehouse.get('zone', 'N/A'),
+            full_name(verifier),
+            verifier.get('zone', 'N/A'),
+            f"{incident.get('code', '')} - {incident.get('description', '')}" if incident else "N/A",
+            full_name(coordinators.get(row['assigned_coordinator_id'])),
+            row['explanation'],
+            row['status'],
+            row['responsible']
+        )
+
+def iter_action_export_rows(client, actions=None):
+    """Filas de la hoja de acciones con el nombre del coordinador que realizó cada acción
+    
+    actions es un iterable de filas de incident_actions (por defecto, la tabla completa).
+    """
+    coordinators = get_dimension_rows('coordinators')
+    if actions is None:
+        actions = iter_table_rows(client, 'incident_actions', ACTION_EXPORT_COLUMNS_SELECT)
+    
+    for row in actions:
+        # Resolver nombre del coordinador
+        performed_by_name = "N/A"
+        if row['performed_by']:
+            try:
+                coord_id = int(row['performed_by'])
+                coordinator = coordinators.get(coord_id)
+                performed_by_name = f"{coordinator['name']} {coordinator['surnames']}" if coordinator else f"ID: {coord_id}"
+            except (ValueError, TypeError):
+                performed_by_name = str(row['performed_by'])
+        
+        yield (
+            row['incident_record_id'],
+            format_export_date(row['action_date']),
+            row['action_description'],
+            row['new_status'],
+            performed_by_name
+        )
+
+def export_incidents(export_format='xlsx'):
+    """Exporta historial completo de incidencias con acciones en el formato indicado (ver EXPORT_FORMATS)
+    
+    Las filas se leen por páginas y cada fichero se genera en un buffer (ver new_export_buffer).
+    Retorna una lista de {'file_name', 'buffer', 'mime'}.
+    """
     try:
-        # Obtener datos usando las funciones existentes
-        df_incidents = get_all_incident_records_df()
-        
-        # Formatear fechas en el DataFrame de incidencias
-        if not df_incidents.empty and 'Fecha' in df_incidents.columns:
-            df_incidents['Fecha'] = pd.to_datetime(df_incidents['Fecha']).dt.strftime('%d/%m/%Y')
-        
-        # Para las acciones, necesitamos una consulta separada con nombres de coordinadores
         client = get_supabase_connection()
-        actions_result = client.table('incident_actions').select(
-            'incident_record_id, action_date, action_description, new_status, performed_by'
-        ).execute()
-        
-        # Obtener coordinadores para resolver los IDs
-        coordinators = {coord['id']: f"{coord['name']} {coord['surnames']}" 
-                       for coord in client.table('coordinators').select('*').execute().data}
-        
-        actions_data = []
-        for row in actions_result.data:
-            # Formatear fecha de acción
-            action_date = row['action_date']
-            if action_date:
-                try:
-                    formatted_date = pd.to_datetime(action_date).strftime('%d/%m/%Y')
-                except:
-                    formatted_date = action_date
-            else:
-                formatted_date = "N/A"
-            
-            # Resolver nombre del coordinador
-            performed_by_name = "N/A"
-            if row['performed_by']:
-                try:
-                    coord_id = int(row['performed_by'])
-                    performed_by_name = coordinators.get(coord_id, f"ID: {coord_id}")
-                except:
-                    performed_by_name = str(row['performed_by'])
-            
-            actions_data.append({
-                'ID Registro': row['incident_record_id'],
-                'Fecha Acción': formatted_date,
-                'Descripción Acción': row['action_description'],
-                'Nuevo Estado': row['new_status'],
-                'Realizado Por': performed_by_name
-            })
-        
-        df_actions = pd.DataFrame(actions_data)
-        
-        # Crear archivo Excel con formato mejorado
         timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f'historial_incidencias_{timestamp}.xlsx'
         
-        with pd.ExcelWriter(filename, engine='openpyxl') as writer:
-            df_incidents.to_excel(writer, sheet_name='Incidencias', index=False)
-            df_actions.to_excel(writer, sheet_name='Acciones', index=False)
-            
-            # Aplicar formato a las hojas
-            workbook = writer.book
-            
-            # Formatear hoja de Incidencias
-            if 'Incidencias' in writer.sheets:
-                worksheet_incidents = writer.sheets['Incidencias']
-                for column in worksheet_incidents.columns:
-                    max_length = 0
-                    column_letter = column[0].column_letter
-                    for cell in column:
-                        try:
-                            if len(str(cell.value)) > max_length:
-                                max_length = len(str(cell.value))
-                        except:
-                            pass
-                    adjusted_width = min(max_length + 2, 50)
-                    worksheet_incidents.column_dimensions[column_letter].width = adjusted_width
-            
-            # Formatear hoja de Acciones
-            if 'Acciones' in writer.sheets:
-                worksheet_actions = writer.sheets['Acciones']
-                for column in worksheet_actions.columns:
-                    max_length = 0
-                    column_letter = column[0].column_letter
-                    for cell in column:
-                        try:
-                            if len(str(cell.value)) > max_length:
-                                max_length = len(str(cell.value))
-                        except:
-                            pass
-                    adjusted_width = min(max_length + 2, 50)
-                    worksheet_actions.column_dimensions[column_letter].width = adjusted_width
-        
-        return filename
+        return write_export([
+            ('Incidencias', INCIDENT_EXPORT_COLUMNS, iter_incident_export_rows(client)),
+            ('Acciones', ACTION_EXPORT_COLUMNS, iter_action_export_rows(client))
+        ], export_format, f'historial_incidencias_{timestamp}')
+    except Exception as e:
+        logger.error(f"Error exporting incidents ({export_format}): {e}")
+        raise e
+
+def export_incidents_to_excel():
+    """Exporta historial completo de incidencias con acciones a Excel
+    
+    Retorna {'file_name', 'buffer', 'mime'}.
+    """
+    return export_incidents('xlsx')[0]
+
+def get_export_watermark(target):
+    """Marca de agua de la última exportación incremental del destino (EMPTY_WATERMARK si no hay ninguna)"""
+    client = get_supabase_connection()
+    result = client.table('export_watermarks').select('incident_record_id, incident_action_id, change_id').eq('target', target).execute()
+    return dict(result.data[0]) if result.data else dict(EMPTY_WATERMARK)
+
+def get_max_id(client, table):
+    """Último id de la tabla (0 si está vacía)"""
+    result = client.table(table).select('id').order('id', desc=True).limit(1).execute()
+    return result.data[0]['id'] if result.data else 0
+
+def get_current_watermark(client):
+    """Marca de agua con los últimos ids actuales; fija el límite superior de la exportación"""
+    return {
+        'incident_record_id': get_max_id(client, 'incident_records'),
+        'incident_action_id': get_max_id(client, 'incident_actions'),
+        'change_id': get_max_id(client, 'incident_record_changes')
+    }
+
+def iter_changed_records(client, previous, watermark):
+    """Registros nuevos (por id) y registros anteriores modificados entre las dos marcas de agua"""
+    yield from iter_table_rows(client, 'incident_records', RECORD_EXPORT_COLUMNS,
+                               after_id=previous['incident_record_id'], until_id=watermark['incident_record_id'])
+    
+    changed_ids = sorted({
+        row['incident_record_id']
+        for row in iter_table_rows(client, 'incident_record_changes', 'id, incident_record_id',
+                                   after_id=previous['change_id'], until_id=watermark['change_id'])
+        if row['incident_record_id'] <= previous['incident_record_id']
+    })
+    for start in range(0, len(changed_ids), EXPORT_PAGE_SIZE):
+        batch = changed_ids[start:start + EXPORT_PAGE_SIZE]
+        yield from client.table('incident_records').select(RECORD_EXPORT_COLUMNS).in_('id', batch).order('id').execute().data
+
+def save_export_watermark(target, watermark):
+    """Guarda la marca de agua del destino y descarta los cambios ya exportados por todos los destinos
+
+    Se llama al confirmar la entrega de una exportación incremental. La marca de agua nunca
+    retrocede: confirmar una exportación anterior a la última confirmada no la modifica.
+    """
+    client = get_supabase_connection()
+    current = get_export_watermark(target)
+    watermark = {key: max(watermark[key], current[key]) for key in EMPTY_WATERMARK}
+    client.table('export_watermarks').upsert(
+        dict(watermark, target=target, exported_at=datetime.datetime.now().isoformat(timespec='seconds'))
+    ).execute()
+    
+    result = client.table('export_watermarks').select('change_id').order('change_id').limit(1).execute()
+    if result.data:
+        client.table('incident_record_changes').delete().lte('id', result.data[0]['change_id']).execute()
+
+def export_incidents_incremental(target, export_format='xlsx'):
+    """Exporta solo los registros y acciones nuevos o modificados desde la última exportación del destino
+    
+    La primera exportación de un destino incluye todo el historial. Además de los ficheros de
+    datos se genera un manifiesto JSON con las marcas de agua y los checksums. La marca de agua
+    del destino no se modifica: una vez entregados los ficheros se guarda con
+    save_export_watermark(target, manifest['watermark']); hasta entonces, repetir la exportación
+    vuelve a incluir los mismos registros.
+    Retorna una lista de {'file_name', 'buffer', 'mime'} (el manifiesto en último lugar).
+    """
+    try:
+        client = get_supabase_connection()
+        timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+        base_name = f'historial_incidencias_{safe_file_part(target)}_{timestamp}'
+        previous = get_export_watermark(target)
+        watermark = get_current_watermark(client)
+        
+        actions = iter_table_rows(client, 'incident_actions', ACTION_EXPORT_COLUMNS_SELECT,
+                                  after_id=previous['incident_action_id'], until_id=watermark['incident_action_id'])
+        exports = write_export([
+            ('Incidencias', INCIDENT_EXPORT_COLUMNS, iter_incident_export_rows(client, iter_changed_records(client, previous, watermark))),
+            ('Acciones', ACTION_EXPORT_COLUMNS, iter_action_export_rows(client, actions))
+        ], export_format, base_name)
+        
+        manifest = build_export_manifest(target, export_format, previous, watermark, exports, base_name)
+        logger.info(f"Incremental export for {target}: {[export.get('rows') for export in exports]}")
+        return exports + [manifest]
     except Exception as e:
-        logger.error(f"Error exporting to Excel: {e}")
+        logger.error(f"Error in incremental export for {target}: {e}")
         raise e
 
-def create_backup():
-    """Crea una copia de seguridad de la base de datos"""
+# Tablas incluidas en la copia de seguridad, en orden de dependencias
+BACKUP_TABLES = ['coordinators', 'verifiers', 'warehouses', 'incidents', 'incident_records', 'incident_actions']
+
+def create_backup(compress=False):
+    """Crea una copia de seguridad completa de la base de datos en un buffer listo para descargar
+    
+    Cada tabla se recorre por páginas de clave primaria y se escribe en streaming como JSON Lines
+    comprimido dentro de un archivo ZIP con manifiesto (ver backup_engine). Las tablas siempre se
+    comprimen; compress se acepta por compatibilidad con el backend SQLite. Antes de devolverlo, el
+    archivo se comprueba contra su manifiesto (filas y checksums de cada tabla).
+    Es una copia de solo exportación: el formulario de restauración solo admite copias SQLite.
+    Retorna {'file_name', 'buffer', 'mime'}.
+    """
     try:
-        # Para Supabase, podríamos exportar los datos a JSON o CSV
         timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-        backup_filename = f'supabase_backup_{timestamp}.json'
-        
-        # Exportar todas las tablas
+        backup_filename = f'supabase_backup_{timestamp}.zip'
         client = get_supabase_connection()
-        backup_data = {}
-        
-        tables = ['coordinators', 'verifiers', 'warehouses', 'incidents', 'incident_records', 'incident_actions']
-        
-        for table in tables:
-            try:
-                result = client.table(table).select('*').execute()
-                backup_data[table] = result.data
-            except Exception as e:
-                logger.warning(f"Could not backup table {table}: {e}")
-                backup_data[table] = []
         
-        # Guardar en archivo JSON
-        import json
-        with open(backup_filename, 'w', encoding='utf-8') as f:
-            json.dump(backup_data, f, indent=2, ensure_ascii=False, default=str)
+        buffer = new_export_buffer()
+        manifest = write_backup_archive(BACKUP_TABLES, lambda table: iter_table_rows(client, table), buffer, 'supabase')
+        buffer.seek(0)
+        verify_backup_archive(buffer)
         
-        logger.info(f"Backup created: {backup_filename}")
-        return backup_filename
+        logger.info(f"Backup created: {backup_filename} ({ {table: info['rows'] for table, info in manifest['tables'].items()} })")
+        return export_result(buffer, backup_filename, ZIP_MIME)
     except Exception as e:
         logger.error(f"Error creating backup: {e}")
         raise e
 
-@st.cache_data(ttl=180)  # Cache por 3 minutos
+def get_dashboard_stats_by_counts(client):
+    """Obtiene las estadísticas del dashboard con consultas de conteo separadas (sin RPC)"""
+    # Estadísticas generales
+    stats = {}
+    
+    # Total de incidencias
+    total_result = client.table('incident_records').select('count', count='exact').execute()
+    stats['total_incidents'] = total_result.count if total_result.count else 0
+    
+    # Incidencias no resueltas (pendientes)
+    pending_result = client.table('incident_records').select('count', count='exact').neq('status', 'Solucionado').execute()
+    stats['pending_incidents'] = pending_result.count if pending_result.count else 0
+    
+    # Incidencias resueltas
+    resolved_result = client.table('incident_records').select('count', count='exact').eq('status', 'Solucionado').execute()
+    stats['resolved_incidents'] = resolved_result.count if resolved_result.count else 0
+    
+    # Incidencias por estado (agrupadas en el servidor mediante RPC)
+    stats['by_status'] = get_rpc_counts('incidents_by_status', 'status')
+    
+    # Incidencias recientes (últimos 7 días)
+    from datetime import datetime, timedelta
+    seven_days_ago = (datetime.now() - timedelta(days=7)).isoformat()
+    recent_result = client.table('incident_records').select('count', count='exact').gte('date', seven_days_ago).execute()
+    stats['recent_incidents'] = recent_result.count if recent_result.count else 0
+    
+    return stats
+
+@depends_on('incident_records')
+@st.cache_data(ttl=DASHBOARD_CACHE_TTL)
 def get_dashboard_stats():
-    """Obtiene estadísticas para el dashboard"""
+    """Obtiene estadísticas para el dashboard con una única llamada RPC agregada"""
     try:
         client = get_supabase_connection()
         
-        # Estadísticas generales
-        stats = {}
-        
-        # Total de incidencias
-        total_result = client.table('incident_records').select('count', count='exact').execute()
-        stats['total_incidents'] = total_result.count if total_result.count else 0
-        
-        # Incidencias no resueltas (pendientes)
-        pending_result = client.table('incident_records').select('count', count='exact').neq('status', 'Solucionado').execute()
-        stats['pending_incidents'] = pending_result.count if pending_result.count else 0
-        
-        # Incidencias resueltas
-        resolved_result = client.table('incident_records').select('count', count='exact').eq('status', 'Solucionado').execute()
-        stats['resolved_incidents'] = resolved_result.count if resolved_result.count else 0
-        
-        # Incidencias por estado (optimizado - sin cargar dataset completo)
         try:
-            status_result = client.table('incident_records').select('status').execute()
-            if status_result.data:
-                status_df = pd.DataFrame(status_result.data)
-                stats['by_status'] = status_df.groupby('status').size().reset_index(name='count')
-            else:
-                stats['by_status'] = pd.DataFrame()
+            # Conteo por estado junto con las incidencias de los últimos 7 días (supabase_analytics.sql)
+            rows = client.rpc('dashboard_stats').execute().data or []
         except Exception as e:
-            logger.warning(f"Error getting status stats: {e}")
-            stats['by_status'] = pd.DataFrame()
+            logger.warning(f"RPC dashboard_stats not available, using separate count queries: {e}")
+            return get_dashboard_stats_by_counts(client)
         
-        # Incidencias recientes (últimos 7 días)
-        from datetime import datetime, timedelta
-        seven_days_ago = (datetime.now() - timedelta(days=7)).isoformat()
-        recent_result = client.table('incident_records').select('count', count='exact').gte('date', seven_days_ago).execute()
-        stats['recent_incidents'] = recent_result.count if recent_result.count else 0
+        by_status = pd.DataFrame(rows, columns=['status', 'count', 'recent'])
+        resolved = by_status['status'] == 'Solucionado'
+        
+        # Estadísticas generales derivadas del conteo por estado
+        stats = {}
+        stats['total_incidents'] = int(by_status['count'].sum())
+        stats['pending_incidents'] = int(by_status.loc[~resolved & by_status['status'].notna(), 'count'].sum())
+        stats['resolved_incidents'] = int(by_status.loc[resolved, 'count'].sum())
+        stats['by_status'] = by_status[['status', 'count']] if not by_status.empty else pd.DataFrame()
+        stats['recent_incidents'] = int(by_status['recent'].sum())
         
         return stats
     except Exception as e:
@@ -727,74 +953,27 @@ def get_dashboard_stats():
             'recent_incidents': 0
         }
 
-@st.cache_data(ttl=120)  # Cache por 2 minutos
+@depends_on('incident_records', 'coordinators', 'warehouses', 'verifiers', 'incidents')
+@st.cache_data(ttl=DASHBOARD_CACHE_TTL)
 def get_pending_incidents_summary():
     """Obtiene resumen de incidencias pendientes para el dashboard con consultas optimizadas"""
     try:
         client = get_supabase_connection()
         
-        # Usar cache para datos de referencia que no cambian frecuentemente
-        warehouses_df = get_all_warehouses_df()
-        verifiers_df = get_all_verifiers_df()
-        coordinators_df = get_coordinators()
-        
-        # Obtener incidentes (crear función cacheada si no existe)
-        incidents_data = client.table('incidents').select('id, description').execute().data
-        incidents_df = pd.DataFrame(incidents_data)
-        
         result = client.table('incident_records').select(
             'id, date, status, responsible, warehouse_id, causing_verifier_id, incident_id, assigned_coordinator_id'
         ).neq('status', 'Solucionado').order('date', desc=True).limit(10).execute()
         
-        processed_data = []
-        for row in result.data:
-            # Usar DataFrames cacheados para obtener datos relacionados
-            warehouse_name = "N/A"
-            warehouse_zone = "N/A"
-            if row.get('warehouse_id'):
-                warehouse_row = warehouses_df[warehouses_df['id'] == row['warehouse_id']]
-                if not warehouse_row.empty:
-                    warehouse_name = warehouse_row.iloc[0]['name']
-                    warehouse_zone = warehouse_row.iloc[0]['zone']
-            
-            verifier_name = "N/A"
-            if row.get('causing_verifier_id'):
-                verifier_row = verifiers_df[verifiers_df['id'] == row['causing_verifier_id']]
-                if not verifier_row.empty:
-                    verifier_data = verifier_row.iloc[0]
-                    verifier_name = f"{verifier_data['name']} {verifier_data['surnames']}"
-            
-            incident_description = "N/A"
-            if row.get('incident_id') and not incidents_df.empty:
-                incident_row = incidents_df[incidents_df['id'] == row['incident_id']]
-                if not incident_row.empty:
-                    incident_description = incident_row.iloc[0]['description']
-            
-            coordinator_name = "N/A"
-            if row.get('assigned_coordinator_id'):
-                coordinator_row = coordinators_df[coordinators_df['id'] == row['assigned_coordinator_id']]
-                if not coordinator_row.empty:
-                    coord_data = coordinator_row.iloc[0]
-                    coordinator_name = f"{coord_data['name']} {coord_data['surnames']}"
-            
-            processed_data.append({
-                'id': row['id'],
-                'date': row['date'],
-                'warehouse': warehouse_name,
-                'warehouse_zone': warehouse_zone,
-                'causing_verifier': verifier_name,
-                'incident_type': incident_description,
-                'assigned_coordinator': coordinator_name,
-                'status': row['status'],
-                'responsible': row['responsible']
-            })
+        lookups = resolve_record_lookups(client, result.data)
+        processed_data = [build_pending_incident_row(row, lookups) for row in result.data]
         
         return pd.DataFrame(processed_data)
     except Exception as e:
         logger.error(f"Error getting pending incidents summary: {e}")
         return pd.DataFrame()
 
-@st.cache_data(ttl=120)  # Cache por 2 minutos
+@depends_on('incident_actions', 'incident_records', 'warehouses', 'coordinators')
+@st.cache_data(ttl=DASHBOARD_CACHE_TTL)
 def get_recent_actions(limit=5):
     """Obtiene las acciones más recientes para el dashboard con información optimizada usando JOINs"""
     try:
@@ -822,11 +1001,9 @@ def get_recent_actions(limit=5):
             if row.get('performed_by'):
                 try:
                     coordinator_id = int(row['performed_by'])
-                    # Usar cache para coordinadores (ya está implementado en get_coordinators)
-                    coordinators_df = get_coordinators()
-                    coordinator_row = coordinators_df[coordinators_df['id'] == coordinator_id]
-                    if not coordinator_row.empty:
-                        coord_data = coordinator_row.iloc[0]
+                    # Usar la caché de dimensiones para coordinadores
+                    coord_data = get_dimension_rows('coordinators').get(coordinator_id)
+                    if coord_data:
                         coordinator_name = f"{coord_data.get('name', '')} {coord_data.get('surnames', '')}".strip()
                     else:
                         coordinator_name = row['performed_by']
@@ -867,7 +1044,8 @@ def get_recent_actions(limit=5):
             logger.error(f"Error getting recent actions (fallback): {fallback_e}")
             return pd.DataFrame()
 
-@st.cache_data(ttl=120)  # Cache por 2 minutos
+@depends_on('incident_records', 'warehouses', 'incidents', 'coordinators')
+@st.cache_data(ttl=DASHBOARD_CACHE_TTL)
 def get_recent_incidents():
     """Obtiene las 5 incidencias más recientes registradas para el dashboard"""
     try:
@@ -970,6 +1148,7 @@ def update_coordinator(coordinator_id, name, surnames):
         }).eq('id', coordinator_id).execute()
         
         if result.data:
+            notify_write('coordinators')
             logger.info(f"Updated coordinator ID {coordinator_id}: {name} {surnames}")
             return True
         return False
@@ -989,6 +1168,7 @@ def update_verifier(verifier_id, name, surnames, phone, zone):
         }).eq('id', verifier_id).execute()
         
         if result.data:
+            notify_write('verifiers')
             logger.info(f"Updated verifier ID {verifier_id}: {name} {surnames}")
             return True
         return False
@@ -1002,11 +1182,12 @@ def update_warehouse(warehouse_id, name, codigo_consejo, zone):
         client = get_supabase_connection()
         result = client.table('warehouses').update({
             'name': name,
-            'codigo_consejo': codigo_consejo,
+            'nif': codigo_consejo,  # Usar 'nif' en lugar de 'codigo_consejo', como en insert_warehouse
             'zone': zone
         }).eq('id', warehouse_id).execute()
         
         if result.data:
+            notify_write('warehouses')
             logger.info(f"Updated warehouse ID {warehouse_id}: {name}")
             return True
         return False
@@ -1024,6 +1205,7 @@ def update_incident(incident_id, code, description):
         }).eq('id', incident_id).execute()
         
         if result.data:
+            notify_write('incidents')
             logger.info(f"Updated incident ID {incident_id}: {code}")
             return True
         return False
@@ -1052,6 +1234,7 @@ def update_incident_record(incident_record_id, date, warehouse_id, causing_verif
         }).eq('id', incident_record_id).execute()
         
         if result.data:
+            notify_write('incident_records')
             logger.info(f"Updated incident record ID {incident_record_id}")
             return True
         return False
@@ -1063,9 +1246,7 @@ def update_incident_record(incident_record_id, date, warehouse_id, causing_verif
 def get_coordinator_by_id(coordinator_id):
     """Obtener un coordinador por ID"""
     try:
-        client = get_supabase_connection()
-        result = client.table('coordinators').select('*').eq('id', coordinator_id).execute()
-        return result.data[0] if result.data else None
+        return get_dimension_rows('coordinators').get(coordinator_id)
     except Exception as e:
         logger.error(f"Error getting coordinator: {e}")
         return None
@@ -1073,9 +1254,7 @@ def get_coordinator_by_id(coordinator_id):
 def get_verifier_by_id(verifier_id):
     """Obtener un verificador por ID"""
     try:
-        client = get_supabase_connection()
-        result = client.table('verifiers').select('*').eq('id', verifier_id).execute()
-        return result.data[0] if result.data else None
+        return get_dimension_rows('verifiers').get(verifier_id)
     except Exception as e:
         logger.error(f"Error getting verifier: {e}")
         return None
@@ -1083,9 +1262,7 @@ def get_verifier_by_id(verifier_id):
 def get_warehouse_by_id(warehouse_id):
     """Obtener una bodega por ID"""
     try:
-        client = get_supabase_connection()
-        result = client.table('warehouses').select('*').eq('id', warehouse_id).execute()
-        return result.data[0] if result.data else None
+        return get_dimension_rows('warehouses').get(warehouse_id)
     except Exception as e:
         logger.error(f"Error getting warehouse: {e}")
         return None
@@ -1093,94 +1270,88 @@ def get_warehouse_by_id(warehouse_id):
 def get_incident_by_id(incident_id):
     """Obtener un tipo de incidencia por ID"""
     try:
-        client = get_supabase_connection()
-        result = client.table('incidents').select('*').eq('id', incident_id).execute()
-        return result.data[0] if result.data else None
+        return get_dimension_rows('incidents').get(incident_id)
     except Exception as e:
         logger.error(f"Error getting incident: {e}")
         return None
 
-@st.cache_data(ttl=180)  # Cache por 3 minutos
+@depends_on('incident_records', 'coordinators', 'warehouses', 'verifiers', 'incidents')
+@st.cache_data(ttl=DASHBOARD_CACHE_TTL)
 def get_pending_incidents_by_coordinator(coordinator_id=None):
     """Obtiene incidencias pendientes filtradas por coordinador asignado"""
     try:
         client = get_supabase_connection()
         
+        query = client.table('incident_records').select(
+            'id, date, status, responsible, warehouse_id, causing_verifier_id, incident_id, assigned_coordinator_id'
+        ).neq('status', 'Solucionado')
         if coordinator_id:
-            result = client.table('incident_records').select(
-                'id, date, status, responsible, '
-                'warehouses!incident_records_warehouse_id_fkey(name, zone), '
-                'verifiers!incident_records_causing_verifier_id_fkey(name, surnames), '
-                'incidents!incident_records_incident_id_fkey(description), '
-                'coordinators!incident_records_assigned_coordinator_id_fkey(name, surnames)'
-            ).neq('status', 'Solucionado').eq('assigned_coordinator_id', coordinator_id).order('date', desc=True).limit(10).execute()
-        else:
-            result = client.table('incident_records').select(
-                'id, date, status, responsible, '
-                'warehouses!incident_records_warehouse_id_fkey(name, zone), '
-                'verifiers!incident_records_causing_verifier_id_fkey(name, surnames), '
-                'incidents!incident_records_incident_id_fkey(description), '
-                'coordinators!incident_records_assigned_coordinator_id_fkey(name, surnames)'
-            ).neq('status', 'Solucionado').order('date', desc=True).limit(10).execute()
-        
-        # Usar cache para datos de referencia que no cambian frecuentemente
-        warehouses_df = get_all_warehouses_df()
-        verifiers_df = get_all_verifiers_df()
-        coordinators_df = get_coordinators()
-        
-        # Obtener incidentes usando cache
-        incidents_data = client.table('incidents').select('id, description').execute().data
-        incidents_df = pd.DataFrame(incidents_data)
+            query = query.eq('assigned_coordinator_id', coordinator_id)
+        result = query.order('date', desc=True).limit(10).execute()
         
-        processed_data = []
-        for row in result.data:
-            # Usar DataFrames cacheados para obtener datos relacionados
-            warehouse_name = "N/A"
-            warehouse_zone = "N/A"
-            if row.get('warehouse_id'):
-                warehouse_row = warehouses_df[warehouses_df['id'] == row['warehouse_id']]
-                if not warehouse_row.empty:
-                    warehouse_name = warehouse_row.iloc[0]['name']
-                    warehouse_zone = warehouse_row.iloc[0]['zone']
-            
-            verifier_name = "N/A"
-            if row.get('causing_verifier_id'):
-                verifier_row = verifiers_df[verifiers_df['id'] == row['causing_verifier_id']]
-                if not verifier_row.empty:
-                    verifier_data = verifier_row.iloc[0]
-                    verifier_name = f"{verifier_data['name']} {verifier_data['surnames']}"
-            
-            incident_description = "N/A"
-            if row.get('incident_id') and not incidents_df.empty:
-                incident_row = incidents_df[incidents_df['id'] == row['incident_id']]
-                if not incident_row.empty:
-                    incident_description = incident_row.iloc[0]['description']
-            
-            coordinator_name = "N/A"
-            if row.get('assigned_coordinator_id'):
-                coordinator_row = coordinators_df[coordinators_df['id'] == row['assigned_coordinator_id']]
-                if not coordinator_row.empty:
-                    coord_data = coordinator_row.iloc[0]
-                    coordinator_name = f"{coord_data['name']} {coord_data['surnames']}"
-            
-            processed_data.append({
-                'id': row['id'],
-                'date': row['date'],
-                'warehouse': warehouse_name,
-                'warehouse_zone': warehouse_zone,
-                'causing_verifier': verifier_name,
-                'incident_type': incident_description,
-                'assigned_coordinator': coordinator_name,
-                'status': row['status'],
-                'responsible': row['responsible']
-            })
+        lookups = resolve_record_lookups(client, result.data)
+        processed_data = [build_pending_incident_row(row, lookups) for row in result.data]
         
         return pd.DataFrame(processed_data)
     except Exception as e:
         logger.error(f"Error getting pending incidents by coordinator: {e}")
         return pd.DataFrame()
 
-@st.cache_data(ttl=120)  # Cache por 2 minutos para datos dinámicos
+# Resolución de claves foráneas por lotes
+RECORD_LOOKUPS = {
+    # nombre del lookup: (tabla, columnas, columnas de incident_records que la referencian)
+    'warehouses': ('warehouses', 'name, zone', ('warehouse_id',)),
+    'verifiers': ('verifiers', 'name, surnames', ('causing_verifier_id',)),
+    'incidents': ('incidents', 'code, description', ('incident_id',)),
+    'coordinators': ('coordinators', 'name, surnames', ('registering_coordinator_id', 'assigned_coordinator_id'))
+}
+
+def fetch_rows_by_ids(client, table, columns, ids):
+    """Obtiene con una sola consulta in_() las filas de una tabla para un conjunto de IDs"""
+    unique_ids = sorted({row_id for row_id in ids if row_id is not None})
+    if not unique_ids:
+        return {}
+    try:
+        result = client.table(table).select(f'id, {columns}').in_('id', unique_ids).execute()
+        return {row['id']: row for row in result.data}
+    except Exception as e:
+        logger.warning(f"Could not resolve {table} lookups: {e}")
+        return {}
+
+def resolve_record_lookups(client, records):
+    """Resuelve las claves foráneas de una página de incident_records con una consulta por dimensión"""
+    lookups = {}
+    for name, (table, columns, fk_columns) in RECORD_LOOKUPS.items():
+        # Si la dimensión ya está en caché no hace falta ninguna consulta
+        cached = peek_dimension(table)
+        if cached is not None:
+            lookups[name] = cached
+            continue
+        ids = [record.get(fk) for record in records for fk in fk_columns]
+        lookups[name] = fetch_rows_by_ids(client, table, columns, ids)
+    return lookups
+
+def build_pending_incident_row(row, lookups):
+    """Construye la fila del resumen de incidencias pendientes a partir de los lookups resueltos"""
+    warehouse = lookups['warehouses'].get(row.get('warehouse_id'), {})
+    verifier = lookups['verifiers'].get(row.get('causing_verifier_id'), {})
+    incident = lookups['incidents'].get(row.get('incident_id'), {})
+    coordinator = lookups['coordinators'].get(row.get('assigned_coordinator_id'), {})
+
+    return {
+        'id': row['id'],
+        'date': row['date'],
+        'warehouse': warehouse.get('name', 'N/A'),
+        'warehouse_zone': warehouse.get('zone', 'N/A'),
+        'causing_verifier': f"{verifier['name']} {verifier['surnames']}" if verifier else "N/A",
+        'incident_type': incident.get('description', 'N/A'),
+        'assigned_coordinator': f"{coordinator['name']} {coordinator['surnames']}" if coordinator else "N/A",
+        'status': row['status'],
+        'responsible': row['responsible']
+    }
+
+@depends_on('incident_records', 'coordinators', 'warehouses', 'verifiers', 'incidents')
+@st.cache_data(ttl=DASHBOARD_CACHE_TTL)
 def get_filtered_pending_incidents(coordinator_id=None, status=None, days=None, selected_date=None):
     """Obtiene incidencias pendientes con filtros múltiples"""
     try:
@@ -1217,60 +1388,62 @@ def get_filtered_pending_incidents(coordinator_id=None, status=None, days=None,
         limit = 5 if coordinator_id is None else 20
         result = query.order('date', desc=True).limit(limit).execute()
         
-        processed_data = []
-        for row in result.data:
-            # Obtener datos relacionados mediante consultas separadas para evitar joins problemáticos
-            warehouse_name = "N/A"
-            warehouse_zone = "N/A"
-            if row.get('warehouse_id'):
-                try:
-                    warehouse_result = client.table('warehouses').select('name, zone').eq('id', row['warehouse_id']).execute()
-                    if warehouse_result.data:
-                        warehouse_name = warehouse_result.data[0]['name']
-                        warehouse_zone = warehouse_result.data[0]['zone']
-                except:
-                    pass
-            
-            verifier_name = "N/A"
-            if row.get('causing_verifier_id'):
-                try:
-                    verifier_result = client.table('verifiers').select('name, surnames').eq('id', row['causing_verifier_id']).execute()
-                    if verifier_result.data:
-                        verifier_name = f"{verifier_result.data[0]['name']} {verifier_result.data[0]['surnames']}"
-                except:
-                    pass
-            
-            incident_description = "N/A"
-            if row.get('incident_id'):
-                try:
-                    incident_result = client.table('incidents').select('description').eq('id', row['incident_id']).execute()
-                    if incident_result.data:
-                        incident_description = incident_result.data[0]['description']
-                except:
-                    pass
-            
-            coordinator_name = "N/A"
-            if row.get('assigned_coordinator_id'):
-                try:
-                    coordinator_result = client.table('coordinators').select('name, surnames').eq('id', row['assigned_coordinator_id']).execute()
-                    if coordinator_result.data:
-                        coordinator_name = f"{coordinator_result.data[0]['name']} {coordinator_result.data[0]['surnames']}"
-                except:
-                    pass
-            
-            processed_data.append({
-                'id': row['id'],
-                'date': row['date'],
-                'warehouse': warehouse_name,
-                'warehouse_zone': warehouse_zone,
-                'causing_verifier': verifier_name,
-                'incident_type': incident_description,
-                'assigned_coordinator': coordinator_name,
-                'status': row['status'],
-                'responsible': row['responsible']
-            })
+        # Resolver las claves foráneas de toda la página con una consulta por tabla
+        lookups = resolve_record_lookups(client, result.data)
+        processed_data = [build_pending_incident_row(row, lookups) for row in result.data]
         
         return pd.DataFrame(processed_data)
     except Exception as e:
         logger.error(f"Error getting filtered pending incidents: {e}")
-        return pd.DataFrame()
\ No newline at end of file
+        return pd.DataFrame()
+
+def get_search_terms(query):
+    """Separa la consulta de búsqueda en palabras (sin operadores ni signos de puntuación)"""
+    return re.findall(r'\w+', query or '')
+
+def search_incidents(query, filters=None, limit=50):
+    """Busca registros de incidencia por palabras de la explicación o de las descripciones de sus acciones
+    
+    Usa la columna search_vector (supabase_search.sql). Todas las palabras deben aparecer (también
+    como prefijo). filters admite status, coordinator_id (coordinador asignado), date_from y date_to.
+    """
+    terms = get_search_terms(query)
+    if not terms:
+        return pd.DataFrame()
+    filters = filters or {}
+    
+    try:
+        client = get_supabase_connection()
+        
+        def build_query():
+            query_builder = client.table('incident_records').select(
+                'id, date, status, responsible, explanation, '
+                'warehouse_id, causing_verifier_id, incident_id, assigned_coordinator_id'
+            )
+            if filters.get('status'):
+                query_builder = query_builder.eq('status', filters['status'])
+            if filters.get('coordinator_id'):
+                query_builder = query_builder.eq('assigned_coordinator_id', filters['coordinator_id'])
+            if filters.get('date_from'):
+                query_builder = query_builder.gte('date', str(filters['date_from']))
+            if filters.get('date_to'):
+                query_builder = query_builder.lte('date', str(filters['date_to']))
+            return query_builder
+        
+        try:
+            tsquery = ' & '.join(f'{term.lower()}:*' for term in terms)
+            result = build_query().filter('search_vector', 'fts(simple)', tsquery).order('date', desc=True).limit(limit).execute()
+        except Exception as e:
+            # Sin supabase_search.sql aplicado: buscar solo en la explicación
+            logger.warning(f"Full-text search unavailable, using ilike on explanation: {e}")
+            query_builder = build_query()
+            for term in terms:
+                query_builder = query_builder.ilike('explanation', f'%{term}%')
+            result = query_builder.order('date', desc=True).limit(limit).execute()
+        
+        lookups = resolve_record_lookups(client, result.data)
+        processed_data = [dict(build_pending_incident_row(row, lookups), explanation=row.get('explanation')) for row in result.data]
+        return pd.DataFrame(processed_data)
+    except Exception as e:
+        logger.error(f"Error searching incidents: {e}")
+        return pd.DataFrame()
@@ -0,0 +1,186 @@
+"""Pool de conexiones SQLite reutilizables entre consultas y sesiones
+
+Abrir una conexión nueva en cada consulta obliga a SQLite a abrir el fichero y
+cargar el esquema cada vez. El pool mantiene conexiones abiertas ya configuradas
+(modo WAL y pragmas ajustados) y las presta a cada hilo de Streamlit:
+
+- Dentro de un mismo hilo las llamadas anidadas reutilizan la misma conexión.
+- Al liberarla, la conexión vuelve al pool y la puede tomar cualquier otro hilo.
+
+conn.close() devuelve la conexión al pool en lugar de cerrarla, de modo que el
+código existente que llama a get_db_connection()/conn.close() sigue funcionando.
+"""
+
+import logging
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Milisegundos que una conexión espera a que se libere el bloqueo antes de fallar
+BUSY_TIMEOUT_MS = 5000
+
+# Pragmas aplicados a cada conexión nueva
+CONNECTION_PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('busy_timeout', BUSY_TIMEOUT_MS),
+    ('cache_size', -8000),
+    ('temp_store', 'MEMORY'),
+    ('mmap_size', 67108864)
+)
+
+MAX_IDLE_CONNECTIONS = 5
+
+# Reintentos de escritura cuando otra conexión mantiene bloqueada la base de datos
+WRITE_RETRIES = 5
+WRITE_RETRY_DELAY = 0.05
+
+def is_locked_error(error):
+    """Indica si el error se debe a que la base de datos está bloqueada por otra escritura"""
+    message = str(error).lower()
+    return 'database is locked' in message or 'database is busy' in message
+
+class PooledConnection(sqlite3.Connection):
+    """Conexión cuyo close() la devuelve al pool del que procede"""
+
+    pool = None
+    generation = 0
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.release(self)
+        else:
+            super().close()
+
+    def close_for_real(self):
+        """Cierra la conexión definitivamente"""
+        self.pool = None
+        super().close()
+
+class ConnectionPool:
+    """Pool de conexiones a un fichero SQLite con reutilización por hilo"""
+
+    def __init__(self, path, max_idle=MAX_IDLE_CONNECTIONS):
+        self.path = path
+        self.max_idle = max_idle
+        self._lock = threading.Lock()
+        self._idle = []
+        self._local = threading.local()
+        self._generation = 0
+        self.opened = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, factory=PooledConnection, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for pragma, value in CONNECTION_PRAGMAS:
+            conn.execute(f'PRAGMA {pragma} = {value}')
+        conn.pool = self
+        conn.generation = self._generation
+        self.opened += 1
+        logger.info(f"Opened pooled SQLite connection to {self.path} ({self.opened} total)")
+        return conn
+
+    def acquire(self):
+        """Presta una conexión al hilo actual (la misma si ya tiene una prestada)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            self._local.depth += 1
+            return conn
+
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            conn = self._connect()
+
+        self._local.conn = conn
+        self._local.depth = 1
+        return conn
+
+    def release(self, conn):
+        """Devuelve la conexión al pool cuando el hilo termina de usarla"""
+        if getattr(self._local, 'conn', None) is not conn:
+            return
+        self._local.depth -= 1
+        if self._local.depth > 0:
+            return
+        self._local.conn = None
+
+        # No dejar transacciones a medias en una conexión que usará otra sesión
+        if conn.in_transaction:
+            conn.rollback()
+
+        with self._lock:
+            if conn.generation == self._generation and len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        conn.close_for_real()
+
+    @contextmanager
+    def connection(self):
+        """with pool.connection() as conn: ... presta y devuelve una conexión"""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def run_write(self, operation, retries=WRITE_RETRIES, delay=WRITE_RETRY_DELAY):
+        """Ejecuta operation(conn) en una transacción de escritura y retorna su resultado
+
+        La transacción se abre con BEGIN IMMEDIATE para reservar el bloqueo de escritura
+        desde el principio. Si la base de datos está bloqueada se reintenta con espera
+        exponencial (con variación aleatoria) hasta agotar los reintentos.
+        """
+        for attempt in range(1, retries + 1):
+            with self.connection() as conn:
+                # Escritura anidada dentro de una transacción ya abierta por el llamador
+                if conn.in_transaction:
+                    return operation(conn)
+                try:
+                    conn.execute('BEGIN IMMEDIATE')
+                    result = operation(conn)
+                    conn.commit()
+                    return result
+                except sqlite3.OperationalError as e:
+                    if conn.in_transaction:
+                        conn.rollback()
+                    if not is_locked_error(e) or attempt == retries:
+                        raise
+                except Exception:
+                    if conn.in_transaction:
+                        conn.rollback()
+                    raise
+
+            wait = delay * (2 ** (attempt - 1)) * (1 + random.random())
+            logger.warning(f"Database locked, retrying write in {wait:.2f}s (attempt {attempt}/{retries})")
+            time.sleep(wait)
+
+    def close_all(self):
+        """Cierra las conexiones inactivas; las prestadas se cierran al liberarse"""
+        with self._lock:
+            self._generation += 1
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close_for_real()
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(path):
+    """Retorna el pool de conexiones del fichero indicado, creándolo si no existe"""
+    with _pools_lock:
+        pool = _pools.get(path)
+        if pool is None:
+            pool = _pools[path] = ConnectionPool(path)
+        return pool
+
+def close_pool(path):
+    """Cierra las conexiones del pool de un fichero (p. ej. antes de sustituirlo en una restauración)"""
+    with _pools_lock:
+        pool = _pools.get(path)
+    if pool is not None:
+        pool.close_all()
@@ -0,0 +1,31 @@
+"""Datos por defecto de la aplicación (init_default_data.py)
+
+También los usan los benchmarks como base de las bases de datos sintéticas.
+"""
+
+DEFAULT_COORDINATORS = [
+    ("Admin", "Sistema"),
+    ("Coordinador", "Principal"),
+    ("Supervisor", "General")
+]
+
+DEFAULT_INCIDENTS = [
+    ("INC001", "Problema de calidad del producto"),
+    ("INC002", "Retraso en la entrega"),
+    ("INC003", "Documentación incorrecta"),
+    ("INC004", "Problema de temperatura"),
+    ("INC005", "Daño en el transporte"),
+    ("INC006", "Cantidad incorrecta"),
+    ("INC007", "Problema de etiquetado"),
+    ("INC008", "Incumplimiento de especificaciones")
+]
+
+DEFAULT_ZONES = ["PENEDÈS", "ALT CAMP", "CONCA DE BARBERÀ", "ALMENDRALEJO", "REQUENA", "CARIÑENA"]
+
+def default_verifiers(zones=DEFAULT_ZONES):
+    """Verificadores por defecto: uno por zona (nombre, apellidos, teléfono, zona)"""
+    return [(f"Verificador{i}", f"Zona{zone}", f"60000000{i}", zone) for i, zone in enumerate(zones, 1)]
+
+def default_warehouses(zones=DEFAULT_ZONES):
+    """Bodegas por defecto: una por zona (nombre, código consejo, zona)"""
+    return [(f"Bodega {zone}", f"B{12345678+i:08d}A", zone) for i, zone in enumerate(zones, 1)]
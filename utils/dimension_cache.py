@@ -0,0 +1,75 @@
+"""Caché en proceso de las tablas de referencia (coordinadores, bodegas, verificadores y tipos de incidencia)
+
+Cada tabla se guarda como una instantánea versionada {id: fila}. Las funciones de
+lectura la reutilizan mientras la versión no cambie y las funciones insert_*/update_*
+la invalidan a través del registro de cachés, de modo que cada tabla se descarga una
+vez por cambio y no una vez por consulta.
+
+Las escrituras hechas desde otro proceso (otra réplica de la aplicación o el editor SQL
+de Supabase) no pasan por el registro, así que cada instantánea caduca además a los
+DIMENSION_TTL_SECONDS, como las lecturas con st.cache_data a las que sustituye.
+"""
+
+import logging
+import threading
+import time
+from .cache_registry import register_invalidation
+
+logger = logging.getLogger(__name__)
+
+DIMENSION_TABLES = ('coordinators', 'warehouses', 'verifiers', 'incidents')
+
+# Vigencia máxima de una instantánea (10 minutos, como el antiguo st.cache_data(ttl=600))
+DIMENSION_TTL_SECONDS = 600
+
+_lock = threading.Lock()
+_versions = {table: 0 for table in DIMENSION_TABLES}
+_snapshots = {}
+
+def get_dimension_version(table):
+    """Retorna la versión actual de una tabla de referencia"""
+    with _lock:
+        return _versions[table]
+
+def _is_current(snapshot, version):
+    """Indica si la instantánea corresponde a la versión actual y no ha caducado"""
+    return (snapshot is not None and snapshot[0] == version
+            and time.monotonic() - snapshot[2] < DIMENSION_TTL_SECONDS)
+
+def peek_dimension(table):
+    """Retorna la instantánea vigente de la tabla sin cargarla, o None si no está en caché"""
+    with _lock:
+        snapshot = _snapshots.get(table)
+        if _is_current(snapshot, _versions[table]):
+            return snapshot[1]
+        return None
+
+def get_dimension(table, loader):
+    """Retorna {id: fila} de la tabla, llamando a loader() solo si la instantánea está desactualizada"""
+    with _lock:
+        version = _versions[table]
+        snapshot = _snapshots.get(table)
+        if _is_current(snapshot, version):
+            return snapshot[1]
+
+    # Cargar fuera del lock para no bloquear al resto de sesiones durante la consulta
+    loaded_at = time.monotonic()
+    rows_by_id = {row['id']: row for row in loader()}
+
+    with _lock:
+        # Solo guardar la instantánea si nadie la ha invalidado mientras se cargaba
+        if _versions[table] == version:
+            _snapshots[table] = (version, rows_by_id, loaded_at)
+    logger.info(f"Loaded dimension snapshot {table} v{version} ({len(rows_by_id)} rows)")
+    return rows_by_id
+
+def invalidate_dimensions(*tables):
+    """Invalida las instantáneas de las tablas indicadas (todas si no se indica ninguna)"""
+    with _lock:
+        for table in tables or DIMENSION_TABLES:
+            _versions[table] += 1
+            _snapshots.pop(table, None)
+
+# Cada instantánea se invalida cuando se anuncia una escritura sobre su tabla
+for _table in DIMENSION_TABLES:
+    register_invalidation(lambda table=_table: invalidate_dimensions(table), _table)
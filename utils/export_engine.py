@@ -0,0 +1,266 @@
+"""Motor de exportación del historial de incidencias
+
+Las filas se reciben como iteradores (cursor de SQLite o páginas de Supabase) y se
+escriben directamente en el formato elegido, de modo que nunca se materializa el
+historial completo en memoria:
+
+- Excel: un libro openpyxl en modo write_only con una hoja por conjunto de datos. El
+  ancho de las columnas se calcula con una muestra de las primeras filas, antes de
+  escribir, como exige el modo write_only.
+- CSV comprimido con gzip y Parquet: un fichero por conjunto de datos, escrito por lotes.
+
+Cuando una exportación produce varios ficheros se empaquetan en un único zip, de modo que
+se descargan con un solo botón.
+
+Las exportaciones incrementales añaden un manifiesto JSON con las marcas de agua
+(último id exportado de cada tabla y del registro de cambios) y el checksum de cada fichero.
+La marca de agua del destino no avanza al generar la exportación sino al confirmar su entrega.
+"""
+
+import csv
+import datetime
+import gzip
+import hashlib
+import io
+import itertools
+import json
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+import logging
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+from openpyxl.utils import get_column_letter
+
+logger = logging.getLogger(__name__)
+
+# Etiquetas de las columnas exportadas (iguales para ambos backends)
+INCIDENT_EXPORT_COLUMNS = [
+    'ID Registro', 'Fecha', 'Coordinador Registrador', 'Bodega', 'Zona Bodega',
+    'Verificador Causante', 'Zona Verificador', 'Incidencia', 'Coordinador Asignado',
+    'Explicación', 'Estado', 'Responsable'
+]
+ACTION_EXPORT_COLUMNS = ['ID Registro', 'Fecha Acción', 'Descripción Acción', 'Nuevo Estado', 'Realizado Por']
+
+# Marca de agua inicial: nada exportado todavía
+EMPTY_WATERMARK = {'incident_record_id': 0, 'incident_action_id': 0, 'change_id': 0}
+
+# Columnas enteras en Parquet (el resto se exporta como texto)
+PARQUET_INTEGER_COLUMNS = {'ID Registro'}
+
+EXCEL_MIME = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+GZIP_MIME = 'application/gzip'
+CSV_GZIP_MIME = GZIP_MIME
+PARQUET_MIME = 'application/vnd.apache.parquet'
+JSON_MIME = 'application/json'
+ZIP_MIME = 'application/zip'
+SQLITE_MIME = 'application/octet-stream'
+
+# Formatos de exportación disponibles: extensión y descripción para el selector
+EXPORT_FORMATS = {
+    'xlsx': 'Excel (.xlsx)',
+    'csv.gz': 'CSV comprimido (.csv.gz)',
+    'parquet': 'Parquet (.parquet)'
+}
+
+# Filas por lote al escribir Parquet
+PARQUET_BATCH_ROWS = 10000
+
+# Tamaño a partir del cual el buffer en memoria se vuelca a un fichero temporal
+EXPORT_SPOOL_MAX_SIZE = 32 * 1024 * 1024
+
+# Filas usadas para calcular el ancho de las columnas y ancho máximo permitido
+WIDTH_SAMPLE_ROWS = 500
+MAX_COLUMN_WIDTH = 50
+
+def new_export_buffer():
+    """Buffer en el que se escribe el fichero exportado
+
+    Se mantiene en memoria y solo se vuelca a un fichero temporal (fuera del directorio
+    de trabajo, eliminado al cerrarlo) si supera EXPORT_SPOOL_MAX_SIZE.
+    """
+    return tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_SIZE, mode='w+b')
+
+def safe_file_part(text):
+    """Texto apto para formar parte de un nombre de fichero"""
+    return re.sub(r'[^\w-]+', '_', text).strip('_') or 'export'
+
+def export_result(buffer, file_name, mime, rows=None):
+    """Resultado de una exportación o copia de seguridad: {'file_name', 'buffer', 'mime'[, 'rows']}"""
+    buffer.seek(0)
+    result = {'file_name': file_name, 'buffer': buffer, 'mime': mime}
+    if rows is not None:
+        result['rows'] = rows
+    return result
+
+def read_export(export):
+    """Contenido de la exportación para st.download_button; cierra y libera el buffer"""
+    buffer = export['buffer']
+    try:
+        buffer.seek(0)
+        return buffer.read()
+    finally:
+        buffer.close()
+
+def estimate_column_widths(columns, sample):
+    """Ancho de cada columna según la cabecera y una muestra de filas"""
+    widths = []
+    for index, column in enumerate(columns):
+        lengths = [len(str(row[index])) for row in sample if row[index] is not None]
+        widths.append(min(max([len(column)] + lengths) + 2, MAX_COLUMN_WIDTH))
+    return widths
+
+def write_excel_sheets(sheets, output):
+    """Escribe las hojas en output; sheets es una lista de (nombre, columnas, iterable de filas)
+
+    Retorna {nombre de hoja: filas escritas}.
+    """
+    workbook = Workbook(write_only=True)
+    row_counts = {}
+    for sheet_name, columns, rows in sheets:
+        worksheet = workbook.create_sheet(sheet_name)
+        rows = iter(rows)
+        sample = [tuple(row) for row in itertools.islice(rows, WIDTH_SAMPLE_ROWS)]
+
+        # En modo write_only las dimensiones deben fijarse antes de añadir filas
+        for index, width in enumerate(estimate_column_widths(columns, sample), start=1):
+            worksheet.column_dimensions[get_column_letter(index)].width = width
+
+        header = []
+        for column in columns:
+            cell = WriteOnlyCell(worksheet, value=column)
+            cell.font = Font(bold=True)
+            header.append(cell)
+        worksheet.append(header)
+
+        count = 0
+        for row in itertools.chain(sample, rows):
+            worksheet.append(tuple(row))
+            count += 1
+        row_counts[sheet_name] = count
+
+    workbook.save(output)
+    logger.info(f"Excel export written: {row_counts}")
+    return row_counts
+
+def write_csv_gzip(columns, rows, output):
+    """Escribe las filas como CSV comprimido con gzip en output; retorna las filas escritas"""
+    count = 0
+    with gzip.GzipFile(fileobj=output, mode='wb', compresslevel=6) as compressed:
+        writer = io.TextIOWrapper(compressed, encoding='utf-8', newline='')
+        csv_writer = csv.writer(writer)
+        csv_writer.writerow(columns)
+        for row in rows:
+            csv_writer.writerow(row)
+            count += 1
+        writer.flush()
+        writer.detach()
+    return count
+
+def parquet_schema(columns):
+    """Esquema fijo para que todos los lotes tengan los mismos tipos aunque alguno venga vacío"""
+    return pa.schema([
+        (column, pa.int64() if column in PARQUET_INTEGER_COLUMNS else pa.string())
+        for column in columns
+    ])
+
+def write_parquet(columns, rows, output, batch_rows=PARQUET_BATCH_ROWS):
+    """Escribe las filas en un fichero Parquet por lotes en output; retorna las filas escritas"""
+    schema = parquet_schema(columns)
+    integer_columns = [column in PARQUET_INTEGER_COLUMNS for column in columns]
+    rows = iter(rows)
+    count = 0
+    with pq.ParquetWriter(output, schema, compression='snappy') as writer:
+        while True:
+            batch = list(itertools.islice(rows, batch_rows))
+            if not batch:
+                break
+            data = [
+                [None if row[index] is None else (int(row[index]) if is_integer else str(row[index])) for row in batch]
+                for index, is_integer in enumerate(integer_columns)
+            ]
+            writer.write_batch(pa.record_batch(data, schema=schema))
+            count += len(batch)
+    return count
+
+def write_export(sheets, export_format, base_name):
+    """Escribe los conjuntos de datos en el formato indicado
+
+    sheets es una lista de (nombre, columnas, iterable de filas). Excel produce un único
+    fichero con una hoja por conjunto; CSV y Parquet producen un fichero por conjunto.
+    Retorna la lista de resultados {'file_name', 'buffer', 'mime', 'rows'}, donde rows indica
+    las filas escritas de cada conjunto de datos incluido en el fichero.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f'Formato de exportación no soportado: {export_format}')
+
+    if export_format == 'xlsx':
+        buffer = new_export_buffer()
+        row_counts = write_excel_sheets(sheets, buffer)
+        return [export_result(buffer, f'{base_name}.xlsx', EXCEL_MIME, row_counts)]
+
+    writer, mime = (write_csv_gzip, CSV_GZIP_MIME) if export_format == 'csv.gz' else (write_parquet, PARQUET_MIME)
+    exports = []
+    for sheet_name, columns, rows in sheets:
+        buffer = new_export_buffer()
+        count = writer(columns, rows, buffer)
+        logger.info(f"{export_format} export written: {sheet_name} ({count} rows)")
+        exports.append(export_result(buffer, f'{base_name}_{sheet_name.lower()}.{export_format}', mime, {sheet_name: count}))
+    return exports
+
+def bundle_exports(exports):
+    """Empaqueta varios resultados de exportación en un único zip; cierra sus buffers
+
+    El zip se nombra con el prefijo común de los ficheros. Los ficheros ya van comprimidos
+    (gzip, Parquet, xlsx), así que se guardan sin volver a comprimirlos.
+    Retorna {'file_name', 'buffer', 'mime', 'rows'}.
+    """
+    base_name = os.path.commonprefix([export['file_name'] for export in exports]).rstrip('_.')
+    buffer = new_export_buffer()
+    rows = {}
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for export in exports:
+            export['buffer'].seek(0)
+            with archive.open(export['file_name'], 'w') as entry:
+                shutil.copyfileobj(export['buffer'], entry)
+            export['buffer'].close()
+            rows.update(export.get('rows', {}))
+    return export_result(buffer, f'{base_name or "export"}.zip', ZIP_MIME, rows)
+
+def export_checksum(export):
+    """SHA-256 del contenido de un resultado de exportación (deja el buffer al principio)"""
+    buffer = export['buffer']
+    buffer.seek(0)
+    digest = hashlib.sha256()
+    for block in iter(lambda: buffer.read(1024 * 1024), b''):
+        digest.update(block)
+    buffer.seek(0)
+    return digest.hexdigest()
+
+def build_export_manifest(target, export_format, previous_watermark, watermark, exports, base_name):
+    """Manifiesto JSON de una exportación incremental: marcas de agua, ficheros, filas y checksums
+
+    El resultado incluye además 'watermark', la marca de agua que se guarda al confirmar la entrega.
+    """
+    manifest = {
+        'target': target,
+        'mode': 'incremental',
+        'format': export_format,
+        'generated_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        'previous_watermark': previous_watermark,
+        'watermark': watermark,
+        'files': [
+            {'file_name': export['file_name'], 'rows': export.get('rows', {}), 'sha256': export_checksum(export)}
+            for export in exports
+        ]
+    }
+    buffer = new_export_buffer()
+    buffer.write(json.dumps(manifest, indent=2, ensure_ascii=False).encode('utf-8'))
+    result = export_result(buffer, f'{base_name}_manifest.json', JSON_MIME)
+    result['watermark'] = watermark
+    return result
@@ -0,0 +1,162 @@
+"""Versionado del esquema y migraciones para SQLite y Supabase
+
+Cada migración tiene un número de versión, un nombre y un paso que se aplica una sola
+vez. Las versiones aplicadas se registran en la tabla schema_migrations, de modo que al
+arrancar solo se ejecutan las migraciones pendientes, en orden.
+
+- SQLite: cada migración se aplica en su propia transacción de escritura junto con su
+  registro en schema_migrations; si falla, no queda aplicada a medias.
+- Supabase: las migraciones son los scripts supabase_*.sql, que registran su propia
+  versión al final. Se aplican con la función RPC execute_sql si existe en el proyecto;
+  si no, se indica qué scripts hay que ejecutar en el SQL Editor.
+
+Para añadir un cambio de esquema se añade una migración al final de la lista
+correspondiente; nunca se modifican las ya publicadas.
+"""
+
+import datetime
+import logging
+import os
+import sqlite3
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+Migration = namedtuple('Migration', ['version', 'name', 'apply'])
+
+SQLITE_MIGRATIONS_TABLE = '''
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    applied_at TEXT NOT NULL
+)
+'''
+
+def iter_sql_statements(script):
+    """Divide un script SQL en sentencias completas (respetando los BEGIN ... END de los triggers)"""
+    statement = ''
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            yield statement.strip()
+            statement = ''
+    # Resto sin punto y coma final (se ignoran las líneas de comentario)
+    remainder = '\n'.join(line for line in statement.splitlines() if not line.strip().startswith('--')).strip()
+    if remainder:
+        yield remainder
+
+def sqlite_script(*path):
+    """Paso de migración que ejecuta un fichero SQL sentencia a sentencia dentro de la transacción"""
+    def apply(conn):
+        with open(os.path.join(*path), 'r', encoding='utf-8') as f:
+            script = f.read()
+        for statement in iter_sql_statements(script):
+            conn.execute(statement)
+    return apply
+
+def rebuild_search_index(conn):
+    """Reconstruye el índice de búsqueda a partir de incident_records e incident_actions"""
+    conn.execute('DELETE FROM incident_search')
+    conn.execute('''
+    INSERT INTO incident_search (rowid, explanation, actions)
+    SELECT ir.id, ir.explanation,
+           coalesce((SELECT group_concat(ia.action_description, ' ') FROM incident_actions ia WHERE ia.incident_record_id = ir.id), '')
+    FROM incident_records ir
+    ''')
+    logger.info("Full-text search index rebuilt")
+
+def create_search_index(conn):
+    """Índice FTS5 de búsqueda con sus triggers, rellenado con los registros actuales"""
+    try:
+        sqlite_script('db', 'search.sql')(conn)
+    except sqlite3.OperationalError as e:
+        # SQLite compilado sin FTS5: la búsqueda usa LIKE (ver search_incidents)
+        logger.warning(f"Full-text search index not available, falling back to LIKE search: {e}")
+        return
+    rebuild_search_index(conn)
+
+def add_incident_records_enlace(conn):
+    """Columna enlace de incident_records, ausente en las bases de datos creadas antes de añadirla a schema.sql"""
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(incident_records)')]
+    if 'enlace' not in columns:
+        conn.execute('ALTER TABLE incident_records ADD COLUMN enlace TEXT')
+
+SQLITE_MIGRATIONS = [
+    Migration(1, 'initial_schema', sqlite_script('db', 'schema.sql')),
+    Migration(2, 'incident_search_index', create_search_index),
+    Migration(3, 'incremental_export_tracking', sqlite_script('db', 'export.sql')),
+    Migration(4, 'incident_records_enlace', add_incident_records_enlace),
+    Migration(5, 'hot_query_indexes', sqlite_script('db', 'indexes.sql'))
+]
+
+def get_applied_sqlite_versions(conn):
+    """Versiones ya aplicadas (conjunto vacío si la tabla schema_migrations aún no existe)"""
+    try:
+        return {row[0] for row in conn.execute('SELECT version FROM schema_migrations')}
+    except sqlite3.OperationalError:
+        return set()
+
+def pending_sqlite_migrations(conn, migrations=SQLITE_MIGRATIONS):
+    applied = get_applied_sqlite_versions(conn)
+    return [migration for migration in migrations if migration.version not in applied]
+
+def apply_sqlite_migrations(pool, migrations=SQLITE_MIGRATIONS):
+    """Aplica en orden las migraciones pendientes; retorna las versiones aplicadas"""
+    pool.run_write(lambda conn: conn.execute(SQLITE_MIGRATIONS_TABLE))
+    with pool.connection() as conn:
+        pending = pending_sqlite_migrations(conn, migrations)
+
+    applied = []
+    for migration in pending:
+        def apply(conn, migration=migration):
+            migration.apply(conn)
+            conn.execute(
+                'INSERT INTO schema_migrations (version, name, applied_at) VALUES (?, ?, ?)',
+                (migration.version, migration.name, datetime.datetime.now().isoformat(timespec='seconds'))
+            )
+        pool.run_write(apply)
+        applied.append(migration.version)
+        logger.info(f"Applied migration {migration.version:04d}_{migration.name}")
+    return applied
+
+SUPABASE_MIGRATIONS = [
+    Migration(1, 'initial_schema', 'supabase_schema.sql'),
+    Migration(2, 'analytics_functions', 'supabase_analytics.sql'),
+    Migration(3, 'incident_search_index', 'supabase_search.sql'),
+    Migration(4, 'incremental_export_tracking', 'supabase_export.sql'),
+    Migration(5, 'hot_query_indexes', 'supabase_indexes.sql')
+]
+
+def get_applied_supabase_versions(client):
+    """Versiones aplicadas en Supabase, o None si la tabla schema_migrations no existe"""
+    try:
+        return {row['version'] for row in client.table('schema_migrations').select('version').execute().data}
+    except Exception as e:
+        logger.info(f"schema_migrations not available in Supabase: {e}")
+        return None
+
+def pending_supabase_migrations(client, migrations=SUPABASE_MIGRATIONS):
+    applied = get_applied_supabase_versions(client) or set()
+    return [migration for migration in migrations if migration.version not in applied]
+
+def apply_supabase_migrations(client, migrations=SUPABASE_MIGRATIONS):
+    """Aplica las migraciones pendientes con la RPC execute_sql; retorna las versiones aplicadas
+
+    Si la RPC no existe o falla, se detiene y avisa de los scripts que faltan por ejecutar
+    manualmente (en orden) en el SQL Editor de Supabase.
+    """
+    pending = pending_supabase_migrations(client, migrations)
+    applied = []
+    for index, migration in enumerate(pending):
+        with open(migration.apply, 'r', encoding='utf-8') as f:
+            script = f.read()
+        try:
+            client.rpc('execute_sql', {'query': script}).execute()
+        except Exception as e:
+            remaining = ', '.join(m.apply for m in pending[index:])
+            logger.warning(f"Could not apply Supabase migration {migration.version:04d}_{migration.name} ({e}). "
+                           f"Run these scripts in the Supabase SQL Editor, in order: {remaining}")
+            break
+        applied.append(migration.version)
+        logger.info(f"Applied Supabase migration {migration.version:04d}_{migration.name}")
+    return applied
@@ -0,0 +1,49 @@
+"""Índice de búsqueda global para las tablas de consulta
+
+Para cada tabla se construye una columna de texto en minúsculas con todos los campos
+concatenados. Cada búsqueda es entonces una única operación vectorizada sobre esa columna
+en lugar de convertir cada celda a texto en cada rerun. El índice se identifica por una
+huella del contenido del DataFrame, de modo que se reconstruye siempre que cambian los
+datos mostrados, vengan de una escritura en este proceso, en otro o de una caché caducada.
+"""
+
+import logging
+import threading
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Separador entre campos para que una búsqueda no coincida a caballo entre dos columnas
+FIELD_SEPARATOR = '\x1f'
+
+_lock = threading.Lock()
+_indexes = {}
+
+def build_search_text(df):
+    """Concatena todas las columnas del DataFrame en un texto en minúsculas por fila"""
+    text = pd.Series('', index=df.index, dtype=object)
+    for col in df.columns:
+        text = text + FIELD_SEPARATOR + df[col].fillna('').astype(str).str.lower()
+    return text
+
+def content_fingerprint(df):
+    """Huella del contenido del DataFrame (valores, índice y nombres de columnas)"""
+    return (tuple(df.columns), len(df), int(pd.util.hash_pandas_object(df, index=True).sum()))
+
+def get_search_index(name, df):
+    """Retorna el texto buscable de df, reconstruyéndolo solo si cambia su contenido"""
+    fingerprint = content_fingerprint(df)
+    with _lock:
+        cached = _indexes.get(name)
+    if cached and cached[0] == fingerprint:
+        return cached[1]
+
+    text = build_search_text(df)
+    with _lock:
+        _indexes[name] = (fingerprint, text)
+    logger.info(f"Built search index {name} ({len(text)} rows)")
+    return text
+
+def search_mask(search_text, term):
+    """Máscara booleana de las filas que contienen el término (sin distinguir mayúsculas)"""
+    return search_text.str.contains(term.strip().lower(), regex=False)